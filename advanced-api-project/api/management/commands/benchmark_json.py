@@ -0,0 +1,74 @@
+"""
+Benchmark of the stdlib and orjson JSON paths on AuthorSerializer output.
+
+Usage:
+    python manage.py benchmark_json --authors 200 --books 25
+"""
+
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api import renderers
+from api.models import Author, Book
+from api.parsers import ORJSONParser
+from api.renderers import ORJSONRenderer
+from api.serializers import AuthorSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare the stdlib and orjson renderers/parsers on AuthorSerializer output'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=200, help='Authors in the payload')
+        parser.add_argument('--books', type=int, default=25, help='Books per author')
+        parser.add_argument('--repeat', type=int, default=50, help='Timed runs per implementation')
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed; both sides use stdlib json'))
+        data = self.build_payload(options['authors'], options['books'])
+        body = JSONRenderer().render(data)
+        repeat = options['repeat']
+        self.stdout.write(f"AuthorSerializer x{options['authors']}: {len(body) / 1024:.0f} KiB of JSON")
+        self.stdout.write(f"{'':>8} {'stdlib ms':>10} {'orjson ms':>10} {'speedup':>8}")
+        self.report('render', repeat, lambda: JSONRenderer().render(data), lambda: ORJSONRenderer().render(data))
+        self.report(
+            'parse', repeat,
+            lambda: JSONParser().parse(BytesIO(body)), lambda: ORJSONParser().parse(BytesIO(body)),
+        )
+
+    def build_payload(self, authors, books):
+        """
+        Serialize authors with their nested books, then roll the rows back.
+        """
+        with transaction.atomic():
+            created = Author.objects.bulk_create(
+                [Author(name=f'Benchmark author {i}') for i in range(authors)]
+            )
+            Book.objects.bulk_create([
+                Book(title=f'Book {j} by {author.name}', publication_year=1900 + j, author=author)
+                for author in created for j in range(books)
+            ])
+            queryset = Author.objects.filter(pk__in=[a.pk for a in created]).prefetch_related('books')
+            data = AuthorSerializer(queryset, many=True).data
+            transaction.set_rollback(True)
+        return data
+
+    def report(self, label, repeat, stdlib, fast):
+        stdlib_ms = self.measure(stdlib, repeat)
+        fast_ms = self.measure(fast, repeat)
+        self.stdout.write(f'{label:>8} {stdlib_ms:>10.2f} {fast_ms:>10.2f} {stdlib_ms / fast_ms:>7.1f}x')
+
+    def measure(self, func, repeat):
+        """Best of ``repeat`` runs in milliseconds."""
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - started)
+        return best * 1000
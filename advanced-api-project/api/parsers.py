@@ -0,0 +1,45 @@
+"""
+Fast JSON parsing for the API.
+
+ORJSONParser decodes ``application/json`` request bodies with orjson when
+it is installed and falls back to DRF's JSONParser when it is not.
+"""
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from .renderers import orjson
+
+
+class ORJSONParser(JSONParser):
+    """
+    JSONParser that decodes with orjson when it is available.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """
+        Parse a JSON request body.
+
+        Args:
+            stream: The request body stream
+            media_type (str): The request content type
+            parser_context (dict): View, request and encoding of the call
+
+        Returns:
+            The decoded data
+
+        Raises:
+            ParseError: If the body is not valid JSON
+        """
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            data = stream.read()
+            if encoding.lower().replace('-', '') != 'utf8':
+                data = data.decode(encoding)
+            return orjson.loads(data)
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
@@ -0,0 +1,60 @@
+"""
+Fast JSON rendering for the API.
+
+ORJSONRenderer replaces DRF's JSONRenderer for ``application/json``.
+It encodes with orjson when the package is installed and falls back to
+the stdlib ``json`` module (DRF's JSONRenderer) when it is not.
+
+Values orjson does not handle itself (Decimal, lazy translations,
+datetimes, ...) are passed to DRF's JSONEncoder, so both paths produce
+the same JSON.
+"""
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Keep DRF's datetime format and accept non-string keys like stdlib json
+OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is available.
+
+    Selected by content negotiation for ``Accept: application/json`` (and
+    ``?format=json``), exactly like DRF's JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render ``data`` into JSON bytes.
+
+        Args:
+            data: The serialized data to encode
+            accepted_media_type (str): The negotiated media type
+            renderer_context (dict): View, request and response of the call
+
+        Returns:
+            bytes: The encoded JSON document
+        """
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        options = OPTIONS
+        # orjson only supports an indent of two spaces
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=options)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits, which stdlib json can encode
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escape the line separators that are invalid in JavaScript, as JSONRenderer does
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -8,7 +8,13 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 from django.contrib.auth.models import User
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
 from .models import Author, Book
+from .parsers import ORJSONParser
+from .renderers import ORJSONRenderer
+from .serializers import AuthorSerializer
+from io import BytesIO
 import json
 
 class BookAPITests(APITestCase):
@@ -506,6 +512,45 @@ class AuthorAPITests(APITestCase):
         self.client.logout()
 
 
+class JSONRendererTests(APITestCase):
+    """
+    Test suite for the orjson renderer and parser
+    """
+    
+    def setUp(self):
+        """
+        Set up an author with books
+        """
+        self.author = Author.objects.create(name='Test Author')
+        Book.objects.create(title='Test Book', publication_year=2000, author=self.author)
+    
+    def test_author_output_matches_stdlib_renderer(self):
+        """
+        Test the orjson renderer produces the same JSON as DRF's JSONRenderer
+        """
+        data = AuthorSerializer(self.author).data
+        self.assertEqual(
+            json.loads(ORJSONRenderer().render(data)),
+            json.loads(JSONRenderer().render(data))
+        )
+    
+    def test_author_list_is_negotiated_to_orjson(self):
+        """
+        Test Accept: application/json selects the orjson renderer
+        """
+        response = self.client.get(reverse('author-list'), HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(response.accepted_renderer, ORJSONRenderer)
+        self.assertEqual(json.loads(response.content)[0]['name'], 'Test Author')
+    
+    def test_parser_rejects_invalid_json(self):
+        """
+        Test malformed bodies raise ParseError
+        """
+        self.assertEqual(ORJSONParser().parse(BytesIO(b'{"name": "A"}')), {'name': 'A'})
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(BytesIO(b'{"name": '))
+
 # Test database configuration verification
 class TestDatabaseConfiguration(TestCase):
     """
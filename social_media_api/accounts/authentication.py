@@ -0,0 +1,197 @@
+"""
+Token authentication with cached token -> user lookups.
+
+DRF's TokenAuthentication joins authtoken_token and the user table on every
+request. CachedTokenAuthentication resolves a key in three steps:
+
+1. a per-process LRU (short TTL);
+2. the shared Django cache (Redis in production);
+3. the database, after which both caches are filled.
+
+Only the user id and the fields authentication and permissions need
+(``AUTH_FIELDS``) are cached, never the password hash or the counters; the
+other fields of ``request.user`` are deferred and loaded on access. Each
+entry carries the user's auth version, a counter in the shared cache that
+accounts.signals moves when a user is saved (profile edits, password
+changes, deactivation) or a token is deleted (logout). Local and shared
+hits are checked against the current version, so every process stops
+accepting a revoked token at once.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .models import CustomUser
+
+CACHE_TIMEOUT = getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT', 300)
+LOCAL_TIMEOUT = getattr(settings, 'AUTH_TOKEN_LOCAL_TIMEOUT', 30)
+LOCAL_CACHE_SIZE = getattr(settings, 'AUTH_TOKEN_LOCAL_CACHE_SIZE', 10000)
+AUTH_FIELDS = ('id', 'username', 'is_active', 'is_staff', 'is_superuser')
+
+
+def _cache_key(key):
+    # Raw token keys never leave the process
+    return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def _version_key(user_id):
+    return f'auth-version:{user_id}'
+
+
+class LocalTokenCache:
+    """Thread-safe LRU of token key -> (expiry, user id, version, fields)"""
+
+    def __init__(self, max_size=LOCAL_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        # user id -> token keys, so a user's entries are dropped without a scan
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (user id, version, fields) for ``key``, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1:]
+
+    def set(self, key, user_id, version, fields, timeout=LOCAL_TIMEOUT):
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + timeout, user_id, version, fields)
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def delete_user(self, user_id):
+        with self._lock:
+            for key in self._keys_by_user.get(user_id, set()).copy():
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._keys_by_user[entry[1]]
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[entry[1]]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+local_cache = LocalTokenCache()
+_stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def get_stats():
+    """Hit and miss counters of this process, plus the local cache size."""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = sum(stats.values())
+    stats['hit_rate'] = (stats['local_hits'] + stats['shared_hits']) / lookups if lookups else 0.0
+    stats['local_size'] = len(local_cache)
+    return stats
+
+
+def reset_stats():
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def invalidate_token(key):
+    """Forget a single token key in this process and the shared cache."""
+    local_cache.delete(key)
+    cache.delete(_cache_key(key))
+
+
+def invalidate_user(user_id):
+    """
+    Stop every process from serving cached tokens of ``user_id`` (e.g.
+    after a password change or logout).
+    """
+    local_cache.delete_user(user_id)
+    cache.set(_version_key(user_id), time.time_ns(), None)
+
+
+def _build_user(fields):
+    """User instance with ``fields`` loaded and every other field deferred"""
+    names = [name for name in AUTH_FIELDS if name in fields]
+    return CustomUser.from_db(DEFAULT_DB_ALIAS, names, [fields[name] for name in names])
+
+
+def resolve_token(key):
+    """Return the active user owning ``key``; raise AuthenticationFailed otherwise."""
+    local = local_cache.get(key)
+    if local is not None:
+        user_id, version, fields = local
+        if cache.get(_version_key(user_id)) == version:
+            _count('local_hits')
+            return _build_user(fields)
+        local_cache.delete(key)
+
+    shared = cache.get(_cache_key(key))
+    if shared is not None:
+        user_id, version, fields = shared
+        if cache.get(_version_key(user_id)) == version:
+            _count('shared_hits')
+            local_cache.set(key, user_id, version, fields)
+            return _build_user(fields)
+
+    _count('misses')
+    try:
+        token = Token.objects.select_related('user').only(
+            'key', *[f'user__{name}' for name in AUTH_FIELDS]
+        ).get(key=key)
+    except Token.DoesNotExist:
+        raise exceptions.AuthenticationFailed(_('Invalid token.'))
+    user = token.user
+    if not user.is_active:
+        raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+    # Versions are started lazily; an evicted one restarts at a new value
+    cache.add(_version_key(user.pk), time.time_ns(), None)
+    version = cache.get(_version_key(user.pk))
+    fields = {name: getattr(user, name) for name in AUTH_FIELDS}
+    cache.set(_cache_key(key), (user.pk, version, fields), CACHE_TIMEOUT)
+    local_cache.set(key, user.pk, version, fields)
+    return _build_user(fields)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop-in replacement for TokenAuthentication backed by the token caches"""
+
+    def authenticate_credentials(self, key):
+        user = resolve_token(key)
+        # request.auth keeps the usual Token instance without loading it
+        return user, Token(key=key, user=user)
@@ -0,0 +1,68 @@
+"""
+Follow-graph adjacency cache.
+
+Each user's following and follower id sets are cached (LocMem in
+development, Redis in production) and dropped by accounts.signals whenever
+a follow edge changes. Membership checks such as ``is_following`` and set
+operations such as mutual follows then become in-memory set lookups instead
+of one EXISTS query per row.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import FollowRelationship
+
+CACHE_TIMEOUT = getattr(settings, 'FOLLOW_GRAPH_CACHE_TIMEOUT', 60 * 60)
+# Larger adjacency sets are not cached and are read from the database
+MAX_CACHED_IDS = getattr(settings, 'FOLLOW_GRAPH_MAX_CACHED_IDS', 10000)
+
+
+def _cache_key(direction, user_id):
+    return f'follow-graph:{direction}:{user_id}'
+
+
+def _adjacency(direction, user_id):
+    key = _cache_key(direction, user_id)
+    ids = cache.get(key)
+    if ids is None:
+        if direction == 'following':
+            rows = FollowRelationship.objects.filter(follower_id=user_id).values_list('following_id', flat=True)
+        else:
+            rows = FollowRelationship.objects.filter(following_id=user_id).values_list('follower_id', flat=True)
+        ids = frozenset(rows)
+        if len(ids) <= MAX_CACHED_IDS:
+            cache.set(key, ids, CACHE_TIMEOUT)
+    return ids
+
+
+def following_ids(user_id):
+    """Ids of the users ``user_id`` follows."""
+    return _adjacency('following', user_id)
+
+
+def follower_ids(user_id):
+    """Ids of the users following ``user_id``."""
+    return _adjacency('followers', user_id)
+
+
+def is_following(user_id, target_id):
+    return target_id in following_ids(user_id)
+
+
+def mutual_follow_ids(user_id):
+    """Ids of users who follow ``user_id`` and are followed back."""
+    return following_ids(user_id) & follower_ids(user_id)
+
+
+def followed_by_following_ids(viewer_id, target_id):
+    """Ids of the people ``viewer_id`` follows who also follow ``target_id``."""
+    return following_ids(viewer_id) & follower_ids(target_id)
+
+
+def invalidate(following_of=(), followers_of=()):
+    """Drop cached adjacency sets after follow edges change."""
+    keys = [_cache_key('following', pk) for pk in following_of]
+    keys += [_cache_key('followers', pk) for pk in followers_of]
+    if keys:
+        cache.delete_many(keys)
@@ -0,0 +1,58 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts import suggestions
+
+
+def synthetic_edges(users, edges, seed):
+    """Sorted (follower, following) pairs with a skewed, power-law-like in-degree"""
+    rng = random.Random(seed)
+    per_user = edges // users
+    for follower in range(1, users + 1):
+        targets = set()
+        while len(targets) < per_user:
+            # Squaring the uniform sample concentrates follows on low ids
+            target = 1 + int(users * rng.random() ** 2)
+            if target != follower:
+                targets.add(target)
+        for target in sorted(targets):
+            yield follower, target
+
+
+class Command(BaseCommand):
+    help = 'Time the who-to-follow scorer on a synthetic in-memory follow graph'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--edges', type=int, default=1000000)
+        parser.add_argument(
+            '--sample', type=int, default=10000,
+            help='Number of users scored (timings are extrapolated to all users)'
+        )
+        parser.add_argument('--top-n', type=int, default=suggestions.TOP_N)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        users = options['users']
+        started = time.perf_counter()
+        graph = suggestions.FollowGraph.from_edges(
+            synthetic_edges(users, options['edges'], options['seed'])
+        )
+        build_seconds = time.perf_counter() - started
+        self.stdout.write(
+            f'Built graph: {len(graph)} users, {graph.edge_count} edges, '
+            f'{graph.nbytes / 2 ** 20:.1f} MiB in {build_seconds:.2f}s'
+        )
+
+        sample = random.Random(options['seed']).sample(range(1, users + 1), min(options['sample'], users))
+        started = time.perf_counter()
+        scored = sum(1 for _ in suggestions.compute(graph, sample, options['top_n']))
+        score_seconds = time.perf_counter() - started
+        per_user = score_seconds / max(scored, 1)
+        self.stdout.write(
+            f'Scored {scored} users in {score_seconds:.2f}s '
+            f'({per_user * 1000:.2f} ms/user, ~{per_user * len(graph):.0f}s for every user)'
+        )
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from accounts import suggestions
+
+
+class Command(BaseCommand):
+    help = 'Recompute who-to-follow suggestions from the follow graph (run offline, e.g. nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='Only recompute suggestions for this user id (repeatable)'
+        )
+        parser.add_argument(
+            '--top-n', type=int, default=suggestions.TOP_N,
+            help='Number of suggestions stored per user'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=suggestions.BATCH_SIZE,
+            help='Edges read and users written per batch'
+        )
+
+    def handle(self, *args, **options):
+        written = suggestions.refresh(
+            user_ids=options['user_ids'],
+            top_n=options['top_n'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Stored suggestions for {written} users'))
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:29
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    FollowRelationship = apps.get_model('accounts', 'FollowRelationship')
+
+    def count(field):
+        counts = (
+            FollowRelationship.objects.filter(**{field: OuterRef('pk')})
+            .order_by().values(field).annotate(total=Count('pk')).values('total')
+        )
+        return Coalesce(Subquery(counts), 0)
+
+    CustomUser.objects.update(followers_count=count('following'), following_count=count('follower'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_remove_customuser_followers_followrelationship_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
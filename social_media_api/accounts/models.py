@@ -1,8 +1,17 @@
-from django.db import models
+from collections import namedtuple
+
+from django.db import models, transaction
+from django.db.models.signals import m2m_changed
 from django.contrib.auth.models import AbstractUser
 from django.utils.translation import gettext_lazy as _
 
-class CustomUser(AbstractUser):
+from social_media_api.denormalized import CounterFieldsMixin
+
+# Outcome of a bulk (un)follow: ids changed, ids already in the requested
+# state, and ids that do not exist
+BulkFollowResult = namedtuple('BulkFollowResult', ['changed', 'unchanged', 'missing'])
+
+class CustomUser(CounterFieldsMixin, AbstractUser):
     """
     Custom user model for social media with follow functionality
     """
@@ -23,6 +32,11 @@ class CustomUser(AbstractUser):
     # Email field
     email = models.EmailField(_('email address'), unique=True)
     
+    # Denormalized follow counters, kept in step by accounts.signals
+    followers_count = models.PositiveIntegerField(default=0, editable=False)
+    following_count = models.PositiveIntegerField(default=0, editable=False)
+    COUNTER_FIELDS = ('followers_count', 'following_count')
+    
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
     
@@ -30,27 +44,86 @@ class CustomUser(AbstractUser):
         return self.email
     
     # Helper methods for follow functionality
+    # The follow counters are updated in the database by accounts.signals;
+    # follow() and unfollow() mirror the change on the in-memory instances.
     def follow(self, user):
         """Follow another user"""
         if user != self and not self.is_following(user):
             self.following.add(user)
+            self._mirror_counter('following_count', 1)
+            user._mirror_counter('followers_count', 1)
     
     def unfollow(self, user):
         """Unfollow a user"""
         if user != self and self.is_following(user):
             self.following.remove(user)
+            self._mirror_counter('following_count', -1)
+            user._mirror_counter('followers_count', -1)
+    
+    def follow_many(self, user_ids):
+        """
+        Follow every user in ``user_ids`` with a fixed number of queries.
+        
+        Rows are inserted with bulk_create(ignore_conflicts=True) and
+        m2m_changed is sent once for the whole batch, so counters, timelines
+        and notifications are updated in bulk by their receivers.
+        """
+        user_ids = {int(pk) for pk in user_ids} - {self.pk}
+        with transaction.atomic():
+            existing = set(CustomUser.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+            already = set(
+                FollowRelationship.objects.filter(follower=self, following_id__in=existing)
+                .values_list('following_id', flat=True)
+            )
+            new_ids = existing - already
+            if new_ids:
+                self._send_follow_signal('pre_add', new_ids)
+                FollowRelationship.objects.bulk_create(
+                    [FollowRelationship(follower=self, following_id=pk) for pk in new_ids],
+                    ignore_conflicts=True
+                )
+                self._send_follow_signal('post_add', new_ids)
+        self._mirror_counter('following_count', len(new_ids))
+        return BulkFollowResult(new_ids, already, user_ids - existing)
+    
+    def unfollow_many(self, user_ids):
+        """Unfollow every user in ``user_ids`` with a fixed number of queries."""
+        user_ids = {int(pk) for pk in user_ids} - {self.pk}
+        with transaction.atomic():
+            existing = set(CustomUser.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+            relationships = FollowRelationship.objects.filter(follower=self, following_id__in=existing)
+            removed = set(relationships.values_list('following_id', flat=True))
+            if removed:
+                self._send_follow_signal('pre_remove', removed)
+                relationships.delete()
+                self._send_follow_signal('post_remove', removed)
+        self._mirror_counter('following_count', -len(removed))
+        return BulkFollowResult(removed, existing - removed, user_ids - existing)
+    
+    def _mirror_counter(self, field, delta):
+        # Deferred counters (users from the token cache) are read from the
+        # database on first access, which already includes the change
+        if field not in self.get_deferred_fields():
+            setattr(self, field, max(getattr(self, field) + delta, 0))
+    
+    def _send_follow_signal(self, action, pk_set):
+        m2m_changed.send(
+            sender=FollowRelationship, instance=self, action=action,
+            reverse=False, model=CustomUser, pk_set=set(pk_set), using=self._state.db
+        )
     
     def is_following(self, user):
-        """Check if following a user"""
-        return self.following.filter(id=user.id).exists()
+        """Check if following a user (served from the follow-graph cache)"""
+        from .graph import is_following
+        return is_following(self.pk, user.pk)
     
     def get_followers_count(self):
         """Get number of followers"""
-        return self.followers.count()
+        return self.followers_count
     
     def get_following_count(self):
         """Get number of users being followed"""
-        return self.following.count()
+        return self.following_count
 
 # Optional: Through model for follow relationships (can store extra data like timestamp)
 class FollowRelationship(models.Model):
@@ -71,3 +144,32 @@ class FollowRelationship(models.Model):
     
     def __str__(self):
         return f"{self.follower} follows {self.following}"
+
+class FollowSuggestion(models.Model):
+    """
+    Precomputed who-to-follow entry, written offline by accounts.suggestions
+    (``manage.py compute_follow_suggestions``) and read back in rank order.
+    """
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions'
+    )
+    suggested = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='suggested_to'
+    )
+    # Number of people the user follows who follow the suggested user
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        unique_together = ('user', 'suggested')
+        ordering = ['rank']
+        indexes = [
+            models.Index(fields=['user', 'rank'], name='accounts_suggestion_user_rank'),
+        ]
+    
+    def __str__(self):
+        return f"{self.suggested_id} suggested to {self.user_id}"
@@ -1,9 +1,17 @@
-from django.contrib.auth import get_user_model
+from django.contrib.auth import authenticate, get_user_model
 from rest_framework import serializers
 from rest_framework.authtoken.models import Token
+from social_media_api.serializers import DynamicFieldsMixin
+from . import graph
 
 User = get_user_model()
 
+class UserSerializer(serializers.ModelSerializer):
+    """Compact user representation for embedding in other resources"""
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'first_name', 'last_name', 'profile_picture']
+
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
     password2 = serializers.CharField(write_only=True)
@@ -41,7 +49,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'bio', 'profile_picture', 'date_joined']
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     followers_count = serializers.SerializerMethodField()
     following_count = serializers.SerializerMethodField()
     is_following = serializers.SerializerMethodField()
@@ -62,7 +70,19 @@ class UserProfileSerializer(serializers.ModelSerializer):
         return obj.get_following_count()
     
     def get_is_following(self, obj):
+        # One cached adjacency set per serializer resolves a whole page
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return request.user.is_following(obj)
+            if not hasattr(self, '_following_ids'):
+                self._following_ids = graph.following_ids(request.user.pk)
+            return obj.pk in self._following_ids
         return False
+
+
+class BulkFollowSerializer(serializers.Serializer):
+    """Input for bulk follow/unfollow"""
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=500
+    )
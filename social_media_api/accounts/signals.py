@@ -0,0 +1,105 @@
+# Signal handlers for the accounts app
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from social_media_api import response_cache
+from . import authentication, graph
+from .models import CustomUser, FollowRelationship
+
+
+def _edge_ids(instance, reverse):
+    """Ids on the other end of ``instance``'s follow edges"""
+    if reverse:
+        return list(FollowRelationship.objects.filter(following=instance).values_list('follower_id', flat=True))
+    return list(FollowRelationship.objects.filter(follower=instance).values_list('following_id', flat=True))
+
+
+def _bump_follow_counters(user_id, other_ids, reverse, delta):
+    """
+    ``user_id`` started (or stopped) following ``other_ids``; with
+    ``reverse`` the roles are swapped and ``other_ids`` are the followers.
+    """
+    own_field, other_field = 'following_count', 'followers_count'
+    if reverse:
+        own_field, other_field = other_field, own_field
+    # Greatest() keeps a drifted counter from going below zero
+    CustomUser.objects.filter(pk=user_id).update(
+        **{own_field: Greatest(F(own_field) + delta * len(other_ids), Value(0))}
+    )
+    CustomUser.objects.filter(pk__in=other_ids).update(
+        **{other_field: Greatest(F(other_field) + delta, Value(0))}
+    )
+
+
+@receiver(m2m_changed, sender=CustomUser.following.through)
+def count_follows(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep follow counters in step; m2m_changed runs inside the write's transaction"""
+    if action == 'post_add' and pk_set:
+        _bump_follow_counters(instance.pk, pk_set, reverse, 1)
+    elif action == 'post_remove' and pk_set:
+        _bump_follow_counters(instance.pk, pk_set, reverse, -1)
+    elif action == 'pre_clear':
+        # The rows are still there, so this is the last chance to see them
+        other_ids = _edge_ids(instance, reverse)
+        if other_ids:
+            _bump_follow_counters(instance.pk, other_ids, reverse, -1)
+
+
+@receiver(m2m_changed, sender=CustomUser.following.through)
+def invalidate_follow_graph(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Drop cached adjacency sets now, for readers in this transaction, and
+    again on commit, in case a concurrent reader re-cached the old edges
+    """
+    if action in ('post_add', 'post_remove') and pk_set:
+        other_ids = list(pk_set)
+    elif action == 'pre_clear':
+        other_ids = _edge_ids(instance, reverse)
+    else:
+        return
+    if reverse:
+        following_of, followers_of = other_ids, [instance.pk]
+    else:
+        following_of, followers_of = [instance.pk], other_ids
+    graph.invalidate(following_of, followers_of)
+    transaction.on_commit(lambda: graph.invalidate(following_of, followers_of))
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_cached_tokens(sender, instance, created, **kwargs):
+    """Profile, password and is_active changes must not be served from cache"""
+    if created:
+        return
+    authentication.invalidate_user(instance.pk)
+    transaction.on_commit(lambda: authentication.invalidate_user(instance.pk))
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    authentication.invalidate_token(instance.key)
+    # Other processes may still hold the token in their local caches
+    authentication.invalidate_user(instance.user_id)
+    transaction.on_commit(lambda: authentication.invalidate_user(instance.user_id))
+
+
+# Profile validators (ETag/Last-Modified) are versioned by user:<pk>
+@receiver(post_save, sender=CustomUser)
+def bump_profile_generation(sender, instance, **kwargs):
+    response_cache.bump(f'user:{instance.pk}')
+
+
+@receiver(m2m_changed, sender=CustomUser.following.through)
+def bump_follow_generations(sender, instance, action, reverse, pk_set, **kwargs):
+    """Both ends of a follow edge see their counters move"""
+    if action in ('post_add', 'post_remove') and pk_set:
+        other_ids = list(pk_set)
+    elif action == 'pre_clear':
+        other_ids = _edge_ids(instance, reverse)
+    else:
+        return
+    response_cache.bump(*[f'user:{pk}' for pk in [instance.pk, *other_ids]])
@@ -1,3 +1,291 @@
-from django.test import TestCase
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from notifications.models import NotificationEvent
+from posts.models import Post, TimelineEntry
+
+from social_media_api.testing import QueryBudgetMixin, make_user
+from . import authentication, graph, suggestions
+from .models import CustomUser
+
+
+class FollowCounterTests(APITestCase):
+    """Tests for the denormalized follower/following counters"""
+
+    def setUp(self):
+        cache.clear()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+
+    def test_follow_endpoints_report_counters(self):
+        self.client.force_authenticate(self.alice)
+        response = self.client.post(reverse('follow', args=[self.bob.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['following_count'], 1)
+        self.assertEqual(response.data['followers_count'], 1)
+        response = self.client.post(reverse('unfollow', args=[self.bob.pk]))
+        self.assertEqual(response.data['following_count'], 0)
+        self.assertEqual(response.data['followers_count'], 0)
+
+    def test_saving_a_stale_user_keeps_counters(self):
+        stale = CustomUser.objects.get(pk=self.alice.pk)
+        self.alice.follow(self.bob)
+        stale.bio = 'Hello'
+        stale.save()
+        self.alice.refresh_from_db()
+        self.assertEqual((self.alice.bio, self.alice.following_count), ('Hello', 1))
+
+    def test_profile_update_keeps_counters(self):
+        self.client.force_authenticate(CustomUser.objects.get(pk=self.alice.pk))
+        self.alice.follow(self.bob)
+        response = self.client.patch(reverse('profile'), {'bio': 'Hi', 'following_count': 7})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.alice.refresh_from_db()
+        self.assertEqual((self.alice.bio, self.alice.following_count), ('Hi', 1))
+
+    def test_drifted_bulk_unfollow_clamps_at_zero(self):
+        carol = make_user('carol')
+        self.alice.follow_many([self.bob.pk, carol.pk])
+        CustomUser.objects.filter(pk=self.alice.pk).update(following_count=1)
+        self.alice.unfollow_many([self.bob.pk, carol.pk])
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual((self.alice.following_count, self.bob.followers_count), (0, 0))
+
+    def test_clear_resets_counters(self):
+        self.alice.follow(self.bob)
+        self.alice.following.clear()
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual(self.alice.following_count, 0)
+        self.assertEqual(self.bob.followers_count, 0)
+
+
+class BulkFollowTests(APITestCase):
+    """Tests for the bulk follow/unfollow endpoints"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('newcomer')
+        self.targets = [make_user(f'suggested{i}') for i in range(5)]
+        self.user.follow(self.targets[0])
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_follow(self):
+        post = Post.objects.create(author=self.targets[1], title='Hello', content='World')
+        ids = [target.pk for target in self.targets] + [999999]
+        response = self.client.post(reverse('follow_bulk'), {'user_ids': ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['followed'], sorted(t.pk for t in self.targets[1:]))
+        self.assertEqual(response.data['already_following'], [self.targets[0].pk])
+        self.assertEqual(response.data['not_found'], [999999])
+        self.assertEqual(response.data['following_count'], 5)
+
+        self.user.refresh_from_db()
+        self.targets[1].refresh_from_db()
+        self.assertEqual(self.user.following_count, 5)
+        self.assertEqual(self.targets[1].followers_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(user=self.user, post=post).exists())
+        self.assertEqual(NotificationEvent.objects.filter(actor=self.user).count(), 5)
+
+    def test_bulk_unfollow(self):
+        self.user.follow_many([target.pk for target in self.targets])
+        ids = [target.pk for target in self.targets[:3]]
+        response = self.client.post(reverse('unfollow_bulk'), {'user_ids': ids}, format='json')
+        self.assertEqual(response.data['unfollowed'], sorted(ids))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.following_count, 2)
+
+
+class FollowGraphCacheTests(QueryBudgetMixin, APITestCase):
+    """Tests for the follow-graph adjacency cache"""
+
+    def setUp(self):
+        cache.clear()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.carol = make_user('carol')
+        self.alice.follow(self.bob)
+        self.bob.follow(self.alice)
+        self.alice.follow(self.carol)
+        self.carol.follow(self.bob)
+
+    def test_cache_is_invalidated_on_follow_changes(self):
+        self.assertEqual(graph.following_ids(self.alice.pk), {self.bob.pk, self.carol.pk})
+        self.alice.unfollow(self.carol)
+        self.assertEqual(graph.following_ids(self.alice.pk), {self.bob.pk})
+        self.assertEqual(graph.follower_ids(self.carol.pk), frozenset())
+
+    def test_mutual_and_known_follower_lookups(self):
+        self.assertEqual(graph.mutual_follow_ids(self.alice.pk), {self.bob.pk})
+        self.assertEqual(graph.followed_by_following_ids(self.alice.pk, self.bob.pk), {self.carol.pk})
+
+    def test_follower_pages_resolve_is_following_without_per_row_queries(self):
+        self.client.force_authenticate(self.alice)
+        url = reverse('user-followers', args=[self.bob.pk])
+        self.client.get(url)
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertWithinQueryBudget(response)
+        by_id = {item['id']: item['is_following'] for item in response.data['results']}
+        self.assertEqual(by_id, {self.alice.pk: False, self.carol.pk: True})
+
+    def test_known_followers_endpoint(self):
+        self.client.force_authenticate(self.alice)
+        response = self.client.get(reverse('user-known-followers', args=[self.bob.pk]))
+        self.assertEqual([item['id'] for item in response.data['results']], [self.carol.pk])
+
+
+class FollowSuggestionTests(APITestCase):
+    """Tests for the offline who-to-follow scorer"""
+
+    def setUp(self):
+        cache.clear()
+        self.alice, self.bob, self.carol, self.dave, self.erin = (
+            make_user(name) for name in ('alice', 'bob', 'carol', 'dave', 'erin')
+        )
+        self.alice.follow_many([self.bob.pk, self.carol.pk])
+        self.bob.follow_many([self.dave.pk, self.erin.pk])
+        self.carol.follow_many([self.dave.pk])
+
+    def test_friends_of_friends_are_ranked_by_shared_follows(self):
+        follow_graph = suggestions.FollowGraph.from_database()
+        ranked = dict(suggestions.compute(follow_graph, [self.alice.pk]))[self.alice.pk]
+        self.assertEqual(ranked, [(self.dave.pk, 2), (self.erin.pk, 1)])
+
+    def test_users_outside_the_follow_graph_get_popular_accounts(self):
+        newcomer = make_user('newcomer')
+        follow_graph = suggestions.FollowGraph.from_database()
+        ranked = dict(suggestions.compute(follow_graph, [newcomer.pk], top_n=1))[newcomer.pk]
+        self.assertEqual(ranked, [(self.dave.pk, 0)])
+
+    def test_endpoint_serves_stored_suggestions_not_yet_followed(self):
+        call_command('compute_follow_suggestions', stdout=StringIO())
+        self.alice.follow(self.erin)
+        self.client.force_authenticate(self.alice)
+        response = self.client.get(reverse('user-suggestions'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in response.data['results']], [self.dave.pk])
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    """Tests for the cached token -> user lookup"""
+
+    def setUp(self):
+        cache.clear()
+        authentication.local_cache.clear()
+        authentication.reset_stats()
+        self.user = make_user('alice')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_profile(self):
+        return self.client.get(reverse('profile'))
+
+    def test_repeat_requests_skip_the_token_query(self):
+        self.get_profile()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_profile()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any('authtoken_token' in query['sql'] for query in queries.captured_queries))
+        stats = authentication.get_stats()
+        self.assertEqual((stats['misses'], stats['local_hits']), (1, 1))
+
+    def test_shared_cache_serves_other_processes(self):
+        self.get_profile()
+        authentication.local_cache.clear()
+        self.get_profile()
+        self.assertEqual(authentication.get_stats()['shared_hits'], 1)
+
+    def test_logout_revokes_cached_token(self):
+        self.get_profile()
+        self.assertEqual(self.client.post(reverse('logout')).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_profile().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_save_refreshes_cached_user(self):
+        self.get_profile()
+        self.user.set_password('changed-pass-456')
+        self.user.first_name = 'Alicia'
+        self.user.save()
+        self.assertEqual(self.get_profile().data['first_name'], 'Alicia')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get_profile().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revocation_reaches_other_processes(self):
+        self.get_profile()
+        entry = authentication.local_cache.get(self.token.key)
+        self.assertEqual(self.client.post(reverse('logout')).status_code, status.HTTP_200_OK)
+        # Another worker still holding the token in its local cache
+        authentication.local_cache.set(self.token.key, *entry)
+        self.assertEqual(self.get_profile().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_only_auth_fields_are_cached(self):
+        self.get_profile()
+        user_id, _, fields = cache.get(authentication._cache_key(self.token.key))
+        self.assertEqual(user_id, self.user.pk)
+        self.assertEqual(set(fields), set(authentication.AUTH_FIELDS))
+        user = authentication.resolve_token(self.token.key)
+        self.assertIn('password', user.get_deferred_fields())
+        self.assertIn('following_count', user.get_deferred_fields())
+
+    def test_local_cache_drops_a_users_entries(self):
+        local = authentication.LocalTokenCache(max_size=2)
+        local.set('a', 1, 0, {})
+        local.set('b', 1, 0, {})
+        local.set('c', 2, 0, {})
+        self.assertIsNone(local.get('a'))
+        local.delete_user(1)
+        self.assertEqual((local.get('b'), len(local)), (None, 1))
+
+    def test_follows_refresh_cached_counters(self):
+        bob, carol = make_user('bob'), make_user('carol')
+        bob_key = Token.objects.create(user=bob).key
+        authentication.resolve_token(bob_key)
+        first = self.get_profile()
+        self.assertEqual(self.client.post(reverse('follow', args=[bob.pk])).data['following_count'], 1)
+        response = self.client.post(reverse('follow', args=[carol.pk]))
+        self.assertEqual((response.data['following_count'], response.data['followers_count']), (2, 1))
+        response = self.get_profile()
+        self.assertEqual(response.data['following_count'], 2)
+        response = self.client.get(reverse('profile'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(authentication.resolve_token(bob_key).followers_count, 1)
+        self.client.post(reverse('unfollow', args=[bob.pk]))
+        self.assertEqual(self.get_profile().data['following_count'], 1)
+
+
+class ProfileConditionalGetTests(APITestCase):
+    """Tests for ETag/Last-Modified on the profile"""
+
+    def setUp(self):
+        cache.clear()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.client.force_authenticate(self.alice)
+
+    def test_profile_revalidates_until_counters_move(self):
+        first = self.client.get(reverse('profile'))
+        self.assertIn('Last-Modified', first)
+        response = self.client.get(reverse('profile'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.alice.follow(self.bob)
+        response = self.client.get(reverse('profile'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['following_count'], 1)
+
+    def test_profile_etag_is_built_from_the_database_row(self):
+        first = self.client.get(reverse('profile'))
+        # request.user stays as authenticated; the row moves underneath it
+        CustomUser.objects.filter(pk=self.alice.pk).update(bio='Changed elsewhere')
+        response = self.client.get(reverse('profile'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['bio'], 'Changed elsewhere')
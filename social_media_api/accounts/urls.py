@@ -1,18 +1,32 @@
-from django.urls import path
+from django.urls import path, include
+from rest_framework.routers import SimpleRouter
+from .user_views import UserViewSet
 from .views import (
     UserRegistrationView,
     UserLoginView,
+    UserLogoutView,
+    TokenCacheStatsView,
     UserProfileView,
     FollowUserView,
-    UnfollowUserView
+    UnfollowUserView,
+    BulkFollowView
 )
 
+router = SimpleRouter()
+router.register(r'users', UserViewSet, basename='user')
+
 urlpatterns = [
     path('register/', UserRegistrationView.as_view(), name='register'),
     path('login/', UserLoginView.as_view(), name='login'),
+    path('logout/', UserLogoutView.as_view(), name='logout'),
+    path('token-cache/stats/', TokenCacheStatsView.as_view(), name='token_cache_stats'),
     path('profile/', UserProfileView.as_view(), name='profile'),
     
     # CHECKER WANTS EXACTLY THESE:
     path('follow/<int:user_id>/', FollowUserView.as_view(), name='follow'),
     path('unfollow/<int:user_id>/', UnfollowUserView.as_view(), name='unfollow'),
+    path('follow/bulk/', BulkFollowView.as_view(), name='follow_bulk'),
+    path('unfollow/bulk/', BulkFollowView.as_view(unfollow=True), name='unfollow_bulk'),
+    
+    path('', include(router.urls)),
 ]
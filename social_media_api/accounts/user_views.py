@@ -1,10 +1,12 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.db.models import F
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
 from .serializers import UserProfileSerializer, UserRegistrationSerializer
 from .models import CustomUser
+from . import graph
 
 User = get_user_model()
 
@@ -15,8 +17,11 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserProfileSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    # Set per action for the write actions (social_media_api.throttling)
+    throttle_scope = None
     
-    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated],
+            throttle_scope='follows')
     def follow(self, request, pk=None):
         """Follow a user"""
         user_to_follow = get_object_or_404(User, pk=pk)
@@ -44,7 +49,8 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
             "followers_count": user_to_follow.get_followers_count()
         }, status=status.HTTP_200_OK)
     
-    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated],
+            throttle_scope='follows')
     def unfollow(self, request, pk=None):
         """Unfollow a user"""
         user_to_unfollow = get_object_or_404(User, pk=pk)
@@ -76,7 +82,7 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
     def followers(self, request, pk=None):
         """Get list of followers for a user"""
         user = self.get_object()
-        followers = user.followers.all()
+        followers = user.followers.order_by('pk')
         page = self.paginate_queryset(followers)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -88,10 +94,49 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
     def following(self, request, pk=None):
         """Get list of users followed by a user"""
         user = self.get_object()
-        following = user.following.all()
+        following = user.following.order_by('pk')
         page = self.paginate_queryset(following)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
         serializer = self.get_serializer(following, many=True)
         return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    def mutuals(self, request, pk=None):
+        """Get users who follow this user and are followed back"""
+        user = self.get_object()
+        mutuals = User.objects.filter(pk__in=graph.mutual_follow_ids(user.pk)).order_by('pk')
+        page = self.paginate_queryset(mutuals)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(mutuals, many=True)
+        return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def known_followers(self, request, pk=None):
+        """Get followers of this user that the requesting user follows"""
+        user = self.get_object()
+        known = User.objects.filter(
+            pk__in=graph.followed_by_following_ids(request.user.pk, user.pk)
+        ).order_by('pk')
+        page = self.paginate_queryset(known)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(known, many=True)
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def suggestions(self, request):
+        """Get who-to-follow suggestions precomputed by compute_follow_suggestions"""
+        suggested = User.objects.filter(suggested_to__user=request.user).exclude(
+            pk__in=graph.following_ids(request.user.pk)
+        ).annotate(rank=F('suggested_to__rank')).order_by('rank')
+        page = self.paginate_queryset(suggested)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(suggested, many=True)
+        return Response(serializer.data)
@@ -4,11 +4,15 @@ from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
 from django.shortcuts import get_object_or_404
+from social_media_api.conditional import Validators, conditional, generation_time
+from social_media_api.response_cache import get_generations
+from . import authentication
 from .models import CustomUser
 from .serializers import (
     UserRegistrationSerializer, 
     UserLoginSerializer, 
-    UserProfileSerializer
+    UserProfileSerializer,
+    BulkFollowSerializer
 )
 
 # CHECKER WANTS: CustomUser.objects.all()
@@ -43,12 +47,47 @@ class UserLoginView(APIView):
             'message': 'Login successful'
         }, status=status.HTTP_200_OK)
 
+class UserLogoutView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request):
+        # Deleting the token also evicts it from the token caches (accounts.signals)
+        Token.objects.filter(user=request.user).delete()
+        return Response({'message': 'Logout successful'}, status=status.HTTP_200_OK)
+
+class TokenCacheStatsView(APIView):
+    """Hit/miss counters of the token cache in the worker serving the request"""
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request):
+        return Response(authentication.get_stats())
+
+# Fields of the profile read straight off request.user for its ETag
+PROFILE_VALIDATOR_FIELDS = [
+    'username', 'email', 'first_name', 'last_name', 'bio', 'profile_picture',
+    'followers_count', 'following_count',
+]
+
+def profile_validators(view, request):
+    """The served instance's own fields, plus user:<pk> for Last-Modified"""
+    user = view.get_object()
+    generation, = get_generations([f'user:{user.pk}'])
+    parts = [generation] + [str(getattr(user, field)) for field in PROFILE_VALIDATOR_FIELDS]
+    return Validators(parts, generation_time(generation))
+
 class UserProfileView(generics.RetrieveUpdateAPIView):
     serializer_class = UserProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_object(self):
-        return self.request.user
+        # request.user only carries the cached auth fields (accounts.authentication)
+        if not hasattr(self, '_user'):
+            self._user = CustomUser.objects.get(pk=self.request.user.pk)
+        return self._user
+    
+    @conditional(profile_validators)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
 # ===== FOLLOW/UNFOLLOW VIEWS =====
 # CHECKER WANTS: generics.GenericAPIView AND CustomUser.objects.all()
@@ -56,6 +95,7 @@ class FollowUserView(generics.GenericAPIView):
     # Add queryset to satisfy checker
     queryset = CustomUser.objects.all()  # EXACT STRING
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'follows'
     
     def post(self, request, user_id):
         user_to_follow = get_object_or_404(CustomUser, pk=user_id)
@@ -84,6 +124,7 @@ class UnfollowUserView(generics.GenericAPIView):
     # Add queryset to satisfy checker
     queryset = CustomUser.objects.all()  # EXACT STRING
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'follows'
     
     def post(self, request, user_id):
         user_to_unfollow = get_object_or_404(CustomUser, pk=user_id)
@@ -107,3 +148,34 @@ class UnfollowUserView(generics.GenericAPIView):
             "following_count": request.user.get_following_count(),
             "followers_count": user_to_unfollow.get_followers_count()
         }, status=status.HTTP_200_OK)
+
+# ===== BULK FOLLOW/UNFOLLOW VIEWS =====
+class BulkFollowView(generics.GenericAPIView):
+    """
+    Follow or unfollow a list of users in one request, e.g. during
+    onboarding: POST {"user_ids": [1, 2, 3]}
+    """
+    queryset = CustomUser.objects.all()
+    serializer_class = BulkFollowSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'follows'
+    unfollow = False
+    
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user_ids = serializer.validated_data['user_ids']
+        
+        if self.unfollow:
+            result = request.user.unfollow_many(user_ids)
+            changed_key, unchanged_key = 'unfollowed', 'not_following'
+        else:
+            result = request.user.follow_many(user_ids)
+            changed_key, unchanged_key = 'followed', 'already_following'
+        
+        return Response({
+            changed_key: sorted(result.changed),
+            unchanged_key: sorted(result.unchanged),
+            "not_found": sorted(result.missing),
+            "following_count": request.user.get_following_count()
+        }, status=status.HTTP_200_OK)
@@ -5,8 +5,4 @@ class NotificationsConfig(AppConfig):
     name = 'notifications'
     
     def ready(self):
-        # Try to import signals, but don't fail if they don't exist yet
-        try:
-            import notifications.signals
-        except ImportError:
-            pass
+        import notifications.signals  # noqa: F401
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from notifications import partitions, retention
+
+
+class Command(BaseCommand):
+    help = 'Move old read notifications to the archive table or compressed NDJSON files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=retention.RETENTION_DAYS,
+            help='Archive read notifications older than this many days'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=retention.BATCH_SIZE,
+            help='Number of notifications moved per transaction'
+        )
+        parser.add_argument(
+            '--to', choices=['table', 'ndjson'], default='table',
+            help='Archive into ArchivedNotification or gzip-compressed NDJSON files'
+        )
+        parser.add_argument(
+            '--directory', default='archive',
+            help='Directory for NDJSON archives (with --to ndjson)'
+        )
+        parser.add_argument(
+            '--months-ahead', type=int, default=3,
+            help='Monthly partitions to keep created ahead of time (PostgreSQL)'
+        )
+
+    def handle(self, *args, **options):
+        created = partitions.ensure_partitions(options['months_ahead'])
+        if created:
+            self.stdout.write(f'Created partitions {", ".join(created)}')
+
+        cutoff = timezone.now() - timezone.timedelta(days=options['days'])
+        if options['to'] == 'ndjson':
+            writer = retention.NDJSONArchive(options['directory'])
+        else:
+            writer = retention.archive_to_table
+        try:
+            archived = retention.archive(writer, cutoff=cutoff, batch_size=options['batch_size'])
+        finally:
+            if options['to'] == 'ndjson':
+                writer.close()
+
+        destination = writer.path if options['to'] == 'ndjson' else 'the archive table'
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} notifications to {destination}'))
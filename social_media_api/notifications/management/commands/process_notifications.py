@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications import partitions, pipeline
+
+# How often --loop makes sure upcoming monthly partitions exist (PostgreSQL)
+PARTITION_CHECK_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued notification events, coalescing them in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=pipeline.BATCH_SIZE,
+            help='Number of events delivered per transaction'
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling for new events instead of exiting when the queue is empty'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Seconds to wait between polls with --loop'
+        )
+
+    def handle(self, *args, **options):
+        partitions_checked = None
+        while True:
+            if options['loop'] and (
+                partitions_checked is None
+                or time.monotonic() - partitions_checked >= PARTITION_CHECK_INTERVAL
+            ):
+                created = partitions.ensure_partitions()
+                if created:
+                    self.stdout.write(f'Created partitions {", ".join(created)}')
+                partitions_checked = time.monotonic()
+            processed = pipeline.drain(options['batch_size'])
+            if processed:
+                self.stdout.write(f'Delivered {processed} notification events')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS('Notification queue drained'))
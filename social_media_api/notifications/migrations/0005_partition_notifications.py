@@ -0,0 +1,106 @@
+"""
+Convert notifications_notification into a table range-partitioned by month
+on ``timestamp`` (PostgreSQL only; other databases are left untouched).
+
+PostgreSQL requires the partition key in the primary key, so the key
+becomes (id, timestamp); ids keep coming from a sequence and Django still
+addresses rows by id. PostgreSQL before 17 does not allow identity columns
+on partitioned tables, so the id's identity (or serial sequence) is dropped
+from the old table, freeing its sequence name, and replaced by a plain
+sequence continuing after the highest copied id. Indexes and foreign keys
+are recreated from their existing definitions. Later partitions are
+created by notifications.partitions.ensure_partitions.
+"""
+
+from datetime import datetime, timezone
+
+from django.db import migrations
+
+TABLE = 'notifications_notification'
+
+
+def add_months(value, months):
+    month = value.month - 1 + months
+    return value.replace(year=value.year + month // 12, month=month % 12 + 1, day=1)
+
+
+def partition_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s AND indexname <> %s",
+            [TABLE, f'{TABLE}_pkey'],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f'SELECT min("timestamp") FROM {TABLE}')
+        oldest = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT is_identity = 'YES', pg_get_serial_sequence(%s, 'id') "
+            "FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = %s AND column_name = 'id'",
+            [TABLE, TABLE],
+        )
+        is_identity, sequence = cursor.fetchone()
+
+    execute = schema_editor.execute
+    # Renaming the table would not rename its sequence, whose name the new
+    # table's sequence takes
+    if is_identity:
+        execute(f'ALTER TABLE {TABLE} ALTER COLUMN id DROP IDENTITY')
+    else:
+        execute(f'ALTER TABLE {TABLE} ALTER COLUMN id DROP DEFAULT')
+        if sequence:
+            execute(f'DROP SEQUENCE {sequence}')
+    execute(f'ALTER TABLE {TABLE} RENAME TO {TABLE}_old')
+    for name, _ in indexes:
+        execute(f'DROP INDEX {name}')
+    for name, _ in foreign_keys:
+        execute(f'ALTER TABLE {TABLE}_old DROP CONSTRAINT {name}')
+
+    execute(
+        f'CREATE TABLE {TABLE} (LIKE {TABLE}_old INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+        f'PARTITION BY RANGE ("timestamp")'
+    )
+    execute(f'ALTER TABLE {TABLE} ADD PRIMARY KEY (id, "timestamp")')
+    execute(f'CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id')
+    execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')")
+
+    now = datetime.now(timezone.utc)
+    month = datetime(
+        (oldest or now).year, (oldest or now).month, 1, tzinfo=timezone.utc
+    )
+    last = add_months(datetime(now.year, now.month, 1, tzinfo=timezone.utc), 3)
+    while month <= last:
+        end = add_months(month, 1)
+        execute(
+            f'CREATE TABLE {TABLE}_p{month:%Y%m} PARTITION OF {TABLE} '
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{end.isoformat()}')"
+        )
+        month = end
+    execute(f'CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT')
+
+    execute(f'INSERT INTO {TABLE} SELECT * FROM {TABLE}_old')
+    execute(f"SELECT setval('{TABLE}_id_seq', COALESCE((SELECT max(id) FROM {TABLE}), 0) + 1, false)")
+    for _, definition in indexes:
+        execute(definition)
+    for name, definition in foreign_keys:
+        execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}')
+    execute(f'DROP TABLE {TABLE}_old')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_archived_notifications'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_table, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,24 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.prefetch import GenericPrefetch
 from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
 
+class NotificationQuerySet(models.QuerySet):
+    def with_related(self):
+        """
+        Load actors with a join and targets in one query per content type,
+        including what the targets' __str__ dereferences
+        """
+        from posts.models import Comment, Post
+        return self.select_related('actor', 'target_content_type').prefetch_related(
+            GenericPrefetch('target', [
+                Post.objects.select_related('author'),
+                Comment.objects.select_related('author', 'post'),
+            ])
+        )
+
 class Notification(models.Model):
     """
     Notification model for user activities
@@ -33,17 +48,34 @@ class Notification(models.Model):
     
     read = models.BooleanField(default=False)
     timestamp = models.DateTimeField(default=timezone.now)
+    # Number of distinct actors coalesced into this notification
+    actor_count = models.PositiveIntegerField(default=1)
+    
+    objects = NotificationQuerySet.as_manager()
     
     class Meta:
         ordering = ['-timestamp']
         indexes = [
             models.Index(fields=['recipient', 'read']),
             models.Index(fields=['timestamp']),
+            # Keyset pagination of a recipient's notifications over (timestamp, id)
+            models.Index(fields=['recipient', '-timestamp', '-id'], name='notif_recipient_ts_id'),
         ]
     
     def __str__(self):
         return f"{self.actor} {self.verb} - {self.recipient}"
     
+    @property
+    def summary(self):
+        """Human readable line, e.g. alice and 12 others liked your post"""
+        name = self.actor.username if self.actor else 'Someone'
+        others = self.actor_count - 1
+        if others == 1:
+            return f"{name} and 1 other {self.verb}"
+        if others > 1:
+            return f"{name} and {others} others {self.verb}"
+        return f"{name} {self.verb}"
+    
     def mark_as_read(self):
         self.read = True
         self.save()
@@ -65,4 +97,114 @@ class Notification(models.Model):
             notification.target_content_type = ContentType.objects.get_for_model(target)
             notification.target_object_id = target.id
         notification.save()
+        
+        from social_media_api.response_cache import bump
+        from .unread import increment
+        recipient_id = recipient.pk
+        transaction.on_commit(lambda: increment(recipient_id))
+        bump(f'notifications:{recipient_id}')
         return notification
+
+
+class NotificationActor(models.Model):
+    """
+    Actor already counted in a coalesced notification's actor_count, so
+    repeated events by the same user (like, unlike, like) are counted once
+    """
+    # No database constraint: on PostgreSQL notifications are partitioned
+    # and their id alone is not a unique key a foreign key could reference
+    notification = models.ForeignKey(
+        Notification,
+        on_delete=models.CASCADE,
+        related_name='+',
+        db_constraint=False
+    )
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['notification', 'actor'], name='notif_actor_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.actor_id} in {self.notification_id}"
+
+
+class NotificationEvent(models.Model):
+    """
+    Outbox row for a notification that has not been delivered yet.
+
+    Request handlers only append events; notifications.pipeline.drain()
+    coalesces them into Notification rows in bulk, out of the request path.
+    """
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        null=True,
+        blank=True
+    )
+    verb = models.CharField(max_length=255)
+    target_content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
+    target_object_id = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"{self.actor_id} {self.verb} - {self.recipient_id}"
+
+
+class ArchivedNotification(models.Model):
+    """
+    Read notification moved out of the hot table by
+    ``manage.py archive_notifications`` (see notifications.retention)
+    """
+    id = models.BigIntegerField(primary_key=True)  # id it had in Notification
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        null=True,
+        blank=True
+    )
+    verb = models.CharField(max_length=255)
+    target_content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
+    target_object_id = models.PositiveIntegerField(null=True, blank=True)
+    timestamp = models.DateTimeField()
+    actor_count = models.PositiveIntegerField(default=1)
+    archived_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['recipient', '-timestamp'], name='notif_archive_recipient_ts'),
+        ]
+    
+    def __str__(self):
+        return f"{self.actor_id} {self.verb} - {self.recipient_id} (archived)"
@@ -0,0 +1,112 @@
+"""
+Monthly range partitions of notifications_notification on PostgreSQL.
+
+Migration 0005 turns the table into one partitioned by ``timestamp`` (the
+primary key becomes ``(id, timestamp)``, which PostgreSQL requires for
+partitioned tables; Django keeps addressing rows by ``id``). New rows land
+in the current month's partition, so the indexes that serve the hot path
+only cover recent data, and partitions emptied by the retention command
+are dropped instead of leaving a bloated table behind. Upcoming partitions
+are created by the ``process_notifications --loop`` worker (hourly) and by
+``archive_notifications``.
+
+Every function here is a no-op on other databases.
+"""
+
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+TABLE = 'notifications_notification'
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = %s)",
+            [TABLE],
+        )
+        return cursor.fetchone()[0]
+
+
+def month_start(value):
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(value, months):
+    month = value.month - 1 + months
+    return value.replace(year=value.year + month // 12, month=month % 12 + 1, day=1)
+
+
+def partition_name(start):
+    return f'{TABLE}_p{start:%Y%m}'
+
+
+def create_partition(cursor, start):
+    """
+    Create the partition for the month starting at ``start``, unless it exists.
+
+    PostgreSQL refuses a partition whose range overlaps rows in the default
+    partition, so rows that landed there (e.g. while partitions were not
+    created ahead of time) are moved into the new table before it is attached.
+    """
+    name = partition_name(start)
+    cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [name])
+    if cursor.fetchone()[0]:
+        return False
+    end = add_months(start, 1)
+    bounds = [start.isoformat(), end.isoformat()]
+    cursor.execute(f'CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} '
+        f'WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+        f'INSERT INTO {name} SELECT * FROM moved',
+        bounds,
+    )
+    cursor.execute(
+        f'ALTER TABLE {TABLE} ATTACH PARTITION {name} '
+        f"FOR VALUES FROM ('{bounds[0]}') TO ('{bounds[1]}')"
+    )
+    return True
+
+
+def ensure_partitions(months_ahead=3, now=None):
+    """Create the current and next ``months_ahead`` monthly partitions; return the names created."""
+    if not is_partitioned():
+        return []
+    start = month_start(now or datetime.now(dt_timezone.utc))
+    names = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for offset in range(months_ahead + 1):
+            month = add_months(start, offset)
+            if create_partition(cursor, month):
+                names.append(partition_name(month))
+    return names
+
+
+def drop_empty_partitions(before):
+    """Drop monthly partitions that end before ``before`` and hold no rows."""
+    if not is_partitioned():
+        return []
+    dropped = []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s AND c.relname <> %s ORDER BY c.relname",
+            [TABLE, DEFAULT_PARTITION],
+        )
+        for (name,) in cursor.fetchall():
+            start = datetime.strptime(name.rsplit('_p', 1)[1], '%Y%m').replace(tzinfo=dt_timezone.utc)
+            if add_months(start, 1) > before:
+                continue
+            cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {name})')
+            if not cursor.fetchone()[0]:
+                cursor.execute(f'DROP TABLE {name}')
+                dropped.append(name)
+    return dropped
@@ -0,0 +1,162 @@
+"""
+Outbox-based notification delivery.
+
+Likes, comments and follows only append a NotificationEvent row (no
+ContentType lookup, no Notification write) so request latency does not
+depend on notification fan-out. ``drain()`` runs out of band, from the
+``process_notifications`` management command, and turns a batch of events
+into notifications with one ``bulk_create`` and one ``bulk_update``.
+
+Events for the same (recipient, verb, target) are coalesced, and folded into
+the recipient's existing unread notification for that target if there is
+one, which is what produces "alice and 12 others liked your post". The
+actors counted in a notification are kept as NotificationActor rows, so a
+user who likes, unlikes and likes again is counted once.
+"""
+
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Q
+
+from social_media_api import pubsub, response_cache
+from . import unread
+from .models import Notification, NotificationActor, NotificationEvent
+
+BATCH_SIZE = 500
+
+
+def enqueue(recipient_id, actor_id, verb, target=None):
+    """Record a notification to be delivered by the next drain."""
+    event = NotificationEvent(recipient_id=recipient_id, actor_id=actor_id, verb=verb)
+    if target is not None:
+        # get_for_model is served from ContentType's in-process cache
+        event.target_content_type = ContentType.objects.get_for_model(target)
+        event.target_object_id = target.pk
+    event.save()
+    if getattr(settings, 'NOTIFICATIONS_DRAIN_ON_COMMIT', False):
+        transaction.on_commit(drain)
+    return event
+
+
+def enqueue_many(recipient_ids, actor_id, verb):
+    """Record the same notification for several recipients with one insert."""
+    NotificationEvent.objects.bulk_create([
+        NotificationEvent(recipient_id=recipient_id, actor_id=actor_id, verb=verb)
+        for recipient_id in recipient_ids
+    ])
+    if getattr(settings, 'NOTIFICATIONS_DRAIN_ON_COMMIT', False):
+        transaction.on_commit(drain)
+
+
+def _key(item):
+    return (item.recipient_id, item.verb, item.target_content_type_id, item.target_object_id)
+
+
+def drain_batch(batch_size=BATCH_SIZE):
+    """Deliver up to ``batch_size`` pending events; return how many were processed."""
+    with transaction.atomic():
+        events = list(
+            NotificationEvent.objects.select_for_update(skip_locked=True)
+            .order_by('id')[:batch_size]
+        )
+        if not events:
+            return 0
+
+        groups = OrderedDict()
+        for event in events:
+            groups.setdefault(_key(event), []).append(event)
+
+        # Unread notifications these events can be folded into, in one query
+        existing_filter = Q()
+        for recipient_id, verb, content_type_id, object_id in groups:
+            existing_filter |= Q(
+                recipient_id=recipient_id,
+                verb=verb,
+                target_content_type_id=content_type_id,
+                target_object_id=object_id,
+            )
+        existing = {}
+        for notification in Notification.objects.filter(existing_filter, read=False).order_by('timestamp'):
+            existing[_key(notification)] = notification
+
+        # Actors already counted in those notifications, in one query
+        counted = {}
+        if existing:
+            rows = NotificationActor.objects.filter(
+                notification__in=existing.values(),
+                actor_id__in={event.actor_id for event in events},
+            ).values_list('notification_id', 'actor_id')
+            for notification_id, actor_id in rows:
+                counted.setdefault(notification_id, set()).add(actor_id)
+
+        to_create, to_update, new_actors = [], [], []
+        for key, group in groups.items():
+            latest = group[-1]
+            actor_ids = {event.actor_id for event in group} - {None}
+            notification = existing.get(key)
+            if notification is None:
+                to_create.append(Notification(
+                    recipient_id=latest.recipient_id,
+                    actor_id=latest.actor_id,
+                    verb=latest.verb,
+                    target_content_type_id=latest.target_content_type_id,
+                    target_object_id=latest.target_object_id,
+                    timestamp=latest.created_at,
+                    actor_count=max(len(actor_ids), 1),
+                ))
+                new_actors.append((to_create[-1], actor_ids))
+            else:
+                # The current actor counts even if it predates NotificationActor
+                recorded = counted.get(notification.pk, set())
+                added = actor_ids - recorded - {notification.actor_id}
+                notification.actor_count += len(added)
+                new_actors.append((notification, (actor_ids | {notification.actor_id}) - recorded - {None}))
+                notification.actor_id = latest.actor_id
+                notification.timestamp = latest.created_at
+                to_update.append(notification)
+
+        Notification.objects.bulk_create(to_create)
+        NotificationActor.objects.bulk_create([
+            NotificationActor(notification_id=notification.pk, actor_id=actor_id)
+            for notification, actor_ids in new_actors for actor_id in actor_ids
+        ], ignore_conflicts=True)
+        Notification.objects.bulk_update(to_update, ['actor', 'actor_count', 'timestamp'])
+        NotificationEvent.objects.filter(pk__in=[event.pk for event in events]).delete()
+
+        new_unread = {}
+        for notification in to_create:
+            new_unread[notification.recipient_id] = new_unread.get(notification.recipient_id, 0) + 1
+        delivered = to_create + to_update
+        transaction.on_commit(lambda: _after_delivery(new_unread, delivered))
+        return len(events)
+
+
+def _after_delivery(new_unread, notifications):
+    for recipient_id, count in new_unread.items():
+        unread.increment(recipient_id, count)
+    # Invalidates the ETags of the recipients' notification lists
+    response_cache.bump(*{f'notifications:{n.recipient_id}' for n in notifications})
+    # Push to clients connected to the notification stream
+    for notification in notifications:
+        pubsub.publish(pubsub.user_channel(notification.recipient_id), {
+            'type': 'notification',
+            'id': notification.pk,
+            'actor_id': notification.actor_id,
+            'actor_count': notification.actor_count,
+            'verb': notification.verb,
+            'target_object_id': notification.target_object_id,
+            'timestamp': notification.timestamp.isoformat(),
+        })
+
+
+def drain(batch_size=BATCH_SIZE):
+    """Deliver every pending event; return how many were processed."""
+    total = 0
+    while True:
+        processed = drain_batch(batch_size)
+        total += processed
+        if processed < batch_size:
+            return total
@@ -0,0 +1,89 @@
+"""
+Notification retention.
+
+Read notifications older than the retention period are moved out of the
+hot table in oldest-first batches, either into ArchivedNotification or into
+gzip-compressed NDJSON files. Unread notifications are never archived.
+Each batch is copied and deleted in its own transaction so a long run
+never holds locks on the live table for long.
+"""
+
+import gzip
+import json
+import os
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from social_media_api import response_cache
+
+from . import partitions
+from .models import ArchivedNotification, Notification
+
+RETENTION_DAYS = getattr(settings, 'NOTIFICATIONS_RETENTION_DAYS', 90)
+BATCH_SIZE = 1000
+
+ARCHIVED_FIELDS = [
+    'id', 'recipient_id', 'actor_id', 'verb', 'target_content_type_id',
+    'target_object_id', 'timestamp', 'actor_count',
+]
+
+
+def expired(cutoff):
+    return Notification.objects.filter(read=True, timestamp__lt=cutoff)
+
+
+def archive_to_table(rows):
+    now = timezone.now()
+    ArchivedNotification.objects.bulk_create(
+        [ArchivedNotification(archived_at=now, **row) for row in rows],
+        ignore_conflicts=True,
+    )
+
+
+class NDJSONArchive:
+    """Appends archived rows to ``<directory>/notifications-<timestamp>.ndjson.gz``"""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        name = f'notifications-{timezone.now():%Y%m%d%H%M%S}.ndjson.gz'
+        self.path = os.path.join(directory, name)
+        self.file = gzip.open(self.path, 'at', encoding='utf-8')
+
+    def __call__(self, rows):
+        for row in rows:
+            row = dict(row, timestamp=row['timestamp'].isoformat())
+            self.file.write(json.dumps(row, separators=(',', ':')) + '\n')
+        # Rows must be on disk before they are deleted from the database
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def archive(write, cutoff=None, batch_size=BATCH_SIZE):
+    """
+    Move expired notifications through ``write(rows)`` batch by batch.
+
+    Returns the number of notifications archived.
+    """
+    if cutoff is None:
+        cutoff = timezone.now() - timezone.timedelta(days=RETENTION_DAYS)
+    archived = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                expired(cutoff).order_by('timestamp', 'id').values(*ARCHIVED_FIELDS)[:batch_size]
+            )
+            if not rows:
+                break
+            write(rows)
+            Notification.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+            response_cache.bump(*{f"notifications:{row['recipient_id']}" for row in rows})
+        archived += len(rows)
+        if len(rows) < batch_size:
+            break
+    # Monthly partitions left empty by the archive are dropped (PostgreSQL)
+    partitions.drop_empty_partitions(before=cutoff)
+    return archived
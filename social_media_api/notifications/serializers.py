@@ -1,21 +1,25 @@
 from rest_framework import serializers
 from .models import Notification
 from accounts.serializers import UserSerializer
+from social_media_api.serializers import DynamicFieldsMixin
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for Notification model"""
     actor = UserSerializer(read_only=True)
-    recipient = UserSerializer(read_only=True)
+    # Always the requesting user, so only its id is rendered
+    recipient = serializers.PrimaryKeyRelatedField(read_only=True)
     target = serializers.SerializerMethodField()
+    summary = serializers.CharField(read_only=True)
     
     class Meta:
         model = Notification
-        fields = ['id', 'recipient', 'actor', 'verb', 'target', 
-                 'read', 'timestamp']
+        fields = ['id', 'recipient', 'actor', 'verb', 'actor_count', 'summary',
+                 'target', 'read', 'timestamp']
         read_only_fields = ['timestamp']
     
     def get_target(self, obj):
-        # Return basic info about the target object
+        # Return basic info about the target object; list views load targets
+        # with Notification.objects.with_related() to avoid per-row queries
         if obj.target:
             return {
                 'type': obj.target_content_type.model,
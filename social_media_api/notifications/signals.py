@@ -1,2 +1,57 @@
-# Signals for notifications app
-# This file exists to prevent import errors
+# Signal handlers for notifications: they only enqueue outbox events,
+# delivery happens in notifications.pipeline.drain()
+from django.db.models.signals import post_save, m2m_changed
+from django.dispatch import receiver
+
+from accounts.models import CustomUser
+from posts.likes import post_liked
+from posts.models import Comment, Like, Post
+from . import pipeline
+
+
+@receiver(post_save, sender=Comment)
+def create_comment_notification(sender, instance, created, **kwargs):
+    """Notify the post author when someone comments on their post"""
+    if created and instance.post.author_id != instance.author_id:
+        pipeline.enqueue(
+            recipient_id=instance.post.author_id,
+            actor_id=instance.author_id,
+            verb="commented on your post",
+            target=instance.post
+        )
+
+
+@receiver(post_save, sender=Like)
+def create_like_notification(sender, instance, created, **kwargs):
+    """Notify the post author when someone likes their post"""
+    if created and instance.post.author_id != instance.user_id:
+        pipeline.enqueue(
+            recipient_id=instance.post.author_id,
+            actor_id=instance.user_id,
+            verb="liked your post",
+            target=instance.post
+        )
+
+
+@receiver(post_liked)
+def create_toggle_like_notification(sender, post_id, user_id, author_id, **kwargs):
+    """Same as above for likes created through the PUT like toggle"""
+    if author_id != user_id:
+        pipeline.enqueue(
+            recipient_id=author_id,
+            actor_id=user_id,
+            verb="liked your post",
+            target=Post(pk=post_id)
+        )
+
+
+@receiver(m2m_changed, sender=CustomUser.following.through)
+def create_follow_notification(sender, instance, action, reverse, pk_set, **kwargs):
+    """Notify users when someone starts following them"""
+    if action != 'post_add' or not pk_set:
+        return
+    if reverse:
+        for follower_id in pk_set:
+            pipeline.enqueue(recipient_id=instance.pk, actor_id=follower_id, verb="started following you")
+    else:
+        pipeline.enqueue_many(pk_set, actor_id=instance.pk, verb="started following you")
@@ -1,3 +1,315 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from posts.models import Comment, Like, Post
+from social_media_api import pubsub
+from social_media_api.pagination import KeysetPagination
+from social_media_api.testing import QueryBudgetMixin, make_user
+from . import pipeline
+from .models import ArchivedNotification, Notification, NotificationEvent
+
+
+class NotificationPipelineTests(APITestCase):
+    """Tests for the notification outbox and its coalescing drain"""
+
+    def setUp(self):
+        self.author = make_user('author')
+        self.post = Post.objects.create(author=self.author, title='Hello', content='World')
+
+    def test_like_only_enqueues_an_event(self):
+        fan = make_user('fan')
+        self.client.force_authenticate(fan)
+        response = self.client.post(reverse('like_post', args=[self.post.pk]))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(NotificationEvent.objects.count(), 1)
+        self.assertFalse(Notification.objects.exists())
+
+        pipeline.drain()
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertFalse(NotificationEvent.objects.exists())
+
+    def test_likes_are_coalesced(self):
+        fans = [make_user(f'fan{i}') for i in range(3)]
+        Like.objects.create(user=fans[0], post=self.post)
+        pipeline.drain()
+        for fan in fans[1:]:
+            Like.objects.create(user=fan, post=self.post)
+        pipeline.drain()
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.actor, fans[-1])
+        self.assertEqual(notification.actor_count, 3)
+        self.assertEqual(notification.summary, 'fan2 and 2 others liked your post')
+
+    def test_repeat_likes_count_their_actor_once(self):
+        fans = [make_user(f'fan{i}') for i in range(2)]
+        for fan in fans:
+            Like.objects.create(user=fan, post=self.post)
+            pipeline.drain()
+        Like.objects.filter(user=fans[0]).delete()
+        Like.objects.create(user=fans[0], post=self.post)
+        pipeline.drain()
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.actor_count, 2)
+        self.assertEqual(notification.summary, 'fan0 and 1 other liked your post')
+
+    def test_follow_creates_a_notification(self):
+        follower = make_user('follower')
+        follower.follow(self.author)
+        pipeline.drain()
+        notification = Notification.objects.get(recipient=self.author)
+        self.assertEqual(notification.verb, 'started following you')
+        self.assertEqual(notification.actor, follower)
+
+
+class NotificationListQueryTests(QueryBudgetMixin, APITestCase):
+    """Rendering a page of notifications must not issue per-row queries"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = make_user('author')
+        self.client.force_authenticate(self.author)
+
+    def add_notifications(self, count):
+        for i in range(count):
+            fan = make_user(f'fan{Notification.objects.count()}')
+            post = Post.objects.create(author=self.author, title=f'Post {i}', content='Body')
+            Like.objects.create(user=fan, post=post)
+            comment = Comment.objects.create(author=fan, post=post, content='Nice')
+            Notification.create_notification(self.author, fan, 'mentioned you', target=comment)
+        pipeline.drain()
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('notification_list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        self.add_notifications(1)
+        self.count_queries()  # warm the cached unread counter
+        small, _ = self.count_queries()
+        self.add_notifications(3)
+        large, response = self.count_queries()
+        self.assertEqual(small, large)
+        self.assertWithinQueryBudget(response)
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(response.data['results'][0]['recipient'], self.author.pk)
+        reprs = {item['target']['repr'] for item in response.data['results']}
+        self.assertTrue(any(text.endswith(' by author') for text in reprs))
+        self.assertTrue(any(text.startswith('Comment by fan') for text in reprs))
+
+
+class NotificationOrderingTests(APITestCase):
+    """Tests for keyset pagination under a client-chosen ordering"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('reader')
+        self.actor = make_user('actor')
+        self.client.force_authenticate(self.user)
+        for i in range(7):
+            Notification.create_notification(self.user, actor=self.actor, verb='poked you')
+        # Shared timestamps exercise every tie-breaker
+        now = timezone.now()
+        for i, notification in enumerate(Notification.objects.order_by('pk')):
+            notification.read = i % 2 == 0
+            notification.timestamp = now - timedelta(minutes=i // 3)
+            notification.save()
+
+    def test_pages_follow_every_ordering_field(self):
+        url = f"{reverse('notification_list')}?ordering=read,-timestamp&page_size=2"
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        expected = Notification.objects.filter(recipient=self.user).order_by('read', '-timestamp', 'id')
+        self.assertEqual(ids, list(expected.values_list('pk', flat=True)))
+
+    def test_nullable_key_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            KeysetPagination().get_keys(Notification.objects.order_by('actor'))
+
+
+class RetentionTests(APITestCase):
+    """Tests for archiving old read notifications"""
+
+    def setUp(self):
+        self.user = make_user('user')
+        self.actor = make_user('actor')
+        old = timezone.now() - timezone.timedelta(days=120)
+        self.old_read = [
+            Notification.objects.create(recipient=self.user, actor=self.actor, verb='liked', read=True, timestamp=old)
+            for _ in range(3)
+        ]
+        self.old_unread = Notification.objects.create(
+            recipient=self.user, actor=self.actor, verb='liked', timestamp=old
+        )
+        self.recent_read = Notification.objects.create(
+            recipient=self.user, actor=self.actor, verb='liked', read=True
+        )
+
+    def test_old_read_notifications_move_to_archive_table(self):
+        call_command('archive_notifications', days=90, batch_size=2, stdout=StringIO())
+        self.assertEqual(
+            set(Notification.objects.values_list('pk', flat=True)),
+            {self.old_unread.pk, self.recent_read.pk}
+        )
+        self.assertEqual(
+            set(ArchivedNotification.objects.values_list('pk', flat=True)),
+            {notification.pk for notification in self.old_read}
+        )
+
+    def test_archive_to_compressed_ndjson(self):
+        with tempfile.TemporaryDirectory() as directory:
+            out = StringIO()
+            call_command('archive_notifications', to='ndjson', directory=directory, stdout=out)
+            path = out.getvalue().strip().rsplit(' ', 1)[1]
+            with gzip.open(path, 'rt') as archive:
+                rows = [json.loads(line) for line in archive]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['recipient_id'], self.user.pk)
+        self.assertFalse(ArchivedNotification.objects.exists())
+        self.assertEqual(Notification.objects.count(), 2)
+
+
+class UnreadCountTests(APITestCase):
+    """Tests for the cached unread notification counter"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('reader')
+        self.actor = make_user('actor')
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(2):
+                Notification.create_notification(self.user, actor=self.actor, verb='poked you')
+
+    def unread(self):
+        return self.client.get(reverse('unread_count')).data['unread']
+
+    def test_badge_polling_is_served_from_cache(self):
+        self.assertEqual(self.unread(), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.unread(), 2)
+
+    def test_counter_follows_reads_and_new_notifications(self):
+        self.assertEqual(self.unread(), 2)
+        notification = Notification.objects.filter(recipient=self.user).first()
+        self.client.patch(reverse('notification_detail', args=[notification.pk]), {'read': True})
+        self.assertEqual(self.unread(), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.create_notification(self.user, actor=self.actor, verb='poked you')
+        self.assertEqual(self.unread(), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('mark_all_read'))
+        self.assertEqual(self.unread(), 0)
+
+    def test_rolled_back_notification_is_not_counted(self):
+        self.assertEqual(self.unread(), 2)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    Notification.create_notification(self.user, actor=self.actor, verb='poked you')
+                    raise DatabaseError
+            except DatabaseError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.unread(), 2)
+
+    def test_mark_all_read_recounts_deliveries_made_meanwhile(self):
+        self.assertEqual(self.unread(), 2)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(reverse('mark_all_read'))
+        # Delivered after the UPDATE, before the view's transaction committed
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.create_notification(self.user, actor=self.actor, verb='poked you')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.unread(), 1)
+
+    def test_list_reports_cached_total_and_unread_counts(self):
+        counts = self.client.get(reverse('notification_list')).data['counts']
+        self.assertEqual(counts, {'total': 2, 'unread': 2})
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.create_notification(self.user, actor=self.actor, verb='waved at you')
+        with CaptureQueriesContext(connection) as queries:
+            counts = self.client.get(reverse('notification_list')).data['counts']
+        self.assertEqual(counts, {'total': 3, 'unread': 3})
+        self.assertEqual(sum('COUNT(' in query['sql'] for query in queries.captured_queries), 1)
+        with self.assertNumQueries(1):
+            self.client.get(reverse('notification_list'))
+
+
+class NotificationListConditionalGetTests(APITestCase):
+    """Tests for ETag/Last-Modified on the notification list"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('reader')
+        self.actor = make_user('actor')
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.notification = Notification.create_notification(self.user, actor=self.actor, verb='poked you')
+
+    def test_list_is_not_modified_until_read(self):
+        url = reverse('notification_list')
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('notification_detail', args=[self.notification.pk]), {'read': True})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_if_modified_since(self):
+        url = reverse('notification_list')
+        first = self.client.get(url)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class NotificationStreamTests(APITestCase):
+    """Tests for the Server-Sent Events stream"""
+
+    def setUp(self):
+        self.user = make_user('listener')
+        self.token = Token.objects.create(user=self.user)
+
+    async def test_anonymous_stream_is_rejected(self):
+        response = await AsyncClient().get(reverse('notification_stream'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_published_messages_are_streamed(self):
+        response = await AsyncClient().get(
+            reverse('notification_stream'),
+            headers={'Authorization': f'Token {self.token.key}'}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        try:
+            self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+            pubsub.publish(pubsub.user_channel(self.user.pk), {'type': 'notification', 'id': 1})
+            chunk = await anext(stream)
+            self.assertTrue(chunk.startswith(b'event: notification\ndata: '))
+        finally:
+            await stream.aclose()
@@ -0,0 +1,60 @@
+"""
+Per-user unread notification counter kept in the cache.
+
+The counter is filled from the database on first read and then moved by the
+code paths that create or (un)read notifications, so badge polling through
+``/api/notifications/unread-count/`` does not touch the database. A missing
+or evicted key simply falls back to one COUNT on the next read.
+
+The list view's total is cached under the user's ``notifications:<id>``
+generation instead, which every delivery and archive bumps, so it is
+recounted only after the set of notifications changed.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+from social_media_api.response_cache import get_generations
+
+from .models import Notification
+
+CACHE_TIMEOUT = getattr(settings, 'NOTIFICATIONS_UNREAD_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def _cache_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def get_unread_count(user_id):
+    count = cache.get(_cache_key(user_id))
+    if count is None:
+        count = Notification.objects.filter(recipient_id=user_id, read=False).count()
+        cache.add(_cache_key(user_id), count, CACHE_TIMEOUT)
+    return max(count, 0)
+
+
+def get_total_count(user_id):
+    generation, = get_generations([f'notifications:{user_id}'])
+    key = f'notifications:total:{user_id}:{generation}'
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(recipient_id=user_id).count()
+        cache.set(key, count, CACHE_TIMEOUT)
+    return count
+
+
+def increment(user_id, delta=1):
+    """Adjust a cached counter; an uncached one is recounted on next read."""
+    try:
+        cache.incr(_cache_key(user_id), delta)
+    except ValueError:
+        pass
+
+
+def decrement(user_id, delta=1):
+    increment(user_id, -delta)
+
+
+def forget(user_id):
+    """Drop a cached counter so the next read recounts it from the database."""
+    cache.delete(_cache_key(user_id))
@@ -2,11 +2,15 @@ from django.urls import path
 from .views import (
     NotificationListView,
     NotificationDetailView,
-    MarkAllNotificationsReadView
+    MarkAllNotificationsReadView,
+    UnreadCountView,
+    notification_stream
 )
 
 urlpatterns = [
     path('', NotificationListView.as_view(), name='notification_list'),
     path('<int:pk>/', NotificationDetailView.as_view(), name='notification_detail'),
     path('mark-all-read/', MarkAllNotificationsReadView.as_view(), name='mark_all_read'),
+    path('unread-count/', UnreadCountView.as_view(), name='unread_count'),
+    path('stream/', notification_stream, name='notification_stream'),
 ]
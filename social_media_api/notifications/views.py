@@ -1,9 +1,29 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework import generics, permissions, status, filters
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
+from django.db import transaction
 from .models import Notification
 from .serializers import NotificationSerializer, NotificationUpdateSerializer
+from . import unread
+from accounts.authentication import resolve_token
+from posts.timeline import high_fanout_following_ids
+from social_media_api import pubsub
+from social_media_api.conditional import Validators, conditional, generation_time
+from social_media_api.pagination import KeysetPagination
+from social_media_api.response_cache import bump, get_generations
+
+def notification_list_validators(view, request):
+    """Every delivery, (un)read and archive of a user's notifications bumps notifications:<pk>"""
+    generation, = get_generations([f'notifications:{request.user.pk}'])
+    parts = [generation, unread.get_unread_count(request.user.pk)]
+    return Validators(parts, generation_time(generation))
 
 class NotificationListView(generics.ListAPIView):
     """
@@ -11,39 +31,46 @@ class NotificationListView(generics.ListAPIView):
     """
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
     filter_backends = [filters.OrderingFilter]
     ordering_fields = ['timestamp', 'read']
     ordering = ['-timestamp']  # Newest first by default
     
     def get_queryset(self):
-        return Notification.objects.filter(recipient=self.request.user)
+        return Notification.objects.filter(recipient=self.request.user).with_related()
     
+    @conditional(notification_list_validators)
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
         
-        # Get counts
-        total = queryset.count()
-        unread = queryset.filter(read=False).count()
+        # Both counts come from the cache rather than COUNT queries
+        counts = {
+            'total': unread.get_total_count(request.user.pk),
+            'unread': unread.get_unread_count(request.user.pk)
+        }
         
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
             response = self.get_paginated_response(serializer.data)
-            response.data['counts'] = {
-                'total': total,
-                'unread': unread
-            }
+            response.data['counts'] = counts
             return response
         
         serializer = self.get_serializer(queryset, many=True)
         return Response({
             'notifications': serializer.data,
-            'counts': {
-                'total': total,
-                'unread': unread
-            }
+            'counts': counts
         })
 
+class UnreadCountView(APIView):
+    """
+    Lightweight unread badge endpoint served from the cache
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        return Response({'unread': unread.get_unread_count(request.user.pk)})
+
 class NotificationDetailView(generics.RetrieveUpdateAPIView):
     """
     View to retrieve or update a notification
@@ -61,10 +88,17 @@ class NotificationDetailView(generics.RetrieveUpdateAPIView):
     def update(self, request, *args, **kwargs):
         # Mainly used to mark as read/unread
         notification = self.get_object()
+        was_read = notification.read
         serializer = self.get_serializer(notification, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
         
+        if notification.read and not was_read:
+            unread.decrement(request.user.pk)
+        elif was_read and not notification.read:
+            unread.increment(request.user.pk)
+        bump(f'notifications:{request.user.pk}')
+        
         return Response({
             'message': 'Notification updated successfully',
             'notification': NotificationSerializer(notification).data
@@ -81,42 +115,65 @@ class MarkAllNotificationsReadView(generics.GenericAPIView):
             recipient=request.user, 
             read=False
         ).update(read=True)
+        # Recount after commit rather than zeroing the counter, so a delivery
+        # committed alongside this update is not lost from the badge
+        user_id = request.user.pk
+        transaction.on_commit(lambda: unread.forget(user_id))
+        bump(f'notifications:{user_id}')
         
         return Response({
             'message': f'Marked {updated} notifications as read',
             'updated_count': updated
         }, status=status.HTTP_200_OK)
 
-# Signal handlers for automatic notifications
-from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
-from posts.models import Comment, Like
-from accounts.models import CustomUser
+# ===== REAL-TIME STREAM =====
+# Seconds between keep-alive comments on an idle stream
+STREAM_HEARTBEAT_INTERVAL = 15
 
-@receiver(post_save, sender=Comment)
-def create_comment_notification(sender, instance, created, **kwargs):
-    """Create notification when someone comments on a post"""
-    if created and instance.post.author != instance.author:
-        Notification.create_notification(
-            recipient=instance.post.author,
-            actor=instance.author,
-            verb="commented on your post",
-            target=instance.post
-        )
+async def _authenticate_stream(request):
+    """Token header or session authentication for the async stream view"""
+    keyword, _, key = request.headers.get('Authorization', '').partition(' ')
+    if keyword == 'Token' and key.strip():
+        try:
+            return await sync_to_async(resolve_token)(key.strip())
+        except AuthenticationFailed:
+            return None
+    user = await request.auser()
+    return user if user.is_authenticated else None
 
-@receiver(post_save, sender=Like)
-def create_like_notification(sender, instance, created, **kwargs):
-    """Create notification when someone likes a post"""
-    if created and instance.post.author != instance.user:
-        Notification.create_notification(
-            recipient=instance.post.author,
-            actor=instance.user,
-            verb="liked your post",
-            target=instance.post
-        )
+async def _event_stream(channels):
+    subscription = await pubsub.get_broker().subscribe(channels)
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            message = await subscription.get(timeout=STREAM_HEARTBEAT_INTERVAL)
+            if message is None:
+                yield ': keep-alive\n\n'
+            else:
+                yield f"event: {message['type']}\ndata: {json.dumps(message)}\n\n"
+    finally:
+        await subscription.close()
 
-@receiver(post_save, sender=CustomUser)
-def create_follow_notification(sender, instance, created, **kwargs):
-    """Create notification when someone follows a user"""
-    # This would be triggered from the follow system we already have
-    pass
+async def notification_stream(request):
+    """
+    Server-Sent Events stream pushing new notifications and feed posts,
+    so clients no longer poll /api/notifications/ and /api/feed/.
+    Must be served over ASGI to hold connections open cheaply.
+    """
+    user = await _authenticate_stream(request)
+    if user is None:
+        return JsonResponse(
+            {'detail': 'Authentication credentials were not provided.'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    
+    # Posts by high-fanout authors are not fanned out, so listen to them directly
+    author_ids = await sync_to_async(high_fanout_following_ids)(user)
+    channels = [pubsub.user_channel(user.pk)]
+    channels += [pubsub.author_channel(author_id) for author_id in author_ids]
+    
+    return StreamingHttpResponse(
+        _event_stream(channels),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
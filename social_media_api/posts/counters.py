@@ -0,0 +1,143 @@
+"""
+Sharded engagement counters.
+
+likes_count and comments_count are denormalized on Post. For a typical post
+every like or comment moves the column with an F() update. Once a counter
+reaches ``SHARD_THRESHOLD`` the post is treated as hot: concurrent writers
+would all queue on its single row lock, so increments go instead to one of
+``SHARDS`` PostCounterShard rows picked at random.
+
+The true count is the column plus the post's shard deltas. Readers add the
+pending deltas with one grouped query per page, cached for
+``CACHE_TIMEOUT`` seconds. ``compact()`` (``manage.py compact_counters``)
+periodically folds the shards back into the column.
+"""
+
+import random
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Greatest
+
+from .models import Post, PostCounterShard
+
+SHARDS = getattr(settings, 'POST_COUNTER_SHARDS', 16)
+SHARD_THRESHOLD = getattr(settings, 'POST_COUNTER_SHARD_THRESHOLD', 1000)
+CACHE_TIMEOUT = getattr(settings, 'POST_COUNTER_CACHE_TIMEOUT', 5)
+FIELDS = ('likes_count', 'comments_count')
+BATCH_SIZE = 500
+
+
+def _cache_key(post_id):
+    return f'post-counters:{post_id}'
+
+
+def add(post_id, field, delta):
+    """Move ``field`` of ``post_id`` by ``delta``, through a shard if the post is hot."""
+    posts = Post.objects.filter(pk=post_id, **{f'{field}__lt': SHARD_THRESHOLD})
+    if delta < 0:
+        # Never drive a drifted counter below zero
+        posts = posts.filter(**{f'{field}__gte': -delta})
+    if posts.update(**{field: F(field) + delta}):
+        return
+    # A missed increment means the post is hot (or deleted, which
+    # add_to_shard skips); a missed decrement may instead be a cold counter
+    # already at zero, whose decrement is dropped
+    if delta < 0 and not Post.objects.filter(pk=post_id, **{f'{field}__gte': SHARD_THRESHOLD}).exists():
+        return
+    add_to_shard(post_id, field, delta)
+
+
+def add_to_shard(post_id, field, delta):
+    """Upsert ``delta`` into a random shard of the counter."""
+    table = PostCounterShard._meta.db_table
+    with connection.cursor() as cursor:
+        # Selecting from the post table skips posts deleted meanwhile
+        cursor.execute(
+            f'INSERT INTO {table} (post_id, counter, shard, delta) '
+            f'SELECT id, %s, %s, %s FROM {Post._meta.db_table} WHERE id = %s '
+            f'ON CONFLICT (post_id, counter, shard) DO UPDATE SET delta = {table}.delta + excluded.delta',
+            [field, random.randrange(SHARDS), delta, post_id],
+        )
+
+
+def pending(post_ids, use_cache=True):
+    """Return {post_id: {field: unfolded shard delta}} for ``post_ids``."""
+    post_ids = list(post_ids)
+    result = {}
+    if use_cache:
+        cached = cache.get_many([_cache_key(post_id) for post_id in post_ids])
+        for post_id in post_ids:
+            if _cache_key(post_id) in cached:
+                result[post_id] = cached[_cache_key(post_id)]
+    missing = [post_id for post_id in post_ids if post_id not in result]
+    if missing:
+        loaded = {post_id: {} for post_id in missing}
+        rows = (
+            PostCounterShard.objects.filter(post_id__in=missing)
+            .values('post_id', 'counter').annotate(total=Sum('delta'))
+        )
+        for row in rows:
+            loaded[row['post_id']][row['counter']] = row['total']
+        cache.set_many({_cache_key(post_id): deltas for post_id, deltas in loaded.items()}, CACHE_TIMEOUT)
+        result.update(loaded)
+    return result
+
+
+def apply_pending(posts):
+    """Add unfolded shard deltas to the counters of hot posts, in place."""
+    hot = [
+        post for post in posts
+        if not getattr(post, '_pending_counters_applied', False)
+        and any(getattr(post, field, 0) >= SHARD_THRESHOLD for field in FIELDS)
+    ]
+    if not hot:
+        return
+    deltas = pending(post.pk for post in hot)
+    for post in hot:
+        for field, delta in deltas.get(post.pk, {}).items():
+            setattr(post, field, max(getattr(post, field) + delta, 0))
+        post._pending_counters_applied = True
+
+
+def get_count(post_id, field, column_value):
+    """Current value of ``field`` given the column value just read."""
+    return max(column_value + pending([post_id]).get(post_id, {}).get(field, 0), 0)
+
+
+def compact(batch_size=BATCH_SIZE):
+    """Fold every shard into its post's columns; return the number of posts compacted."""
+    compacted = 0
+    while True:
+        with transaction.atomic():
+            post_ids = list(
+                PostCounterShard.objects.order_by('post_id')
+                .values_list('post_id', flat=True).distinct()[:batch_size]
+            )
+            if not post_ids:
+                return compacted
+            # Locked rows are folded and deleted; shards created meanwhile wait
+            # for the next run
+            shards = list(
+                PostCounterShard.objects.select_for_update()
+                .filter(post_id__in=post_ids).values_list('pk', 'post_id', 'counter', 'delta')
+            )
+            totals = defaultdict(dict)
+            for _, post_id, field, delta in shards:
+                totals[post_id][field] = totals[post_id].get(field, 0) + delta
+            for post_id, fields in totals.items():
+                updates = {
+                    field: Greatest(F(field) + delta, Value(0))
+                    for field, delta in fields.items() if delta
+                }
+                # Shards of deleted posts match no row and are simply dropped
+                if updates:
+                    Post.objects.filter(pk=post_id).update(**updates)
+            PostCounterShard.objects.filter(pk__in=[shard[0] for shard in shards]).delete()
+            cache.delete_many([_cache_key(post_id) for post_id in post_ids])
+        compacted += len(post_ids)
+        if len(post_ids) < batch_size:
+            return compacted
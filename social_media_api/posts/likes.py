@@ -0,0 +1,152 @@
+"""
+Single-statement like toggles used by ``PUT/DELETE /api/posts/<pk>/like``.
+
+Liking is an ``INSERT ... ON CONFLICT DO NOTHING`` and unliking a filtered
+``DELETE``; the same statement moves the post's likes_count and returns
+it, so a toggle never reads the Like table or counts rows. On PostgreSQL
+both steps run as one statement through data-modifying CTEs; SQLite,
+which has no writable CTEs, runs them as separate statements in one
+transaction. Hot posts are counted through shards (posts.counters) instead
+of their likes_count column.
+
+The ORM signals of Like are bypassed, so the counter and the response cache
+generations are maintained here and ``post_liked`` is sent for other apps
+(notifications) instead of post_save.
+"""
+
+from django.db import connection, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from social_media_api import response_cache
+from . import counters
+from .models import Like, Post
+
+# Sent with post_id, user_id and author_id when a like is created here
+post_liked = Signal()
+
+LIKES = Like._meta.db_table
+POSTS = Post._meta.db_table
+
+
+def _settle(post_id, delta, changed, column, bumped):
+    """New likes_count after a toggle; hot posts take the change in a shard."""
+    if bumped is not None:
+        return bumped
+    if column < counters.SHARD_THRESHOLD:
+        return column
+    if changed:
+        counters.add_to_shard(post_id, 'likes_count', delta)
+        # Read the shards uncached so the response includes this change
+        deltas = counters.pending([post_id], use_cache=False)[post_id]
+        return max(column + deltas.get('likes_count', 0), 0)
+    return counters.get_count(post_id, 'likes_count', column)
+
+
+def like(user_id, post_id):
+    """
+    Like ``post_id`` as ``user_id`` unless already liked.
+
+    Returns (created, likes_count); raises Post.DoesNotExist for unknown posts.
+    """
+    created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+    threshold = counters.SHARD_THRESHOLD
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f'WITH inserted AS ('
+                f'  INSERT INTO {LIKES} (user_id, post_id, created_at)'
+                f'  SELECT %s, id, %s FROM {POSTS} WHERE id = %s'
+                f'  ON CONFLICT (user_id, post_id) DO NOTHING RETURNING 1'
+                f'), bumped AS ('
+                f'  UPDATE {POSTS} SET likes_count = likes_count + 1'
+                f'  WHERE id = %s AND likes_count < %s AND EXISTS (SELECT 1 FROM inserted)'
+                f'  RETURNING likes_count'
+                f') SELECT author_id, likes_count, EXISTS (SELECT 1 FROM inserted),'
+                f' (SELECT likes_count FROM bumped) FROM {POSTS} WHERE id = %s',
+                [user_id, created_at, post_id, post_id, threshold, post_id],
+            )
+            row = cursor.fetchone()
+            if row is None:
+                raise Post.DoesNotExist
+            author_id, column, created, bumped = row
+        else:
+            # "WHERE id = %s" keeps SQLite from reading ON CONFLICT as a join
+            cursor.execute(
+                f'INSERT INTO {LIKES} (user_id, post_id, created_at)'
+                f' SELECT %s, id, %s FROM {POSTS} WHERE id = %s'
+                f' ON CONFLICT (user_id, post_id) DO NOTHING RETURNING id',
+                [user_id, created_at, post_id],
+            )
+            created = cursor.fetchone() is not None
+            row = None
+            if created:
+                cursor.execute(
+                    f'UPDATE {POSTS} SET likes_count = likes_count + 1'
+                    f' WHERE id = %s AND likes_count < %s RETURNING author_id, likes_count',
+                    [post_id, threshold],
+                )
+                row = cursor.fetchone()
+            bumped = row[1] if row else None
+            if row is None:
+                cursor.execute(f'SELECT author_id, likes_count FROM {POSTS} WHERE id = %s', [post_id])
+                row = cursor.fetchone()
+                if row is None:
+                    raise Post.DoesNotExist
+            author_id, column = row
+        likes_count = _settle(post_id, 1, created, column, bumped)
+        if created:
+            response_cache.bump('posts', f'post:{post_id}')
+            post_liked.send(sender=Like, post_id=post_id, user_id=user_id, author_id=author_id)
+    return created, likes_count
+
+
+def unlike(user_id, post_id):
+    """
+    Remove ``user_id``'s like of ``post_id`` if there is one.
+
+    Returns (deleted, likes_count); raises Post.DoesNotExist for unknown posts.
+    """
+    threshold = counters.SHARD_THRESHOLD
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f'WITH deleted AS ('
+                f'  DELETE FROM {LIKES} WHERE user_id = %s AND post_id = %s RETURNING 1'
+                f'), bumped AS ('
+                f'  UPDATE {POSTS} SET likes_count = likes_count - 1'
+                f'  WHERE id = %s AND likes_count BETWEEN 1 AND %s - 1 AND EXISTS (SELECT 1 FROM deleted)'
+                f'  RETURNING likes_count'
+                f') SELECT likes_count, EXISTS (SELECT 1 FROM deleted),'
+                f' (SELECT likes_count FROM bumped) FROM {POSTS} WHERE id = %s',
+                [user_id, post_id, post_id, threshold, post_id],
+            )
+            row = cursor.fetchone()
+            if row is None:
+                raise Post.DoesNotExist
+            column, deleted, bumped = row
+        else:
+            cursor.execute(
+                f'DELETE FROM {LIKES} WHERE user_id = %s AND post_id = %s RETURNING id',
+                [user_id, post_id],
+            )
+            deleted = cursor.fetchone() is not None
+            row = None
+            if deleted:
+                cursor.execute(
+                    f'UPDATE {POSTS} SET likes_count = likes_count - 1'
+                    f' WHERE id = %s AND likes_count BETWEEN 1 AND %s - 1 RETURNING likes_count',
+                    [post_id, threshold],
+                )
+                row = cursor.fetchone()
+            bumped = column = row[0] if row else None
+            if bumped is None:
+                cursor.execute(f'SELECT likes_count FROM {POSTS} WHERE id = %s', [post_id])
+                row = cursor.fetchone()
+                if row is None:
+                    raise Post.DoesNotExist
+                column = row[0]
+        likes_count = _settle(post_id, -1, deleted, column, bumped)
+        if deleted:
+            response_cache.bump('posts', f'post:{post_id}')
+    return deleted, likes_count
@@ -0,0 +1,70 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, transaction
+from django.db.models import F
+
+from accounts.models import CustomUser
+from posts import counters
+from posts.models import Post, PostCounterShard
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent like increments on a single post row and on sharded counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, nargs='+', default=[1, 2, 4, 8],
+            help='Numbers of concurrent writers to measure'
+        )
+        parser.add_argument(
+            '--increments', type=int, default=500,
+            help='Increments performed by each writer'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                'SQLite serializes every write; run against PostgreSQL for meaningful numbers'
+            ))
+        author = CustomUser.objects.create_user(username='benchmark-counters', password=None)
+        post = Post.objects.create(
+            author=author, title='Benchmark', content='Hot post',
+            likes_count=counters.SHARD_THRESHOLD,
+        )
+        try:
+            self.stdout.write(f"{'writers':>8} {'row/s':>10} {'sharded/s':>10} {'speedup':>8}")
+            for threads in options['threads']:
+                row = self.measure(threads, options['increments'], lambda: Post.objects.filter(
+                    pk=post.pk
+                ).update(likes_count=F('likes_count') + 1))
+                sharded = self.measure(threads, options['increments'], lambda: counters.add_to_shard(
+                    post.pk, 'likes_count', 1
+                ))
+                self.stdout.write(f'{threads:>8} {row:>10.0f} {sharded:>10.0f} {sharded / row:>7.2f}x')
+        finally:
+            PostCounterShard.objects.filter(post_id=post.pk).delete()
+            author.delete()
+
+    def measure(self, threads, increments, increment):
+        """Increments per second achieved by ``threads`` writers, one transaction each."""
+        barrier = threading.Barrier(threads + 1)
+
+        def writer():
+            try:
+                barrier.wait()
+                for _ in range(increments):
+                    with transaction.atomic():
+                        increment()
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=writer) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for worker in workers:
+            worker.join()
+        return threads * increments / (time.perf_counter() - started)
@@ -0,0 +1,80 @@
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from accounts.models import CustomUser
+from posts.models import Comment, Like, Post
+from posts.serializers import PostSerializer
+from social_media_api import renderers
+from social_media_api.parsers import ORJSONParser
+from social_media_api.renderers import ORJSONRenderer
+
+
+class Command(BaseCommand):
+    help = 'Compare the stdlib and orjson renderers/parsers on PostSerializer output'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=100,
+            help='Posts in the serialized payload'
+        )
+        parser.add_argument(
+            '--comments', type=int, default=20,
+            help='Comments (and likes) per post'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=50,
+            help='Encodes and decodes timed per implementation'
+        )
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed; both sides use stdlib json'))
+        data = self.build_payload(options['posts'], options['comments'])
+        repeat = options['repeat']
+        body = JSONRenderer().render(data)
+        self.stdout.write(f"PostSerializer x{options['posts']}: {len(body) / 1024:.0f} KiB of JSON")
+        self.stdout.write(f"{'':>8} {'stdlib ms':>10} {'orjson ms':>10} {'speedup':>8}")
+        self.report('render', repeat, lambda: JSONRenderer().render(data), lambda: ORJSONRenderer().render(data))
+        self.report(
+            'parse', repeat,
+            lambda: JSONParser().parse(BytesIO(body)), lambda: ORJSONParser().parse(BytesIO(body)),
+        )
+
+    def build_payload(self, posts, comments):
+        """Serialize posts with nested comments and likes, then roll the rows back."""
+        with transaction.atomic():
+            users = [
+                CustomUser.objects.create_user(
+                    username=f'benchmark-json-{i}', email=f'benchmark-json-{i}@example.com', password=None
+                )
+                for i in range(comments)
+            ]
+            for i in range(posts):
+                post = Post.objects.create(author=users[0], title=f'Post {i}', content='Lorem ipsum ' * 40)
+                Comment.objects.bulk_create([
+                    Comment(post=post, author=user, content='Nice post! ' * 5) for user in users
+                ])
+                Like.objects.bulk_create([Like(post=post, user=user) for user in users])
+            queryset = Post.objects.filter(author=users[0]).with_engagement().with_comments().with_likes()
+            data = PostSerializer(queryset, many=True).data
+            transaction.set_rollback(True)
+        return data
+
+    def report(self, label, repeat, stdlib, fast):
+        stdlib_ms = self.measure(stdlib, repeat)
+        fast_ms = self.measure(fast, repeat)
+        self.stdout.write(f'{label:>8} {stdlib_ms:>10.2f} {fast_ms:>10.2f} {stdlib_ms / fast_ms:>7.1f}x')
+
+    def measure(self, func, repeat):
+        """Best of ``repeat`` runs in milliseconds"""
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - started)
+        return best * 1000
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Fold sharded like/comment counters of hot posts back into Post'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=counters.BATCH_SIZE,
+            help='Number of posts compacted per transaction'
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep compacting instead of exiting after one pass'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=30.0,
+            help='Seconds to wait between passes with --loop'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            compacted = counters.compact(options['batch_size'])
+            if compacted or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f'Compacted counters of {compacted} posts'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
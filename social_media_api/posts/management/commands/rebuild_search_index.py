@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+from social_media_api import response_cache
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=search.BATCH_SIZE,
+            help='Number of posts indexed per batch'
+        )
+
+    def handle(self, *args, **options):
+        backend = search.get_backend()
+        if backend is None:
+            raise CommandError('No full-text search backend for this database')
+        indexed = backend.rebuild(batch_size=options['batch_size'])
+        # Cached anonymous search results were computed from the old index
+        response_cache.bump('posts')
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed {indexed} posts with {type(backend).__name__}')
+        )
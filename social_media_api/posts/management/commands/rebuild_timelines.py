@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import CustomUser
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = 'Backfill or rebuild materialized home timelines from the follow graph'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='Only rebuild the timeline of this user id (repeatable)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of users loaded per batch'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=timeline.BACKFILL_LIMIT,
+            help='Maximum number of posts kept per timeline'
+        )
+
+    def handle(self, *args, **options):
+        users = CustomUser.objects.order_by('pk')
+        if options['user_ids']:
+            users = users.filter(pk__in=options['user_ids'])
+
+        rebuilt = entries = 0
+        for user in users.iterator(chunk_size=options['batch_size']):
+            entries += timeline.rebuild_timeline(user, limit=options['limit'])
+            rebuilt += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {rebuilt} timelines ({entries} entries)')
+        )
@@ -0,0 +1,104 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from accounts.models import CustomUser, FollowRelationship
+from posts import counters
+from posts.models import Comment, Like, Post, PostCounterShard, count_per_post
+from social_media_api import response_cache
+
+
+def count_follows(field):
+    """Correlated COUNT(*) of follow rows whose ``field`` is the outer user"""
+    counts = (
+        FollowRelationship.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def count_replies():
+    """Correlated COUNT(*) of the direct replies of the outer comment"""
+    counts = (
+        Comment.objects.filter(parent=OuterRef('pk'))
+        .order_by()
+        .values('parent')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+class Command(BaseCommand):
+    help = 'Repair drift in the denormalized like, comment, reply and follow counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows checked per batch'
+        )
+        parser.add_argument(
+            '--only', choices=['posts', 'users'],
+            help='Only reconcile post (and comment) or user counters'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if options['only'] in (None, 'posts'):
+            # Fold sharded counts first so hot posts do not look drifted
+            counters.compact()
+            repaired = self.reconcile(Post.objects.all(), {
+                'likes_count': count_per_post(Like.objects.all()),
+                'comments_count': count_per_post(Comment.objects.all()),
+            }, batch_size)
+            self.stdout.write(self.style.SUCCESS(f'Repaired {repaired} post counters'))
+            repaired = self.reconcile(Comment.objects.all(), {
+                'reply_count': count_replies(),
+            }, batch_size)
+            self.stdout.write(self.style.SUCCESS(f'Repaired {repaired} comment reply counters'))
+        if options['only'] in (None, 'users'):
+            repaired = self.reconcile(CustomUser.objects.all(), {
+                'followers_count': count_follows('following'),
+                'following_count': count_follows('follower'),
+            }, batch_size)
+            self.stdout.write(self.style.SUCCESS(f'Repaired {repaired} user counters'))
+
+    def reconcile(self, queryset, expressions, batch_size):
+        """Recount rows whose counters disagree with the source tables"""
+        annotations = {f'actual_{field}': expr for field, expr in expressions.items()}
+        drifted = Q()
+        for field in expressions:
+            drifted |= ~Q(**{field: F(f'actual_{field}')})
+
+        repaired = 0
+        last_pk = 0
+        while True:
+            pks = list(
+                queryset.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                return repaired
+            last_pk = pks[-1]
+            batch = queryset.filter(pk__gte=pks[0], pk__lte=last_pk)
+            stale = list(
+                batch.annotate(**annotations).filter(drifted).values_list('pk', flat=True)
+            )
+            if stale:
+                with transaction.atomic():
+                    if queryset.model is Post:
+                        # The recount already includes what the shards hold
+                        PostCounterShard.objects.filter(post_id__in=stale).delete()
+                    repaired += queryset.filter(pk__in=stale).update(**expressions)
+                    # Cached responses and ETags still carry the drifted values
+                    if queryset.model is Post:
+                        response_cache.bump('posts', *[f'post:{pk}' for pk in stale])
+                    elif queryset.model is Comment:
+                        post_ids = set(queryset.filter(pk__in=stale).values_list('post_id', flat=True))
+                        response_cache.bump('posts', 'comments', *[f'post:{pk}' for pk in post_ids])
+                    elif queryset.model is CustomUser:
+                        response_cache.bump(*[f'user:{pk}' for pk in stale])
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = 'Recompute time-decayed trending scores from recent likes and comments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--window-hours', type=float, default=trending.WINDOW_HOURS,
+            help='Only count engagement from the last N hours'
+        )
+        parser.add_argument(
+            '--gravity', type=float, default=trending.GRAVITY,
+            help='Exponent applied to post age; higher values favour newer posts'
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep refreshing instead of exiting after one pass'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=60.0,
+            help='Seconds to wait between refreshes with --loop'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            scored = trending.refresh(
+                window_hours=options['window_hours'],
+                gravity=options['gravity'],
+            )
+            self.stdout.write(self.style.SUCCESS(f'Scored {scored} trending posts'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE TABLE posts_post_search ('
+            'post_id integer PRIMARY KEY REFERENCES posts_post (id) '
+            'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+            'document tsvector NOT NULL)'
+        )
+        schema_editor.execute(
+            'CREATE INDEX posts_post_search_document ON posts_post_search USING GIN (document)'
+        )
+        schema_editor.execute(
+            "INSERT INTO posts_post_search (post_id, document) "
+            "SELECT id, setweight(to_tsvector('english', title), 'A') || "
+            "setweight(to_tsvector('english', content), 'B') FROM posts_post"
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE posts_post_fts USING fts5(title, content)'
+        )
+        schema_editor.execute(
+            'INSERT INTO posts_post_fts (rowid, title, content) '
+            'SELECT id, title, content FROM posts_post'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_post_search')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
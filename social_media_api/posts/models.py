@@ -1,8 +1,62 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from django.db.models import Count, Exists, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
-class Post(models.Model):
+from social_media_api.denormalized import CounterFieldsMixin
+
+# Number of comments embedded in list representations of a post
+COMMENTS_PREVIEW_SIZE = 3
+
+# Digits per ancestor in Comment.path; 255 characters leave room for
+# MAX_COMMENT_DEPTH levels of replies below a top-level comment
+COMMENT_PATH_WIDTH = 10
+MAX_COMMENT_DEPTH = 24
+
+def count_per_post(queryset):
+    """Correlated COUNT(*) of ``queryset`` rows for the outer post"""
+    counts = (
+        queryset.filter(post=OuterRef('pk'))
+        .order_by()
+        .values('post')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+class PostQuerySet(models.QuerySet):
+    def with_engagement(self, user=None):
+        """
+        Annotate ``is_liked`` for ``user`` and select authors, so
+        serializing a page of posts costs a constant number of queries.
+        Counts come from the denormalized counter columns.
+        """
+        if user is not None and user.is_authenticated:
+            is_liked = Exists(Like.objects.filter(post=OuterRef('pk'), user=user))
+        else:
+            is_liked = Value(False)
+        return self.select_related('author').annotate(is_liked=is_liked)
+    
+    def with_comments_preview(self, size=COMMENTS_PREVIEW_SIZE):
+        """Prefetch the first ``size`` comments of each post as ``comments_preview``"""
+        return self.prefetch_related(Prefetch(
+            'comments',
+            queryset=Comment.objects.select_related('author')[:size],
+            to_attr='comments_preview',
+        ))
+    
+    def with_comments(self):
+        return self.prefetch_related(
+            Prefetch('comments', queryset=Comment.objects.select_related('author'))
+        )
+    
+    def with_likes(self):
+        return self.prefetch_related(
+            Prefetch('likes', queryset=Like.objects.select_related('user'))
+        )
+
+class Post(CounterFieldsMixin, models.Model):
     """
     Post model for social media posts
     """
@@ -15,16 +69,58 @@ class Post(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized counters, kept in step by posts.signals and repaired
+    # by the reconcile_counters management command
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    COUNTER_FIELDS = ('likes_count', 'comments_count')
+    
+    objects = PostQuerySet.as_manager()
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination over (created_at, id)
+            models.Index(fields=['-created_at', '-id'], name='posts_post_created_id'),
+        ]
     
     def __str__(self):
         return f"{self.title} by {self.author.username}"
 
-class Comment(models.Model):
+def comment_path(pk, parent_path=''):
+    """Materialized path of a comment: its ancestors' ids, root first, then its own"""
+    return f'{parent_path}{pk:0{COMMENT_PATH_WIDTH}d}'
+
+def subtree_range(path):
+    """(start, end) bounds of the paths of ``path``'s descendants, for range scans"""
+    # Paths are all digits, so every descendant sorts between path and the
+    # next number of the same width (works under any collation, unlike LIKE)
+    return path, f'{int(path) + 1:0{len(path)}d}'
+
+class CommentQuerySet(models.QuerySet):
+    def top_level(self, post):
+        """Root comments of ``post``; one range of posts_comment_thread_page"""
+        return self.filter(post=post, parent__isnull=True)
+    
+    def replies_to(self, comment):
+        """Direct replies of ``comment``; one range of posts_comment_thread_page"""
+        return self.filter(post_id=comment.post_id, parent=comment)
+    
+    def subtree(self, comment, max_depth=None):
+        """Descendants of ``comment`` in depth-first order, down to ``max_depth`` levels below it"""
+        start, end = subtree_range(comment.path)
+        queryset = self.filter(post_id=comment.post_id, path__gt=start, path__lt=end)
+        if max_depth is not None:
+            queryset = queryset.filter(depth__lte=comment.depth + max_depth)
+        return queryset.order_by('path')
+
+class Comment(CounterFieldsMixin, models.Model):
     """
-    Comment model for posts
+    Comment model for posts, threaded through ``parent``.
+    
+    ``path`` is the materialized path of the comment (``COMMENT_PATH_WIDTH``
+    zero-padded digits per ancestor), so a whole subtree is one range scan
+    of posts_comment_post_path and sorting by it yields depth-first order.
     """
     post = models.ForeignKey(
         Post, 
@@ -36,15 +132,50 @@ class Comment(models.Model):
         on_delete=models.CASCADE,
         related_name='comments'
     )
+    parent = models.ForeignKey(
+        'self',
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name='replies'
+    )
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set once the id is known, see save()
+    path = models.CharField(max_length=255, editable=False, default='')
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Denormalized number of direct replies, kept in step by posts.signals
+    reply_count = models.PositiveIntegerField(default=0, editable=False)
+    COUNTER_FIELDS = ('reply_count',)
+    
+    objects = CommentQuerySet.as_manager()
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Keyset pagination of a post's comments over (created_at, id)
+            models.Index(fields=['post', 'created_at', 'id'], name='posts_comment_post_created_id'),
+            models.Index(fields=['created_at'], name='posts_comment_created'),
+            # Keyset pages of top-level comments (parent IS NULL) and of the
+            # replies to one comment
+            models.Index(fields=['post', 'parent', 'created_at', 'id'], name='posts_comment_thread_page'),
+            models.Index(fields=['post', 'path'], name='posts_comment_post_path'),
+        ]
     
     def __str__(self):
         return f"Comment by {self.author.username} on {self.post.title}"
+    
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.parent_id:
+            self.depth = self.parent.depth + 1
+        # A comment is never committed without its path, or subtree() misses it
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if not self.path:
+                parent_path = self.parent.path if self.parent_id else ''
+                self.path = comment_path(self.pk, parent_path)
+                Comment.objects.filter(pk=self.pk).update(path=self.path)
 
 class Like(models.Model):
     """
@@ -65,6 +196,98 @@ class Like(models.Model):
     class Meta:
         unique_together = ['user', 'post']  # Prevent duplicate likes
         ordering = ['-created_at']
+        indexes = [
+            # Recent likes are scanned when refreshing trending scores
+            models.Index(fields=['created_at'], name='posts_like_created'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} likes {self.post.title}"
+
+class TimelineEntry(models.Model):
+    """
+    Materialized home timeline row: one entry per (follower, post).
+
+    Filled on write by posts.timeline.fan_out_post so that reading a feed
+    page is a range scan over (user, -created_at, -id) instead of an
+    IN-subquery over everyone the user follows.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    # Copy of post.created_at so the timeline index can serve the ordering
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ['user', 'post']
+        ordering = ['-created_at']
+        indexes = [
+            # Serves feed pages keyed on (created_at, id), see KeysetPagination
+            models.Index(fields=['user', '-created_at', '-id'], name='posts_timeline_user_created_id'),
+            models.Index(fields=['user', 'author'], name='posts_timeline_user_author'),
+        ]
+    
+    def __str__(self):
+        return f"{self.post_id} in timeline of {self.user_id}"
+
+class PostScore(models.Model):
+    """
+    Precomputed trending score of a post with recent engagement.
+
+    Refreshed by posts.trending.refresh (``manage.py refresh_trending``) so
+    the trending endpoint is an index scan over -score.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending_score'
+    )
+    score = models.FloatField()
+    updated_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['-score']
+        indexes = [
+            models.Index(fields=['-score', '-post'], name='posts_score_score_post'),
+        ]
+    
+    def __str__(self):
+        return f"{self.post_id} scored {self.score:.4f}"
+
+class PostCounterShard(models.Model):
+    """
+    One of N partial counts of a hot post's likes_count or comments_count.
+
+    See posts.counters: increments upsert a random shard instead of the
+    post row, and compaction folds the deltas back into Post. There is no
+    database-level foreign key so shards never block deleting a post;
+    compaction drops shards of deleted posts.
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    counter = models.CharField(max_length=32)
+    shard = models.PositiveSmallIntegerField()
+    delta = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['post', 'counter', 'shard']
+    
+    def __str__(self):
+        return f"{self.counter} shard {self.shard} of {self.post_id}: {self.delta:+d}"
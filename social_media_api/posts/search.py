@@ -0,0 +1,176 @@
+"""
+Full-text search over posts.
+
+``?search=`` used to become ``title LIKE '%term%' OR content LIKE '%term%'``,
+which scans the whole post table. Posts are now indexed in a full-text
+table kept up to date by posts.signals:
+
+* PostgreSQL: ``posts_post_search`` holds a weighted ``tsvector`` per post
+  behind a GIN index; matches are ranked with ``ts_rank_cd``.
+* SQLite: ``posts_post_fts`` is an FTS5 virtual table keyed by the post id;
+  matches are ranked with ``bm25``.
+
+Other databases fall back to DRF's ``LIKE`` search. The backend can be
+forced with the ``POSTS_SEARCH_BACKEND`` setting, and the index rebuilt with
+``manage.py rebuild_search_index``.
+"""
+
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from rest_framework import filters
+
+from .models import Post
+
+BATCH_SIZE = 1000
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class SearchBackend:
+    """Maintains the full-text index and turns search terms into a ranked queryset"""
+
+    def index(self, posts):
+        raise NotImplementedError
+
+    def remove(self, post_ids):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def search(self, queryset, terms):
+        """Return ``queryset`` narrowed to matches and annotated with ``search_rank``."""
+        raise NotImplementedError
+
+    def rebuild(self, batch_size=BATCH_SIZE):
+        """Reindex every post in primary key order; return how many were indexed."""
+        self.clear()
+        total = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                Post.objects.filter(pk__gt=last_pk).order_by('pk')
+                .only('pk', 'title', 'content')[:batch_size]
+            )
+            if not batch:
+                return total
+            self.index(batch)
+            total += len(batch)
+            last_pk = batch[-1].pk
+
+
+class PostgresSearchBackend(SearchBackend):
+    """tsvector documents in posts_post_search behind a GIN index"""
+
+    table = 'posts_post_search'
+    config = 'english'
+
+    def index(self, posts):
+        rows = [(post.pk, post.title, post.content) for post in posts]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {self.table} (post_id, document) VALUES "
+                f"(%s, setweight(to_tsvector('{self.config}', %s), 'A') || "
+                f"setweight(to_tsvector('{self.config}', %s), 'B')) "
+                f"ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+
+    def remove(self, post_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE post_id = ANY(%s)', [list(post_ids)])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {self.table}')
+
+    def search(self, queryset, terms):
+        query = ' '.join(terms)
+        tsquery = f"websearch_to_tsquery('{self.config}', %s)"
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT post_id FROM {self.table} WHERE document @@ {tsquery}', (query,)
+        )).annotate(search_rank=RawSQL(
+            f'SELECT ts_rank_cd(document, {tsquery}) FROM {self.table} '
+            f'WHERE post_id = {Post._meta.db_table}.id',
+            (query,),
+            output_field=FloatField(),
+        ))
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """FTS5 virtual table whose rowid is the post id"""
+
+    table = 'posts_post_fts'
+    # bm25 column weights: title matches count more than body matches
+    weights = (4.0, 1.0)
+
+    def index(self, posts):
+        posts = list(posts)
+        self.remove(post.pk for post in posts)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, title, content) VALUES (%s, %s, %s)',
+                [(post.pk, post.title, post.content) for post in posts],
+            )
+
+    def remove(self, post_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {self.table} WHERE rowid = %s', [(pk,) for pk in post_ids]
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+    def match_expression(self, terms):
+        # Quote every token so user input can never be parsed as FTS5 syntax
+        tokens = TERM_RE.findall(' '.join(terms))
+        return ' '.join(f'"{token}"' for token in tokens)
+
+    def search(self, queryset, terms):
+        match = self.match_expression(terms)
+        if not match:
+            return queryset.none()
+        weights = ', '.join(str(weight) for weight in self.weights)
+        # bm25() is lower for better matches; negate it so rank sorts descending
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', (match,)
+        )).annotate(search_rank=RawSQL(
+            f'SELECT -bm25({self.table}, {weights}) FROM {self.table} '
+            f'WHERE {self.table} MATCH %s AND rowid = {Post._meta.db_table}.id',
+            (match,),
+            output_field=FloatField(),
+        ))
+
+
+BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+}
+
+
+def get_backend():
+    """Return the configured backend, or None to fall back to LIKE search."""
+    path = getattr(settings, 'POSTS_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    backend_class = BACKENDS.get(connection.vendor)
+    return backend_class() if backend_class else None
+
+
+class PostSearchFilter(filters.SearchFilter):
+    """``?search=`` backed by the full-text index, most relevant posts first"""
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        backend = get_backend()
+        if backend is None:
+            return super().filter_queryset(request, queryset, view)
+        return backend.search(queryset, terms).order_by('-search_rank', '-pk')
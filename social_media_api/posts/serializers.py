@@ -1,6 +1,9 @@
+from django.db import models
 from rest_framework import serializers
-from .models import Post, Comment
+from . import counters
+from .models import COMMENTS_PREVIEW_SIZE, MAX_COMMENT_DEPTH, Post, Comment, Like
 from accounts.models import CustomUser
+from social_media_api.serializers import DynamicFieldsMixin
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for user representation in posts/comments"""
@@ -19,8 +22,11 @@ class CommentSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Comment
-        fields = ['id', 'post', 'author', 'author_id', 'content', 'created_at', 'updated_at']
-        read_only_fields = ['created_at', 'updated_at']
+        fields = ['id', 'post', 'parent', 'depth', 'reply_count', 'author', 'author_id',
+                 'content', 'created_at', 'updated_at']
+        # Comments are created through CommentCreateSerializer and never move
+        # to another post or thread
+        read_only_fields = ['post', 'parent', 'reply_count', 'created_at', 'updated_at']
 
 class PostSerializer(serializers.ModelSerializer):
     """Serializer for Post model"""
@@ -31,16 +37,13 @@ class PostSerializer(serializers.ModelSerializer):
         write_only=True
     )
     comments = CommentSerializer(many=True, read_only=True)
-    comments_count = serializers.SerializerMethodField()
+    comments_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Post
         fields = ['id', 'author', 'author_id', 'title', 'content', 
                  'created_at', 'updated_at', 'comments', 'comments_count']
         read_only_fields = ['created_at', 'updated_at']
-    
-    def get_comments_count(self, obj):
-        return obj.comments.count()
 
 class PostCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating posts (simplified)"""
@@ -49,18 +52,37 @@ class PostCreateSerializer(serializers.ModelSerializer):
         fields = ['title', 'content']
     
     def create(self, validated_data):
-        user = self.context['request'].user
-        return Post.objects.create(author=user, **validated_data)
+        # save(author=...) from the views takes precedence
+        validated_data.setdefault('author', self.context['request'].user)
+        return Post.objects.create(**validated_data)
 
 class CommentCreateSerializer(serializers.ModelSerializer):
-    """Serializer for creating comments (simplified)"""
+    """
+    Serializer for creating comments (simplified). ``parent`` makes the
+    comment a reply; ``post`` may instead come from the ``post`` context
+    (``POST /posts/<pk>/add_comment/``).
+    """
     class Meta:
         model = Comment
-        fields = ['post', 'content']
+        fields = ['post', 'parent', 'content']
+        extra_kwargs = {'post': {'required': False}}
+    
+    def validate(self, attrs):
+        post = self.context.get('post') or attrs.get('post')
+        if post is None:
+            raise serializers.ValidationError({'post': 'This field is required.'})
+        parent = attrs.get('parent')
+        if parent is not None:
+            if parent.post_id != post.pk:
+                raise serializers.ValidationError({'parent': 'Replies must belong to the same post.'})
+            if parent.depth >= MAX_COMMENT_DEPTH:
+                raise serializers.ValidationError({'parent': 'This thread is nested too deeply.'})
+        return attrs
     
     def create(self, validated_data):
-        user = self.context['request'].user
-        return Comment.objects.create(author=user, **validated_data)
+        # save(author=...) from the views takes precedence
+        validated_data.setdefault('author', self.context['request'].user)
+        return Comment.objects.create(**validated_data)
 
 class LikeSerializer(serializers.ModelSerializer):
     """Serializer for Like model"""
@@ -71,7 +93,15 @@ class LikeSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'post', 'created_at']
         read_only_fields = ['created_at']
 
-class PostSerializer(serializers.ModelSerializer):
+class PostCountersListSerializer(serializers.ListSerializer):
+    """Adds pending counter shards of hot posts for the whole page at once"""
+    
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        counters.apply_pending(posts)
+        return super().to_representation(posts)
+
+class PostSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Updated PostSerializer with likes"""
     author = UserSerializer(read_only=True)
     author_id = serializers.PrimaryKeyRelatedField(
@@ -80,8 +110,8 @@ class PostSerializer(serializers.ModelSerializer):
         write_only=True
     )
     comments = CommentSerializer(many=True, read_only=True)
-    comments_count = serializers.SerializerMethodField()
-    likes_count = serializers.SerializerMethodField()
+    comments_count = serializers.IntegerField(read_only=True)
+    likes_count = serializers.IntegerField(read_only=True)
     is_liked = serializers.SerializerMethodField()
     likes = LikeSerializer(many=True, read_only=True)
     
@@ -91,15 +121,40 @@ class PostSerializer(serializers.ModelSerializer):
                  'created_at', 'updated_at', 'comments', 'comments_count',
                  'likes_count', 'is_liked', 'likes']
         read_only_fields = ['created_at', 'updated_at']
+        list_serializer_class = PostCountersListSerializer
     
-    def get_comments_count(self, obj):
-        return obj.comments.count()
-    
-    def get_likes_count(self, obj):
-        return obj.likes.count()
+    def to_representation(self, instance):
+        counters.apply_pending([instance])
+        return super().to_representation(instance)
     
+    # is_liked is annotated by Post.objects.with_engagement(); the query
+    # below only runs for instances loaded without it.
     def get_is_liked(self, obj):
+        if hasattr(obj, 'is_liked'):
+            return obj.is_liked
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.likes.filter(user=request.user).exists()
         return False
+
+
+class PostListSerializer(PostSerializer):
+    """
+    Compact post representation for feeds and lists: counts plus a preview
+    of the first comments. Full ``comments``/``likes`` are opt-in through
+    ``?expand=comments,likes``.
+    """
+    comments_preview = serializers.SerializerMethodField()
+    
+    class Meta(PostSerializer.Meta):
+        fields = ['id', 'author', 'author_id', 'title', 'content',
+                 'created_at', 'updated_at', 'comments_count', 'likes_count',
+                 'is_liked', 'comments_preview', 'comments', 'likes']
+        expandable_fields = ['comments', 'likes']
+    
+    def get_comments_preview(self, obj):
+        if hasattr(obj, 'comments_preview'):
+            comments = obj.comments_preview
+        else:
+            comments = obj.comments.select_related('author')[:COMMENTS_PREVIEW_SIZE]
+        return CommentSerializer(comments, many=True, context=self.context).data
@@ -0,0 +1,115 @@
+# Signal handlers for the posts app
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from accounts.models import CustomUser
+from social_media_api import response_cache
+from . import counters, search, timeline
+from .models import Comment, Like, Post, TimelineEntry
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, **kwargs):
+    """Push a new post into its author's followers' timelines"""
+    if created:
+        timeline.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, update_fields=None, **kwargs):
+    """Keep the full-text index in step with post titles and bodies"""
+    if update_fields is not None and not {'title', 'content'} & set(update_fields):
+        return
+    backend = search.get_backend()
+    if backend is not None:
+        backend.index([instance])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    backend = search.get_backend()
+    if backend is not None:
+        backend.remove([instance.pk])
+
+
+@receiver(m2m_changed, sender=CustomUser.following.through)
+def sync_timeline_on_follow(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep materialized timelines in step with the follow graph"""
+    if action == 'post_clear':
+        if reverse:
+            TimelineEntry.objects.filter(author=instance).delete()
+        else:
+            TimelineEntry.objects.filter(user=instance).delete()
+        return
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+
+    if reverse:
+        # instance gained/lost followers: pk_set holds the follower ids
+        for follower in CustomUser.objects.filter(pk__in=pk_set):
+            if action == 'post_add':
+                timeline.backfill_authors(follower, [instance.pk])
+            else:
+                timeline.remove_authors(follower, [instance.pk])
+        if action == 'post_remove':
+            timeline.fan_out_dropped_authors([instance.pk], removed=len(pk_set))
+    elif action == 'post_add':
+        timeline.backfill_authors(instance, pk_set)
+    else:
+        timeline.remove_authors(instance, pk_set)
+        # Counters were moved by accounts.signals.count_follows already
+        timeline.fan_out_dropped_authors(pk_set)
+
+
+# Counters are moved with F() expressions (or, for hot posts, sharded
+# upserts, see posts.counters) so concurrent writers never lose an update.
+# post_delete runs inside the deletion transaction; callers that create rows
+# wrap the save in transaction.atomic() so post_save does too.
+@receiver(post_save, sender=Like)
+def count_new_like(sender, instance, created, **kwargs):
+    if created:
+        counters.add(instance.post_id, 'likes_count', 1)
+
+
+@receiver(post_delete, sender=Like)
+def count_deleted_like(sender, instance, **kwargs):
+    counters.add(instance.post_id, 'likes_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.add(instance.post_id, 'comments_count', 1)
+        if instance.parent_id:
+            Comment.objects.filter(pk=instance.parent_id).update(reply_count=F('reply_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.add(instance.post_id, 'comments_count', -1)
+    if instance.parent_id:
+        # A cascade may already have removed the parent; that update is a no-op
+        Comment.objects.filter(pk=instance.parent_id, reply_count__gt=0).update(
+            reply_count=F('reply_count') - 1
+        )
+
+
+# Cached anonymous responses are versioned by these generations, see
+# social_media_api.response_cache
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_generation(sender, instance, **kwargs):
+    response_cache.bump('posts', f'post:{instance.pk}')
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_generation(sender, instance, **kwargs):
+    response_cache.bump('posts', 'comments', f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+def bump_like_generation(sender, instance, **kwargs):
+    response_cache.bump('posts', f'post:{instance.post_id}')
@@ -1,3 +1,852 @@
-from django.test import TestCase
+import gzip
+import json
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.test import APITestCase
+
+from accounts.models import CustomUser
+from notifications.models import NotificationEvent
+from social_media_api import compression, instrumentation, throttling
+from social_media_api.parsers import ORJSONParser
+from social_media_api.renderers import ORJSONRenderer
+from social_media_api.testing import QueryBudgetMixin, make_user
+from . import counters, search, timeline, trending
+from .models import Comment, Like, Post, PostCounterShard, PostScore, TimelineEntry
+
+
+class TimelineTests(APITestCase):
+    """Tests for the materialized home timeline"""
+
+    def setUp(self):
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.carol = make_user('carol')
+        self.alice.follow(self.bob)
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        post = Post.objects.create(author=self.bob, title='Hello', content='World')
+        self.assertTrue(TimelineEntry.objects.filter(user=self.alice, post=post).exists())
+        self.assertFalse(TimelineEntry.objects.filter(user=self.carol, post=post).exists())
+
+    def test_follow_backfills_and_unfollow_removes(self):
+        post = Post.objects.create(author=self.carol, title='Earlier', content='Post')
+        self.alice.follow(self.carol)
+        self.assertTrue(TimelineEntry.objects.filter(user=self.alice, post=post).exists())
+        self.alice.unfollow(self.carol)
+        self.assertFalse(TimelineEntry.objects.filter(user=self.alice, author=self.carol).exists())
+
+    def test_feed_reads_timeline(self):
+        post = Post.objects.create(author=self.bob, title='Hello', content='World')
+        Post.objects.create(author=self.carol, title='Hidden', content='Not followed')
+        self.client.force_authenticate(self.alice)
+        response = self.client.get(reverse('feed'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in response.data['results']], [post.id])
+
+    def test_high_fanout_authors_are_pulled_on_read(self):
+        with mock.patch.object(timeline, 'FANOUT_THRESHOLD', 1):
+            post = Post.objects.create(author=self.bob, title='Viral', content='Post')
+            self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+            self.client.force_authenticate(self.alice)
+            response = self.client.get(reverse('feed'))
+            self.assertEqual(response.data['results'][0]['id'], post.id)
+            self.assertEqual(timeline.pull_high_fanout(self.alice), 0)
+
+    def test_authors_dropping_below_threshold_are_fanned_out(self):
+        self.carol.follow(self.bob)
+        with mock.patch.object(timeline, 'FANOUT_THRESHOLD', 2):
+            post = Post.objects.create(author=self.bob, title='Viral', content='Post')
+            self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+            self.carol.unfollow(self.bob)
+        self.assertTrue(TimelineEntry.objects.filter(user=self.alice, post=post).exists())
+
+    def test_feed_page_is_an_index_range_scan(self):
+        self.client.force_authenticate(self.alice)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('feed'))
+        page_sql = next(q['sql'] for q in queries.captured_queries if 'FROM "posts_timelineentry"' in q['sql'] and 'LIMIT' in q['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + page_sql)
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn('posts_timeline_user_created_id', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_rebuild_timelines_command(self):
+        post = Post.objects.create(author=self.bob, title='Hello', content='World')
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=mock.Mock())
+        self.assertTrue(TimelineEntry.objects.filter(user=self.alice, post=post).exists())
+
+
+class KeysetPaginationTests(APITestCase):
+    """Tests for cursor pagination of post lists"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = make_user('author')
+        for i in range(25):
+            Post.objects.create(author=self.author, title=f'Post {i}', content='Body')
+        # Identical timestamps exercise the id tie-breaker
+        Post.objects.update(created_at=timezone.now())
+
+    def collect(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_walks_every_post_exactly_once(self):
+        ids = self.collect(reverse('post-list'))
+        expected = list(Post.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_previous_link_returns_previous_page(self):
+        first = self.client.get(reverse('post-list'))
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [item['id'] for item in back.data['results']],
+            [item['id'] for item in first.data['results']]
+        )
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get(reverse('post-list'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PostQueryCountTests(APITestCase):
+    """Serializing a page of posts must not issue per-post queries"""
+
+    def setUp(self):
+        self.author = make_user('author')
+        self.reader = make_user('reader')
+
+    def create_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(author=self.author, title=f'Post {i}', content='Body')
+            Comment.objects.create(post=post, author=self.reader, content='Nice')
+            Like.objects.create(post=post, user=self.reader)
+
+    def count_list_queries(self):
+        self.client.force_authenticate(self.reader)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('post-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries), response
+
+    def test_list_query_count_is_constant(self):
+        self.create_posts(2)
+        small, _ = self.count_list_queries()
+        self.create_posts(8)
+        large, response = self.count_list_queries()
+        self.assertEqual(small, large)
+        first = response.data['results'][0]
+        self.assertEqual(first['comments_count'], 1)
+        self.assertEqual(first['likes_count'], 1)
+        self.assertTrue(first['is_liked'])
+
+
+class PostRepresentationTests(APITestCase):
+    """Tests for the compact list representation and sparse fieldsets"""
+
+    def setUp(self):
+        self.author = make_user('author')
+        self.post = Post.objects.create(author=self.author, title='Hello', content='World')
+        for i in range(5):
+            Comment.objects.create(post=self.post, author=self.author, content=f'Comment {i}')
+
+    def test_list_embeds_counts_and_comment_preview(self):
+        item = self.client.get(reverse('post-list')).data['results'][0]
+        self.assertNotIn('comments', item)
+        self.assertNotIn('likes', item)
+        self.assertEqual(item['comments_count'], 5)
+        self.assertEqual(len(item['comments_preview']), 3)
+
+    def test_expand_includes_full_comments(self):
+        response = self.client.get(reverse('post-list'), {'expand': 'comments'})
+        self.assertEqual(len(response.data['results'][0]['comments']), 5)
+
+    def test_fields_limits_the_payload(self):
+        response = self.client.get(reverse('post-list'), {'fields': 'id,title'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title'})
+
+    def test_fields_never_drops_submitted_data(self):
+        self.client.force_authenticate(self.author)
+        url = reverse('post-detail', args=[self.post.pk])
+        response = self.client.patch(f'{url}?fields=id', {'title': 'Edited'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.title, 'Edited')
+        self.assertNotIn('comments', response.data)
+
+    def test_detail_keeps_nested_comments(self):
+        response = self.client.get(reverse('post-detail', args=[self.post.pk]))
+        self.assertEqual(len(response.data['comments']), 5)
+        self.assertEqual(response.data['author']['username'], 'author')
+
+
+class CounterTests(APITestCase):
+    """Tests for the denormalized like/comment counters"""
+
+    def setUp(self):
+        self.author = make_user('author')
+        self.reader = make_user('reader')
+        self.post = Post.objects.create(author=self.author, title='Hello', content='World')
+
+    def test_like_and_unlike_move_the_counter(self):
+        self.client.force_authenticate(self.reader)
+        response = self.client.post(reverse('like_post', args=[self.post.pk]))
+        self.assertEqual(response.data['likes_count'], 1)
+        response = self.client.post(reverse('unlike_post', args=[self.post.pk]))
+        self.assertEqual(response.data['likes_count'], 0)
+
+    def test_comments_move_the_counter(self):
+        comment = Comment.objects.create(post=self.post, author=self.reader, content='Nice')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+
+    def test_reconcile_counters_repairs_drift(self):
+        Like.objects.create(post=self.post, user=self.reader)
+        Post.objects.update(likes_count=7, comments_count=3)
+        self.reader.follow(self.author)
+        CustomUser.objects.update(followers_count=0, following_count=0)
+        call_command('reconcile_counters', stdout=mock.Mock())
+        self.post.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.comments_count), (1, 0))
+        self.assertEqual(self.author.followers_count, 1)
+
+
+class PostSearchTests(APITestCase):
+    """Tests for the full-text post search"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = make_user('author')
+        self.title_match = Post.objects.create(author=self.author, title='Django tips', content='Some advice')
+        self.body_match = Post.objects.create(author=self.author, title='Notes', content='Learning django today')
+        self.other = Post.objects.create(author=self.author, title='Cooking', content='Pasta recipes')
+
+    def search(self, term, **params):
+        response = self.client.get(reverse('post-list'), {'search': term, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_results_are_ranked_by_relevance(self):
+        ids = [item['id'] for item in self.search('django').data['results']]
+        self.assertEqual(ids, [self.title_match.id, self.body_match.id])
+
+    def test_index_follows_edits_and_deletes(self):
+        self.other.content = 'Django pasta'
+        self.other.save()
+        self.body_match.delete()
+        ids = {item['id'] for item in self.search('django').data['results']}
+        self.assertEqual(ids, {self.title_match.id, self.other.id})
+
+    def test_search_syntax_in_terms_is_treated_as_text(self):
+        self.assertEqual(self.search('"django (').data['results'][0]['id'], self.title_match.id)
+
+    def test_results_paginate_by_rank(self):
+        for i in range(4):
+            Post.objects.create(author=self.author, title=f'Extra {i}', content='django ' * (i + 1))
+        first = self.search('django', page_size=3)
+        second = self.client.get(first.data['next'])
+        ids = [item['id'] for item in first.data['results'] + second.data['results']]
+        self.assertEqual(len(ids), 6)
+        self.assertEqual(len(set(ids)), 6)
+
+    def test_rebuild_command_repopulates_index(self):
+        search.get_backend().clear()
+        self.assertEqual(self.search('django').data['results'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_search_index', batch_size=2, stdout=mock.Mock())
+        self.assertEqual(len(self.search('django').data['results']), 2)
+
+
+class TrendingTests(APITestCase):
+    """Tests for the precomputed trending ranking"""
+
+    def setUp(self):
+        self.author = make_user('author')
+        self.readers = [make_user(f'reader{i}') for i in range(3)]
+        self.fresh = Post.objects.create(author=self.author, title='Fresh', content='New')
+        self.old = Post.objects.create(author=self.author, title='Old', content='Stale')
+        self.quiet = Post.objects.create(author=self.author, title='Quiet', content='Nobody')
+        Post.objects.filter(pk=self.old.pk).update(created_at=timezone.now() - timezone.timedelta(hours=30))
+        for reader in self.readers:
+            Like.objects.create(user=reader, post=self.old)
+        Like.objects.create(user=self.readers[0], post=self.fresh)
+
+    def test_newer_engagement_outranks_older_posts(self):
+        self.assertEqual(trending.refresh(), 2)
+        response = self.client.get(reverse('post-trending'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in response.data['results']], [self.fresh.id, self.old.id])
+
+    def test_engagement_outside_window_is_dropped(self):
+        trending.refresh()
+        Like.objects.filter(post=self.fresh).update(created_at=timezone.now() - timezone.timedelta(hours=72))
+        trending.refresh(now=timezone.now() + timezone.timedelta(seconds=1))
+        self.assertEqual(list(PostScore.objects.values_list('post_id', flat=True)), [self.old.id])
+
+    def test_refresh_works_in_batches(self):
+        trending.refresh()
+        Like.objects.filter(post__in=[self.fresh, self.old]).update(
+            created_at=timezone.now() - timezone.timedelta(hours=72)
+        )
+        Like.objects.create(user=self.readers[1], post=self.quiet)
+        with CaptureQueriesContext(connection) as queries:
+            scored = trending.refresh(now=timezone.now() + timezone.timedelta(seconds=1), batch_size=1)
+        self.assertEqual(scored, 1)
+        self.assertEqual(list(PostScore.objects.values_list('post_id', flat=True)), [self.quiet.id])
+        deletes = [query for query in queries.captured_queries if query['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 2)
+
+    def test_reading_trending_does_not_aggregate_engagement(self):
+        call_command('refresh_trending', stdout=mock.Mock())
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('post-trending'))
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries.captured_queries))
+
+
+class ThrottleTests(APITestCase):
+    """Tests for the token-bucket throttles on write endpoints"""
+
+    def setUp(self):
+        throttling.get_store().clear()
+        self.author = make_user('author')
+        self.reader = make_user('reader')
+        self.posts = [
+            Post.objects.create(author=self.author, title=f'Post {i}', content='Body') for i in range(3)
+        ]
+        self.client.force_authenticate(self.reader)
+
+    def like(self, post):
+        return self.client.post(reverse('like_post', args=[post.pk]))
+
+    def test_bucket_rejects_requests_once_empty(self):
+        with mock.patch.dict(api_settings.DEFAULT_THROTTLE_RATES, {'likes': '2/min'}):
+            first = self.like(self.posts[0])
+            self.assertEqual(first['RateLimit-Limit'], '2')
+            self.assertEqual(first['RateLimit-Remaining'], '1')
+            self.assertEqual(self.like(self.posts[1]).status_code, status.HTTP_201_CREATED)
+            rejected = self.like(self.posts[2])
+        self.assertEqual(rejected.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(rejected['Retry-After'], '30')
+        self.assertEqual(rejected['RateLimit-Remaining'], '0')
+        self.assertFalse(Like.objects.filter(post=self.posts[2]).exists())
+
+    def test_bucket_refills_over_time(self):
+        store = throttling.InMemoryBucketStore()
+        with mock.patch('time.monotonic', return_value=1000.0):
+            self.assertTrue(store.consume('key', 1, 1 / 60).allowed)
+            self.assertFalse(store.consume('key', 1, 1 / 60).allowed)
+        with mock.patch('time.monotonic', return_value=1060.0):
+            self.assertTrue(store.consume('key', 1, 1 / 60).allowed)
+
+    def test_comment_endpoints_share_a_bucket(self):
+        with mock.patch.dict(api_settings.DEFAULT_THROTTLE_RATES, {'comments': '2/min'}):
+            self.client.post(reverse('post-add-comment', args=[self.posts[0].pk]), {'content': 'One'})
+            created = self.client.post(reverse('comment-list'), {'post': self.posts[0].pk, 'content': 'Two'})
+            self.assertEqual(created.status_code, status.HTTP_201_CREATED)
+            rejected = self.client.post(reverse('comment-list'), {'post': self.posts[0].pk, 'content': 'Three'})
+        self.assertEqual(rejected.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertEqual(self.client.get(reverse('comment-list')).status_code, status.HTTP_200_OK)
+
+    def test_buckets_are_per_user(self):
+        with mock.patch.dict(api_settings.DEFAULT_THROTTLE_RATES, {'likes': '1/min'}):
+            self.like(self.posts[0])
+            self.client.force_authenticate(self.author)
+            self.assertEqual(self.like(self.posts[0]).status_code, status.HTTP_201_CREATED)
+
+
+class LikeToggleTests(APITestCase):
+    """Tests for the PUT/DELETE like toggle"""
+
+    def setUp(self):
+        cache.clear()
+        throttling.get_store().clear()
+        self.author = make_user('author')
+        self.reader = make_user('reader')
+        self.post = Post.objects.create(author=self.author, title='Hello', content='World')
+        self.url = reverse('post_like', args=[self.post.pk])
+        self.client.force_authenticate(self.reader)
+
+    def test_put_and_delete_are_idempotent(self):
+        first = self.client.put(self.url)
+        second = self.client.put(self.url)
+        self.assertEqual((first.data['created'], first.data['likes_count']), (True, 1))
+        self.assertEqual((second.data['created'], second.data['likes_count']), (False, 1))
+        self.assertEqual(Like.objects.filter(post=self.post).count(), 1)
+
+        first = self.client.delete(self.url)
+        second = self.client.delete(self.url)
+        self.assertEqual((first.data['deleted'], first.data['likes_count']), (True, 0))
+        self.assertEqual((second.data['deleted'], second.data['likes_count']), (False, 0))
+        self.assertFalse(Like.objects.exists())
+
+    def test_toggle_writes_without_reading_likes(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.put(self.url)
+        statements = [query['sql'] for query in queries.captured_queries]
+        self.assertFalse(any(sql.startswith('SELECT') and 'posts_like' in sql for sql in statements))
+        self.assertEqual(NotificationEvent.objects.get().recipient_id, self.author.pk)
+
+    def test_unknown_post_is_not_found(self):
+        url = reverse('post_like', args=[self.post.pk + 100])
+        self.assertEqual(self.client.put(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Like.objects.exists())
+
+    def test_idempotency_key_replays_the_first_response(self):
+        headers = {'HTTP_IDEMPOTENCY_KEY': 'retry-1'}
+        first = self.client.put(self.url, **headers)
+        Like.objects.all().delete()
+        with CaptureQueriesContext(connection) as queries:
+            replay = self.client.put(self.url, **headers)
+        self.assertEqual(replay.data, first.data)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertFalse(any('posts_like' in query['sql'] for query in queries.captured_queries))
+
+
+@mock.patch.object(counters, 'SHARD_THRESHOLD', 2)
+class ShardedCounterTests(APITestCase):
+    """Tests for sharded counters of hot posts"""
+
+    def setUp(self):
+        cache.clear()
+        throttling.get_store().clear()
+        self.author = make_user('author')
+        self.readers = [make_user(f'reader{i}') for i in range(4)]
+        self.post = Post.objects.create(author=self.author, title='Viral', content='Post')
+
+    def like_all(self):
+        for reader in self.readers:
+            Like.objects.create(user=reader, post=self.post)
+
+    def test_increments_past_threshold_go_to_shards(self):
+        self.like_all()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 2)
+        self.assertEqual(sum(PostCounterShard.objects.values_list('delta', flat=True)), 2)
+        self.assertEqual(counters.get_count(self.post.pk, 'likes_count', self.post.likes_count), 4)
+
+    def test_api_adds_pending_shards(self):
+        self.like_all()
+        self.client.force_authenticate(self.author)
+        detail = self.client.get(reverse('post-detail', args=[self.post.pk]))
+        self.assertEqual(detail.data['likes_count'], 4)
+        listing = self.client.get(reverse('post-list'))
+        self.assertEqual(listing.data['results'][0]['likes_count'], 4)
+
+    def test_editing_a_post_keeps_concurrent_counts(self):
+        self.client.force_authenticate(self.author)
+        with mock.patch.object(Post, 'save', autospec=True, side_effect=self.like_before_save):
+            response = self.client.patch(reverse('post-detail', args=[self.post.pk]), {'title': 'Edited'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.title, self.post.likes_count), ('Edited', 1))
+
+    def like_before_save(self, post, *args, **kwargs):
+        # A like lands between the edit's read and its save
+        Like.objects.create(user=self.readers[0], post=post)
+        super(Post, post).save(*args, **kwargs)
+
+    def test_compaction_folds_shards_into_post(self):
+        self.like_all()
+        Like.objects.filter(user=self.readers[0]).delete()
+        out = StringIO()
+        call_command('compact_counters', stdout=out)
+        self.assertIn('Compacted counters of 1 posts', out.getvalue())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 3)
+        self.assertFalse(PostCounterShard.objects.exists())
+
+    def test_decrement_of_drifted_cold_counter_is_dropped(self):
+        Like.objects.create(user=self.readers[0], post=self.post)
+        Post.objects.filter(pk=self.post.pk).update(likes_count=0)
+        Like.objects.filter(user=self.readers[0]).delete()
+        self.assertFalse(PostCounterShard.objects.exists())
+        counters.compact()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+
+    def test_toggle_on_hot_post_counts_shards(self):
+        self.like_all()
+        self.client.force_authenticate(self.author)
+        url = reverse('post_like', args=[self.post.pk])
+        self.assertEqual(self.client.put(url).data['likes_count'], 5)
+        self.assertEqual(self.client.delete(url).data['likes_count'], 4)
+
+    def test_deleting_hot_post_leaves_no_shards_behind(self):
+        self.like_all()
+        self.post.delete()
+        counters.compact()
+        self.assertFalse(PostCounterShard.objects.exists())
+
+
+class CommentThreadTests(APITestCase):
+    """Tests for threaded comments"""
+
+    def setUp(self):
+        throttling.get_store().clear()
+        self.author = make_user('author')
+        self.reader = make_user('reader')
+        self.post = Post.objects.create(author=self.author, title='Hello', content='World')
+        self.root = Comment.objects.create(post=self.post, author=self.reader, content='Root')
+        self.reply = Comment.objects.create(
+            post=self.post, author=self.author, content='Reply', parent=self.root
+        )
+        self.nested = Comment.objects.create(
+            post=self.post, author=self.reader, content='Nested', parent=self.reply
+        )
+        self.sibling = Comment.objects.create(
+            post=self.post, author=self.reader, content='Sibling', parent=self.root
+        )
+        self.client.force_authenticate(self.reader)
+
+    def test_comments_cannot_move_to_another_post(self):
+        other = Post.objects.create(author=self.author, title='Other', content='Post')
+        response = self.client.patch(
+            reverse('comment-detail', args=[self.nested.pk]), {'post': other.pk, 'content': 'Edited'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.nested.refresh_from_db()
+        self.assertEqual((self.nested.post_id, self.nested.content), (self.post.pk, 'Edited'))
+
+    def test_failed_path_update_rolls_back_the_comment(self):
+        with mock.patch.object(Comment.objects, 'filter', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                Comment.objects.create(post=self.post, author=self.reader, content='Lost')
+        self.assertFalse(Comment.objects.filter(content='Lost').exists())
+
+    def test_paths_and_reply_counts(self):
+        self.assertEqual(self.nested.path, self.root.path + self.reply.path[-10:] + self.nested.path[-10:])
+        self.assertEqual(self.nested.depth, 2)
+        self.root.refresh_from_db()
+        self.assertEqual(self.root.reply_count, 2)
+        self.nested.delete()
+        self.reply.refresh_from_db()
+        self.assertEqual(self.reply.reply_count, 0)
+
+    def test_post_comments_lists_top_level_only(self):
+        response = self.client.get(reverse('post-comments', args=[self.post.pk]))
+        self.assertEqual([c['id'] for c in response.data['results']], [self.root.pk])
+        self.assertEqual(response.data['results'][0]['reply_count'], 2)
+
+    def test_replies_are_paged_with_cursors(self):
+        url = reverse('comment-replies', args=[self.root.pk])
+        first = self.client.get(url, {'page_size': 1})
+        self.assertEqual([c['id'] for c in first.data['results']], [self.reply.pk])
+        second = self.client.get(first.data['next'])
+        self.assertEqual([c['id'] for c in second.data['results']], [self.sibling.pk])
+        self.assertIsNone(second.data['next'])
+
+    def test_thread_loads_subtree_depth_first_in_one_query(self):
+        url = reverse('comment-thread', args=[self.root.pk])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        ids = [c['id'] for c in response.data['results']]
+        self.assertEqual(ids, [self.reply.pk, self.nested.pk, self.sibling.pk])
+        self.assertEqual(sum('posts_comment' in q['sql'] for q in queries.captured_queries), 2)
+        shallow = self.client.get(url, {'depth': 1})
+        self.assertEqual([c['id'] for c in shallow.data['results']], [self.reply.pk, self.sibling.pk])
+
+    def test_reply_through_add_comment(self):
+        url = reverse('post-add-comment', args=[self.post.pk])
+        response = self.client.post(url, {'content': 'Me too', 'parent': self.nested.pk})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        reply = Comment.objects.get(content='Me too')
+        self.assertEqual((reply.parent_id, reply.depth), (self.nested.pk, 3))
+
+    def test_reply_must_belong_to_the_same_post(self):
+        other = Post.objects.create(author=self.author, title='Other', content='Post')
+        url = reverse('post-add-comment', args=[other.pk])
+        response = self.client.post(url, {'content': 'Wrong', 'parent': self.root.pk})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('parent', response.data)
+
+    def test_reconcile_repairs_reply_counts(self):
+        Comment.objects.update(reply_count=9)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.root.refresh_from_db()
+        self.nested.refresh_from_db()
+        self.assertEqual((self.root.reply_count, self.nested.reply_count), (2, 0))
+
+
+class ResponseCacheTests(APITestCase):
+    """Tests for the versioned anonymous response cache"""
+
+    def setUp(self):
+        cache.clear()
+        throttling.get_store().clear()
+        self.author = make_user('author')
+        self.reader = make_user('reader')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post = Post.objects.create(author=self.author, title='Hello', content='World')
+
+    def test_anonymous_reads_are_served_from_cache(self):
+        url = reverse('post-detail', args=[self.post.pk])
+        self.assertEqual(self.client.get(url)['X-Cache'], 'miss')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'hit')
+        self.assertEqual(response.data['title'], 'Hello')
+        self.assertEqual(len(queries), 0)
+
+    def test_query_string_is_part_of_the_key(self):
+        url = reverse('post-list')
+        self.client.get(url)
+        self.assertEqual(self.client.get(url, {'page_size': 1})['X-Cache'], 'miss')
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'api.example.com'])
+    def test_origin_is_part_of_the_key(self):
+        Post.objects.create(author=self.author, title='Second', content='Post')
+        url = reverse('post-list')
+        self.client.get(url, {'page_size': 1})
+        response = self.client.get(url, {'page_size': 1}, HTTP_HOST='api.example.com', secure=True)
+        self.assertEqual(response['X-Cache'], 'miss')
+        self.assertTrue(response.data['next'].startswith('https://api.example.com/'))
+
+    def test_writes_bump_the_generation(self):
+        detail = reverse('post-detail', args=[self.post.pk])
+        comments = reverse('comment-list')
+        for url in (reverse('post-list'), detail, comments):
+            self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.post, author=self.reader, content='Nice')
+        for url in (reverse('post-list'), detail, comments):
+            self.assertEqual(self.client.get(url)['X-Cache'], 'miss')
+        self.assertEqual(self.client.get(detail).data['comments_count'], 1)
+
+    def test_like_toggle_bumps_only_its_post(self):
+        other = Post.objects.create(author=self.author, title='Other', content='Post')
+        self.client.get(reverse('post-detail', args=[other.pk]))
+        self.client.force_authenticate(self.reader)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(reverse('post_like', args=[self.post.pk]))
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(reverse('post-detail', args=[self.post.pk]))['X-Cache'], 'miss')
+        self.assertEqual(self.client.get(reverse('post-detail', args=[other.pk]))['X-Cache'], 'hit')
+
+    def test_authenticated_reads_bypass_the_cache(self):
+        self.client.force_authenticate(self.reader)
+        response = self.client.get(reverse('post-detail', args=[self.post.pk]))
+        self.assertNotIn('X-Cache', response)
+
+
+class ConditionalGetTests(APITestCase):
+    """Tests for ETag/Last-Modified on post detail and the feed"""
+
+    def setUp(self):
+        cache.clear()
+        throttling.get_store().clear()
+        self.author = make_user('author')
+        self.reader = make_user('reader')
+        self.reader.follow(self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post = Post.objects.create(author=self.author, title='Hello', content='World')
+        self.client.force_authenticate(self.reader)
+
+    def revalidate(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', first)
+        return first, self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+    def test_unchanged_post_detail_is_not_modified_without_serializing(self):
+        url = reverse('post-detail', args=[self.post.pk])
+        first = self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        # The author id lookup is cached too: no comments, likes or serialization
+        self.assertEqual(len(queries), 0)
+
+    def test_post_detail_etag_follows_author_profile(self):
+        url = reverse('post-detail', args=[self.post.pk])
+        first = self.client.get(url)
+        self.author.first_name = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['author']['first_name'], 'Renamed')
+        self.assertEqual(self.client.get(reverse('post-detail', args=[0])).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_post_detail_etag_follows_comments(self):
+        url = reverse('post-detail', args=[self.post.pk])
+        first = self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.post, author=self.reader, content='Nice')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    def test_feed_first_page(self):
+        first, response = self.revalidate(reverse('feed'))
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(author=self.author, title='Newer', content='Post')
+        response = self.client.get(reverse('feed'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_etags_are_per_user(self):
+        url = reverse('post-detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        self.client.force_authenticate(self.author)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+
+class ORJSONRendererTests(APITestCase):
+    """Tests for the orjson renderer and parser"""
+
+    def test_output_matches_the_stdlib_renderer(self):
+        data = {
+            'when': timezone.now(),
+            'price': Decimal('1.50'),
+            'text': 'caf\u00e9 \u2028',
+            1: [None, True, 2.5],
+        }
+        self.assertEqual(
+            json.loads(ORJSONRenderer().render(data)), json.loads(JSONRenderer().render(data))
+        )
+        self.assertIn(b'\\u2028', ORJSONRenderer().render(data))
+
+    def test_parser_round_trips_and_rejects_garbage(self):
+        self.assertEqual(ORJSONParser().parse(BytesIO(b'{"a": [1, "\\u00e9"]}')), {'a': [1, 'é']})
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(BytesIO(b'{"a": NaN}'))
+
+    def test_api_negotiates_json(self):
+        author = make_user('author')
+        self.client.force_authenticate(author)
+        response = self.client.post(
+            reverse('post-list'), data=json.dumps({'title': 'Hi', 'content': 'There'}),
+            content_type='application/json', HTTP_ACCEPT='application/json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIsInstance(response.accepted_renderer, ORJSONRenderer)
+        self.assertEqual(json.loads(response.content)['title'], 'Hi')
+
+
+class CompressionTests(APITestCase):
+    """Tests for the response compression middleware"""
+
+    def setUp(self):
+        cache.clear()
+        throttling.get_store().clear()
+        compression.reset_stats()
+        author = make_user('author')
+        for i in range(20):
+            Post.objects.create(author=author, title=f'Post {i}', content='Lorem ipsum dolor ' * 20)
+
+    def test_large_json_is_gzipped(self):
+        response = self.client.get(reverse('post-list'), HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(json.loads(gzip.decompress(response.content))['results'][0]['title'], 'Post 19')
+        stats = compression.get_stats()
+        self.assertEqual(stats['compressed'], 1)
+        self.assertLess(stats['ratio'], 0.5)
+
+    def test_small_bodies_and_unsupported_encodings_are_skipped(self):
+        small = self.client.get(reverse('post-list'), {'page_size': 1}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(small.has_header('Content-Encoding'))
+        identity = self.client.get(reverse('post-list'), HTTP_ACCEPT_ENCODING='gzip;q=0, deflate')
+        self.assertFalse(identity.has_header('Content-Encoding'))
+
+    def test_negotiation(self):
+        self.assertEqual(compression.negotiate('gzip;q=0.5, identity'), 'gzip')
+        self.assertIsNone(compression.negotiate('*;q=0'))
+        with mock.patch.object(compression, 'brotli', mock.Mock()):
+            self.assertEqual(compression.negotiate('gzip, br'), 'br')
+            self.assertEqual(compression.negotiate('gzip;q=1, br;q=0.5'), 'gzip')
+
+    def test_streaming_responses_are_compressed_chunk_by_chunk(self):
+        compressor = compression.Compressor('gzip')
+        chunks = list(compressor.compress_chunks([b'{"a": ', b'1}']))
+        self.assertTrue(all(chunks))
+        self.assertEqual(gzip.decompress(b''.join(chunks)), b'{"a": 1}')
+
+
+
+class QueryInstrumentationTests(QueryBudgetMixin, APITestCase):
+    """Tests for the per-request query recorder and budgets"""
+
+    def setUp(self):
+        cache.clear()
+        throttling.get_store().clear()
+        self.author = make_user('author')
+        self.readers = [make_user(f'reader{i}') for i in range(3)]
+        for reader in self.readers:
+            reader.follow(self.author)
+        for i in range(12):
+            post = Post.objects.create(author=self.author, title=f'Post {i}', content='Body')
+            for reader in self.readers:
+                Like.objects.create(post=post, user=reader)
+                Comment.objects.create(post=post, author=reader, content='Nice')
+        self.client.force_authenticate(self.readers[0])
+
+    def test_feed_stays_within_its_budget(self):
+        response = self.client.get(reverse('feed'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = self.assertWithinQueryBudget(response)
+        self.assertGreater(stats.count, 0)
+        self.assertRegex(response['Server-Timing'], rf'^db;dur=[\d.]+;desc="{stats.count} queries", app;dur=[\d.]+$')
+
+    def test_regressions_fail_with_the_repeated_statements(self):
+        response = self.client.get(reverse('post-detail', args=[Post.objects.first().pk]))
+        self.assertWithinQueryBudget(response)
+        with self.assertRaisesMessage(AssertionError, 'over its budget of 1'):
+            self.assertWithinQueryBudget(response, budget=1)
+        # An N+1 regression: one author lookup per post
+        with instrumentation.record_queries() as response.query_stats:
+            for post in Post.objects.all()[:3]:
+                post.author.username
+        with self.assertRaisesMessage(AssertionError, 'repeated statements:\n  3x SELECT'):
+            self.assertWithinQueryBudget(response, budget=2)
+
+    def test_fingerprints_collapse_values(self):
+        self.assertEqual(
+            instrumentation.fingerprint("SELECT * FROM t WHERE id = 12 AND name = 'it''s'"),
+            instrumentation.fingerprint("SELECT  * FROM t WHERE id = 7 AND name = 'x'"),
+        )
+        self.assertEqual(
+            instrumentation.fingerprint('SELECT * FROM t WHERE id IN (1, 2, 3)'),
+            'SELECT * FROM t WHERE id IN (...)',
+        )
+        with instrumentation.record_queries() as recorder:
+            for post in Post.objects.all()[:3]:
+                post.author.username
+        self.assertEqual(recorder.count, 4)
+        self.assertEqual(recorder.duplicates[0][1], 3)
+
+    def test_requests_over_budget_are_logged(self):
+        with mock.patch.dict(instrumentation.BUDGETS, {'feed': 1}):
+            with self.assertLogs('social_media_api.instrumentation', 'WARNING') as logs:
+                self.client.get(reverse('feed'))
+        self.assertIn('(feed) ran', logs.output[0])
+        self.assertIn('(budget 1)', logs.output[0])
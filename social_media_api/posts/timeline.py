@@ -0,0 +1,204 @@
+"""
+Materialized home timelines (fan-out on write).
+
+Every new post is copied into a TimelineEntry row for each follower of its
+author, so reading a feed page is a single indexed range scan over
+(user, -created_at, -id). Authors with very many followers are skipped at
+write time, which keeps a single post from turning into millions of
+inserts; their new posts are pulled into a reader's timeline when the feed
+is read instead (fan-out on read). When such an author drops back below the
+threshold, their recent posts are fanned out to every follower, so posts
+made meanwhile stay in the feeds of followers who did not read them.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q
+
+from accounts.models import CustomUser, FollowRelationship
+from social_media_api import pubsub
+from .models import Post, TimelineEntry
+
+# Authors with at least this many followers are read on demand, not fanned out
+FANOUT_THRESHOLD = getattr(settings, 'TIMELINE_FANOUT_THRESHOLD', 5000)
+# Number of an author's recent posts copied into a timeline on follow/rebuild
+BACKFILL_LIMIT = getattr(settings, 'TIMELINE_BACKFILL_LIMIT', 200)
+BATCH_SIZE = 1000
+
+
+def is_high_fanout(author):
+    """Return True if posts by ``author`` are merged at read time."""
+    return author.followers_count >= FANOUT_THRESHOLD
+
+
+def high_fanout_following_ids(user):
+    """Ids of the high-fanout authors ``user`` follows."""
+    return list(
+        CustomUser.objects.filter(followers=user, followers_count__gte=FANOUT_THRESHOLD)
+        .values_list('id', flat=True)
+    )
+
+
+def fan_out_post(post, batch_size=BATCH_SIZE):
+    """Copy ``post`` into the timeline of every follower of its author."""
+    message = {'type': 'post', 'id': post.id, 'author_id': post.author_id}
+    if is_high_fanout(post.author):
+        # Streams of followers subscribe to the author's channel instead
+        channel = pubsub.author_channel(post.author_id)
+        transaction.on_commit(lambda: pubsub.publish(channel, message))
+        return 0
+
+    follower_ids = (
+        FollowRelationship.objects.filter(following_id=post.author_id)
+        .values_list('follower_id', flat=True)
+        .iterator(chunk_size=batch_size)
+    )
+    created = 0
+    batch = []
+    for follower_id in follower_ids:
+        batch.append(TimelineEntry(
+            user_id=follower_id,
+            post_id=post.id,
+            author_id=post.author_id,
+            created_at=post.created_at,
+        ))
+        if len(batch) >= batch_size:
+            _insert_and_publish(batch, message)
+            created += len(batch)
+            batch = []
+    if batch:
+        _insert_and_publish(batch, message)
+        created += len(batch)
+    return created
+
+
+def _insert_and_publish(entries, message):
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+    channels = [pubsub.user_channel(entry.user_id) for entry in entries]
+    transaction.on_commit(lambda: _publish_all(channels, message))
+
+
+def _publish_all(channels, message):
+    for channel in channels:
+        pubsub.publish(channel, message)
+
+
+def backfill_authors(user, author_ids, limit=BACKFILL_LIMIT):
+    """Copy the most recent posts of ``author_ids`` into ``user``'s timeline."""
+    author_ids = set(author_ids) - set(high_fanout_following_ids(user))
+    if not author_ids:
+        return 0
+
+    posts = (
+        Post.objects.filter(author_id__in=author_ids)
+        .order_by('-created_at')
+        .values_list('id', 'author_id', 'created_at')[:limit]
+    )
+    entries = [
+        TimelineEntry(user_id=user.id, post_id=post_id, author_id=author_id, created_at=created_at)
+        for post_id, author_id, created_at in posts
+    ]
+    TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    return len(entries)
+
+
+def remove_authors(user, author_ids):
+    """Drop posts by ``author_ids`` from ``user``'s timeline."""
+    deleted, _ = TimelineEntry.objects.filter(user=user, author_id__in=author_ids).delete()
+    return deleted
+
+
+def rebuild_timeline(user, limit=BACKFILL_LIMIT):
+    """Recreate ``user``'s timeline from the follow graph."""
+    TimelineEntry.objects.filter(user=user).delete()
+    following_ids = FollowRelationship.objects.filter(follower=user).values_list('following_id', flat=True)
+    return backfill_authors(user, list(following_ids), limit=limit)
+
+
+def fan_out_author(author_id, limit=BACKFILL_LIMIT, batch_size=BATCH_SIZE):
+    """Copy the most recent posts of ``author_id`` into every follower's timeline."""
+    posts = list(
+        Post.objects.filter(author_id=author_id)
+        .order_by('-created_at')
+        .values_list('id', 'created_at')[:limit]
+    )
+    if not posts:
+        return 0
+    follower_ids = (
+        FollowRelationship.objects.filter(following_id=author_id)
+        .values_list('follower_id', flat=True)
+        .iterator(chunk_size=batch_size)
+    )
+    created = 0
+    batch = []
+    for follower_id in follower_ids:
+        batch.extend(
+            TimelineEntry(user_id=follower_id, post_id=post_id, author_id=author_id, created_at=created_at)
+            for post_id, created_at in posts
+        )
+        if len(batch) >= batch_size:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            created += len(batch)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        created += len(batch)
+    return created
+
+
+def fan_out_dropped_authors(author_ids, removed=1):
+    """
+    Fan out the authors of ``author_ids`` who just lost ``removed``
+    followers and so fell below the threshold; return their ids.
+    """
+    dropped = list(
+        CustomUser.objects.filter(
+            pk__in=author_ids,
+            followers_count__range=(FANOUT_THRESHOLD - removed, FANOUT_THRESHOLD - 1),
+        ).values_list('id', flat=True)
+    )
+    for author_id in dropped:
+        fan_out_author(author_id)
+    return dropped
+
+
+def pull_high_fanout(user, limit=BACKFILL_LIMIT):
+    """
+    Copy posts by the high-fanout authors ``user`` follows into the
+    timeline, up to ``limit`` newer than the latest entry of each author;
+    return the number copied.
+    """
+    author_ids = high_fanout_following_ids(user)
+    if not author_ids:
+        return 0
+    latest = dict(
+        TimelineEntry.objects.filter(user=user, author_id__in=author_ids)
+        .values('author_id').annotate(latest=Max('created_at'))
+        .values_list('author_id', 'latest')
+    )
+    condition = Q()
+    for author_id in author_ids:
+        if author_id in latest:
+            condition |= Q(author_id=author_id, created_at__gt=latest[author_id])
+        else:
+            condition |= Q(author_id=author_id)
+    posts = (
+        Post.objects.filter(condition)
+        .order_by('-created_at')
+        .values_list('id', 'author_id', 'created_at')[:limit]
+    )
+    entries = [
+        TimelineEntry(user_id=user.id, post_id=post_id, author_id=author_id, created_at=created_at)
+        for post_id, author_id, created_at in posts
+    ]
+    TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    return len(entries)
+
+
+def feed_entries(user):
+    """
+    Timeline rows of ``user``'s home feed, newest first, after pulling in
+    posts by the high-fanout authors they follow.
+    """
+    pull_high_fanout(user)
+    return TimelineEntry.objects.filter(user=user).order_by('-created_at')
@@ -0,0 +1,89 @@
+"""
+Trending posts.
+
+A post's trending score is its recent engagement divided by a power of its
+age (the "gravity" ranking popularised by Hacker News)::
+
+    score = (likes * LIKE_WEIGHT + comments * COMMENT_WEIGHT) / (age_hours + 2) ** GRAVITY
+
+Only likes and comments created inside the trending window are counted, so
+a refresh reads the recent Like/Comment rows rather than the whole
+engagement history. Since the score decays with the post's age, every run
+recomputes all posts engaged with inside the window, not just those with new
+likes or comments. Scores are stored in PostScore and read back in score
+order, which keeps the trending endpoint O(page size).
+"""
+
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Comment, Like, Post, PostScore
+
+WINDOW_HOURS = getattr(settings, 'TRENDING_WINDOW_HOURS', 48)
+GRAVITY = getattr(settings, 'TRENDING_GRAVITY', 1.8)
+LIKE_WEIGHT = 1.0
+COMMENT_WEIGHT = 2.0
+BATCH_SIZE = 1000
+
+
+def score(likes, comments, age_hours, gravity=GRAVITY):
+    """Time-decayed engagement score."""
+    engagement = likes * LIKE_WEIGHT + comments * COMMENT_WEIGHT
+    return engagement / (max(age_hours, 0) + 2) ** gravity
+
+
+def _recent_counts(model, since):
+    return dict(
+        model.objects.filter(created_at__gte=since)
+        .order_by()
+        .values_list('post')
+        .annotate(total=Count('pk'))
+    )
+
+
+def refresh(now=None, window_hours=WINDOW_HOURS, gravity=GRAVITY, batch_size=BATCH_SIZE):
+    """
+    Recompute the scores of posts engaged with inside the window.
+
+    Posts that dropped out of the window lose their score row. Each batch is
+    written and deleted in its own statement rather than one long transaction,
+    so readers may briefly see scores of two consecutive runs. Returns the
+    number of posts scored.
+    """
+    now = now or timezone.now()
+    since = now - timezone.timedelta(hours=window_hours)
+    likes = _recent_counts(Like, since)
+    comments = _recent_counts(Comment, since)
+    post_ids = sorted(likes.keys() | comments.keys())
+
+    for start in range(0, len(post_ids), batch_size):
+        chunk = post_ids[start:start + batch_size]
+        rows = [
+            PostScore(
+                post_id=post_id,
+                score=score(
+                    likes.get(post_id, 0),
+                    comments.get(post_id, 0),
+                    (now - created_at).total_seconds() / 3600,
+                    gravity,
+                ),
+                updated_at=now,
+            )
+            for post_id, created_at in Post.objects.filter(pk__in=chunk).values_list('pk', 'created_at')
+        ]
+        PostScore.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['post'],
+            update_fields=['score', 'updated_at'],
+        )
+
+    # Rows not touched by this refresh have no engagement left in the window
+    stale = PostScore.objects.filter(updated_at__lt=now)
+    while True:
+        chunk = list(stale.values_list('pk', flat=True)[:batch_size])
+        if not chunk:
+            break
+        stale.filter(pk__in=chunk).delete()
+    return len(post_ids)
@@ -13,4 +13,6 @@ urlpatterns = [
     # CHECKER WANTS EXACTLY THESE PATTERNS:
     path('posts/<int:pk>/like/', LikePostView.as_view(), name='like_post'),
     path('posts/<int:pk>/unlike/', UnlikePostView.as_view(), name='unlike_post'),
+    # PUT likes, DELETE unlikes (also accepted on posts/<pk>/like/)
+    path('posts/<int:pk>/like', LikePostView.as_view(), name='post_like'),
 ]
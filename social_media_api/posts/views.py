@@ -2,16 +2,29 @@ from rest_framework import viewsets, permissions, filters, status, generics
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from .models import Post, Comment, Like
 from .serializers import (
     PostSerializer, 
+    PostListSerializer,
     PostCreateSerializer,
     CommentSerializer,
     CommentCreateSerializer
 )
 from django.contrib.auth import get_user_model
-from notifications.models import Notification
+from social_media_api.pagination import KeysetPagination
+from social_media_api.serializers import EXPAND_PARAM, parse_field_list
+from social_media_api.idempotency import idempotent
+from social_media_api.conditional import Validators, conditional, generation_time
+from social_media_api.response_cache import (
+    TIMEOUT as RESPONSE_CACHE_TIMEOUT, cache_anonymous, get_generations
+)
+from . import likes, timeline
+from .search import PostSearchFilter
 
 User = get_user_model()
 
@@ -21,26 +34,103 @@ class IsAuthorOrReadOnly(permissions.BasePermission):
             return True
         return obj.author == request.user
 
+def with_list_prefetches(queryset, request):
+    """Prefetch what PostListSerializer renders for this request"""
+    expand = parse_field_list(request, EXPAND_PARAM)
+    queryset = queryset.with_comments_preview()
+    if 'comments' in expand:
+        queryset = queryset.with_comments()
+    if 'likes' in expand:
+        queryset = queryset.with_likes()
+    return queryset
+
+def post_detail_validators(view, request, pk=None):
+    """
+    Every write to a post, its comments or its likes bumps post:<pk>; the
+    embedded author profile is versioned by user:<author id>
+    """
+    # The author lookup is cached under the post's generation, so the
+    # validators of an unchanged post cost no query
+    post_generation, = get_generations([f'post:{pk}'])
+    author_key = f'post:author:{pk}:{post_generation}'
+    author_id = cache.get(author_key)
+    if author_id is None:
+        author_id = Post.objects.filter(pk=pk).values_list('author_id', flat=True).first()
+        if author_id is None:
+            return None
+        cache.set(author_key, author_id, RESPONSE_CACHE_TIMEOUT)
+    generations = get_generations([f'post:{pk}', f'user:{author_id}'])
+    return Validators(generations, generation_time(max(generations)))
+
+def feed_validators(view, request):
+    """
+    Validators of the first feed page: which posts are on it and the
+    generations of those posts. Later pages are not validated.
+    """
+    if view.paginator.cursor_query_param in request.query_params:
+        return None
+    post_ids = list(
+        view.get_entries().order_by('-created_at', '-pk')
+        .values_list('post_id', flat=True)[:view.paginator.get_page_size(request)]
+    )
+    generations = get_generations([f'post:{pk}' for pk in post_ids])
+    last_modified = generation_time(max(generations)) if generations else None
+    return Validators(post_ids + generations, last_modified)
+
 class PostViewSet(viewsets.ModelViewSet):
     queryset = Post.objects.all()
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = KeysetPagination
+    # Set per action for the write actions (social_media_api.throttling)
+    throttle_scope = None
+    filter_backends = [DjangoFilterBackend, PostSearchFilter, filters.OrderingFilter]
     filterset_fields = ['author']
     search_fields = ['title', 'content']
     ordering_fields = ['created_at', 'updated_at']
     
+    def get_queryset(self):
+        if self.action in ('comments', 'add_comment'):
+            return Post.objects.all()
+        queryset = Post.objects.with_engagement(self.request.user)
+        if self.action in ('list', 'trending'):
+            return with_list_prefetches(queryset, self.request)
+        return queryset.with_comments().with_likes()
+    
     def get_serializer_class(self):
         if self.action == 'create':
             return PostCreateSerializer
+        if self.action in ('list', 'trending'):
+            return PostListSerializer
         return PostSerializer
     
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
     
+    # Anonymous reads are served from the versioned response cache
+    @cache_anonymous('posts')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @conditional(post_detail_validators)
+    @cache_anonymous('post:{pk}')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        # Reads the precomputed PostScore table (see posts.trending)
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            trending_score__isnull=False
+        ).annotate(score=F('trending_score__score')).order_by('-score')
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    
     @action(detail=True, methods=['get'])
     def comments(self, request, pk=None):
+        # Top-level comments only; replies load through /comments/<pk>/replies/
         post = self.get_object()
-        comments = post.comments.all()
+        comments = Comment.objects.top_level(post).select_related('author')
         page = self.paginate_queryset(comments)
         if page is not None:
             serializer = CommentSerializer(page, many=True)
@@ -48,43 +138,95 @@ class PostViewSet(viewsets.ModelViewSet):
         serializer = CommentSerializer(comments, many=True)
         return Response(serializer.data)
     
-    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated],
+            throttle_scope='comments')
     def add_comment(self, request, pk=None):
         post = self.get_object()
-        serializer = CommentCreateSerializer(data=request.data, context={'request': request})
+        serializer = CommentCreateSerializer(
+            data=request.data, context={'request': request, 'post': post}
+        )
         if serializer.is_valid():
-            serializer.save(post=post, author=request.user)
+            with transaction.atomic():
+                serializer.save(post=post, author=request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class CommentViewSet(viewsets.ModelViewSet):
-    queryset = Comment.objects.all()
+    queryset = Comment.objects.select_related('author')
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
     
+    @property
+    def throttle_scope(self):
+        # Creating here draws from the same bucket as PostViewSet.add_comment
+        return 'comments' if self.action == 'create' else None
+    
     def get_serializer_class(self):
         if self.action == 'create':
             return CommentCreateSerializer
         return CommentSerializer
     
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
+    
+    @cache_anonymous('comments')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @action(detail=True, methods=['get'], pagination_class=KeysetPagination)
+    def replies(self, request, pk=None):
+        """Cursor pages of the direct replies of a comment, oldest first"""
+        comment = self.get_object()
+        page = self.paginate_queryset(Comment.objects.replies_to(comment).select_related('author'))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    
+    @action(detail=True, methods=['get'], pagination_class=KeysetPagination)
+    def thread(self, request, pk=None):
+        """
+        Cursor pages of a comment's whole subtree in depth-first order;
+        ``?depth=n`` stops n levels below the comment.
+        """
+        comment = self.get_object()
+        try:
+            max_depth = int(request.query_params['depth'])
+        except (KeyError, ValueError):
+            max_depth = None
+        queryset = Comment.objects.subtree(comment, max_depth).select_related('author')
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
 # ===== FEED VIEW =====
 class FeedView(generics.ListAPIView):
-    serializer_class = PostSerializer
+    serializer_class = PostListSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    
+    def get_entries(self):
+        """The user's timeline rows; pages are range scans over its index"""
+        if not hasattr(self, '_entries'):
+            self._entries = timeline.feed_entries(self.request.user)
+        return self._entries
     
     def get_queryset(self):
-        following_users = self.request.user.following.all()
-        return Post.objects.filter(author__in=following_users).order_by('-created_at')
+        return with_list_prefetches(Post.objects.with_engagement(self.request.user), self.request)
+    
+    @conditional(feed_validators)
+    def list(self, request, *args, **kwargs):
+        entries = self.paginate_queryset(self.get_entries())
+        posts = self.get_queryset().in_bulk([entry.post_id for entry in entries])
+        page = [posts[entry.post_id] for entry in entries if entry.post_id in posts]
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
 # ===== LIKE/UNLIKE VIEWS =====
 # CHECKER WANTS EXACT: generics.get_object_or_404(Post, pk=pk)
 # CHECKER WANTS EXACT: Like.objects.get_or_create(user=request.user, post=post)
-# CHECKER WANTS EXACT: Notification.objects.create
 class LikePostView(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'likes'
     
     def post(self, request, pk):
         # CHECKER WANTS EXACT: generics.get_object_or_404(Post, pk=pk)
@@ -99,25 +241,43 @@ class LikePostView(generics.GenericAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # CHECKER WANTS: Notification.objects.create
-        # Create notification if not liking own post
-        if post.author != request.user:
-            Notification.objects.create(
-                recipient=post.author,
-                actor=request.user,
-                verb="liked your post",
-                target=post,
-                timestamp=timezone.now()
-            )
-        
+        # The like notification is queued by notifications.signals
+        post.refresh_from_db(fields=['likes_count'])
         return Response({
             "message": "Post liked successfully",
-            "likes_count": post.likes.count(),
+            "likes_count": post.likes_count,
             "like_id": like.id
         }, status=status.HTTP_201_CREATED)
+    
+    # PUT/DELETE /api/posts/<pk>/like: idempotent toggle, one upsert or
+    # delete that also returns the new counter (see posts.likes)
+    @idempotent
+    def put(self, request, pk):
+        try:
+            created, likes_count = likes.like(request.user.pk, pk)
+        except Post.DoesNotExist:
+            raise Http404
+        return Response({
+            "liked": True,
+            "created": created,
+            "likes_count": likes_count
+        }, status=status.HTTP_200_OK)
+    
+    @idempotent
+    def delete(self, request, pk):
+        try:
+            deleted, likes_count = likes.unlike(request.user.pk, pk)
+        except Post.DoesNotExist:
+            raise Http404
+        return Response({
+            "liked": False,
+            "deleted": deleted,
+            "likes_count": likes_count
+        }, status=status.HTTP_200_OK)
 
 class UnlikePostView(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'likes'
     
     def post(self, request, pk):
         # CHECKER WANTS EXACT: generics.get_object_or_404(Post, pk=pk)
@@ -126,10 +286,11 @@ class UnlikePostView(generics.GenericAPIView):
         try:
             like = Like.objects.get(user=request.user, post=post)
             like.delete()
+            post.refresh_from_db(fields=['likes_count'])
             
             return Response({
                 "message": "Post unliked successfully",
-                "likes_count": post.likes.count()
+                "likes_count": post.likes_count
             }, status=status.HTTP_200_OK)
         except Like.DoesNotExist:
             return Response(
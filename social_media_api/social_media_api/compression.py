@@ -0,0 +1,152 @@
+"""
+Response compression for API payloads.
+
+``social_media_api.middleware.CompressionMiddleware`` negotiates brotli
+(when the ``brotli`` package is installed) or gzip from ``Accept-Encoding``
+and compresses text-like responses:
+
+* bodies smaller than ``COMPRESSION_MIN_SIZE`` bytes are sent as they are,
+  since headers and CPU cost more than the bytes saved;
+* streaming responses are compressed chunk by chunk, each chunk flushed so
+  clients keep receiving data as it is produced (``text/event-stream`` is
+  never compressed, so SSE messages are not held back);
+* responses that already carry a ``Content-Encoding`` are left alone.
+
+Per-process counters of bytes in/out and time spent compressing are
+exposed through ``get_stats()`` (``GET /api/metrics/compression/``).
+
+Like any HTTP compression, this can leak secrets reflected next to
+attacker-controlled input (BREACH); the API sends tokens only in small
+responses below the size threshold.
+"""
+
+import threading
+import time
+import zlib
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_SIZE = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+GZIP_LEVEL = getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6)
+BROTLI_QUALITY = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5)
+
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/javascript', 'application/xml',
+    'application/problem+json', 'image/svg+xml', 'text/',
+)
+
+_stats = {'compressed': 0, 'skipped': 0, 'bytes_in': 0, 'bytes_out': 0, 'seconds': 0.0}
+_stats_lock = threading.Lock()
+
+
+def _record(bytes_in, bytes_out, seconds):
+    with _stats_lock:
+        _stats['compressed'] += 1
+        _stats['bytes_in'] += bytes_in
+        _stats['bytes_out'] += bytes_out
+        _stats['seconds'] += seconds
+
+
+def record_skip():
+    with _stats_lock:
+        _stats['skipped'] += 1
+
+
+def get_stats():
+    """Compression counters of this process, with the overall ratio and mean time."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['ratio'] = stats['bytes_out'] / stats['bytes_in'] if stats['bytes_in'] else 0.0
+    stats['mean_ms'] = stats['seconds'] * 1000 / stats['compressed'] if stats['compressed'] else 0.0
+    return stats
+
+
+def reset_stats():
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0.0 if name == 'seconds' else 0
+
+
+def is_compressible(content_type):
+    content_type = content_type.split(';')[0].strip().lower()
+    return content_type != 'text/event-stream' and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def negotiate(accept_encoding):
+    """Pick 'br' or 'gzip' from an Accept-Encoding header, or None."""
+    weights = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        weights[coding.strip().lower()] = quality
+    available = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best = None
+    for coding in available:
+        quality = weights.get(coding, weights.get('*', 0.0))
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (coding, quality)
+    return best[0] if best else None
+
+
+class Compressor:
+    """Incremental gzip or brotli stream that records its own metrics"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self.stream = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            # wbits=31 writes a gzip header and trailer
+            self.stream = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        self.bytes_in = self.bytes_out = 0
+        self.seconds = 0.0
+
+    def _timed(self, func, *args):
+        started = time.perf_counter()
+        data = func(*args)
+        self.seconds += time.perf_counter() - started
+        self.bytes_out += len(data)
+        return data
+
+    def compress(self, data):
+        self.bytes_in += len(data)
+        return self._timed(self.stream.process if self.encoding == 'br' else self.stream.compress, data)
+
+    def flush(self):
+        """Emit everything buffered so far, keeping the stream open."""
+        if self.encoding == 'br':
+            return self._timed(self.stream.flush)
+        return self._timed(self.stream.flush, zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        data = self._timed(self.stream.finish if self.encoding == 'br' else self.stream.flush)
+        _record(self.bytes_in, self.bytes_out, self.seconds)
+        return data
+
+    def compress_all(self, data):
+        return self.compress(data) + self.finish()
+
+    def compress_chunks(self, chunks):
+        for chunk in chunks:
+            data = self.compress(chunk) + self.flush()
+            if data:
+                yield data
+        yield self.finish()
+
+    async def compress_async_chunks(self, chunks):
+        async for chunk in chunks:
+            data = self.compress(chunk) + self.flush()
+            if data:
+                yield data
+        yield self.finish()
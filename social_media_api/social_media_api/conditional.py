@@ -0,0 +1,64 @@
+"""
+Conditional GET for API views.
+
+``conditional(validators)`` wraps an APIView handler. ``validators(view,
+request, **kwargs)`` returns a ``Validators(parts, last_modified)`` built
+from cheap inputs -- response cache generations (see
+social_media_api.response_cache), a few indexed columns, values already on
+``request.user`` -- or None when it cannot tell. The strong ETag is a hash
+of those parts together with the user, the full path and the negotiated
+format, so it is known before the serializer runs: a matching
+``If-None-Match`` (or, without it, ``If-Modified-Since``) returns 304
+without running the handler at all.
+"""
+
+import hashlib
+from collections import namedtuple
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+Validators = namedtuple('Validators', ['parts', 'last_modified'])
+
+
+def generation_time(generation):
+    """The moment a response cache generation was bumped, as a datetime."""
+    return datetime.fromtimestamp(generation / 1e9, tz=timezone.utc)
+
+
+def _etag(request, parts):
+    user = request.user.pk if request.user.is_authenticated else ''
+    key = [user, request.accepted_renderer.format, request.get_full_path(), *parts]
+    return quote_etag(hashlib.sha256(repr(key).encode()).hexdigest()[:32])
+
+
+def conditional(validators):
+    """Answer conditional GETs of an APIView handler from ``validators``."""
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_method(self, request, *args, **kwargs)
+            result = validators(self, request, **kwargs)
+            if result is None:
+                return view_method(self, request, *args, **kwargs)
+            etag = _etag(request, result.parts)
+            last_modified = int(result.last_modified.timestamp()) if result.last_modified else None
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response.headers.setdefault('ETag', etag)
+            if last_modified and not response.has_header('Last-Modified'):
+                response['Last-Modified'] = http_date(last_modified)
+            # Clients must revalidate; per-user responses stay out of shared caches
+            if request.user.is_authenticated:
+                patch_cache_control(response, no_cache=True, private=True)
+            else:
+                patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
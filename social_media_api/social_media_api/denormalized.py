@@ -0,0 +1,25 @@
+"""
+Denormalized counter columns shared by the accounts and posts models.
+
+Counters such as followers_count or likes_count are only ever moved in the
+database with F() updates (accounts.signals, posts.counters). An instance
+read earlier, e.g. the user behind a cached token or a post being edited,
+holds old values; a plain ``save()`` would write them back and undo every
+concurrent increment. Models listing their counters in ``COUNTER_FIELDS``
+save updates without them unless ``update_fields`` names them explicitly.
+"""
+
+
+class CounterFieldsMixin:
+    COUNTER_FIELDS = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
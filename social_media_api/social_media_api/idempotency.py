@@ -0,0 +1,43 @@
+"""
+``Idempotency-Key`` support for write endpoints.
+
+The first response to a request carrying an ``Idempotency-Key`` header is
+cached per user, method and path; retries with the same key get that
+response back (marked ``Idempotent-Replayed: true``) without running the
+view again, so a client retrying after a timeout costs no database work.
+"""
+
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+TIMEOUT = getattr(settings, 'IDEMPOTENCY_KEY_TIMEOUT', 24 * 60 * 60)
+
+
+def _cache_key(request, key):
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f'idempotency:{request.user.pk}:{request.method}:{request.path}:{digest}'
+
+
+def idempotent(view_method):
+    """Replay the stored response of an APIView handler for a repeated key."""
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        cache_key = _cache_key(request, key)
+        stored = cache.get(cache_key)
+        if stored is not None:
+            status_code, data = stored
+            return Response(data, status=status_code, headers={'Idempotent-Replayed': 'true'})
+        response = view_method(self, request, *args, **kwargs)
+        # Server errors are not stored so the client can retry them
+        if response.status_code < 500:
+            cache.set(cache_key, (response.status_code, response.data), TIMEOUT)
+        return response
+    return wrapper
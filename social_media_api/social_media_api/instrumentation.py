@@ -0,0 +1,111 @@
+"""
+Per-request SQL instrumentation and query budgets.
+
+``social_media_api.middleware.QueryInstrumentationMiddleware`` runs every
+request inside ``record_queries()``, which hooks ``execute_wrapper`` on all
+database connections and records:
+
+* the number of queries and the total time spent in the database;
+* a fingerprint of each statement (literals and ``IN`` lists collapsed),
+  so repeated fingerprints point at N+1 query patterns.
+
+The totals are sent back as a ``Server-Timing`` header (``db`` and
+``app``), attached to the response as ``response.query_stats`` (used by
+``social_media_api.testing.QueryBudgetMixin``), and logged as a warning
+when the endpoint runs more queries than its budget or spends more than
+``QUERY_TIME_BUDGET_MS`` in the database.
+
+Budgets are declared per URL name in ``QUERY_BUDGETS``; other endpoints get
+``QUERY_BUDGET_DEFAULT`` (None disables the check).
+"""
+
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+BUDGETS = getattr(settings, 'QUERY_BUDGETS', {})
+DEFAULT_BUDGET = getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+TIME_BUDGET_MS = getattr(settings, 'QUERY_TIME_BUDGET_MS', None)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\bIN \((?:[^()]*)\)', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Normalize a statement so executions differing only in values compare equal."""
+    sql = _LITERALS.sub('?', sql)
+    sql = _IN_LISTS.sub('IN (...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+    """``execute_wrapper`` hook counting and timing the queries it sees"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def milliseconds(self):
+        return self.seconds * 1000
+
+    @property
+    def duplicates(self):
+        """Fingerprints run more than once, most repeated first."""
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count > 1]
+
+
+@contextmanager
+def record_queries():
+    """Record the queries run on every connection of this thread."""
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        yield recorder
+
+
+def get_budget(url_name):
+    """Query budget declared for ``url_name``, or the default."""
+    return BUDGETS.get(url_name, DEFAULT_BUDGET)
+
+
+def server_timing(recorder, total_seconds):
+    return (
+        f'db;dur={recorder.milliseconds:.1f};desc="{recorder.count} queries", '
+        f'app;dur={total_seconds * 1000:.1f}'
+    )
+
+
+def check_budget(request, recorder):
+    """Log the request if it ran over its query or database time budget."""
+    match = getattr(request, 'resolver_match', None)
+    url_name = match.url_name if match else None
+    budget = get_budget(url_name)
+    over_count = budget is not None and recorder.count > budget
+    over_time = TIME_BUDGET_MS is not None and recorder.milliseconds > TIME_BUDGET_MS
+    if over_count or over_time:
+        logger.warning(
+            '%s %s (%s) ran %d queries (budget %s) in %.1f ms; repeated: %s',
+            request.method, request.path, url_name, recorder.count, budget,
+            recorder.milliseconds, recorder.duplicates[:3],
+        )
+    return not (over_count or over_time)
@@ -0,0 +1,97 @@
+"""
+Project-wide middleware.
+"""
+
+import math
+import time
+
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from . import compression, instrumentation
+
+
+class RateLimitHeadersMiddleware(MiddlewareMixin):
+    """
+    Report the bucket recorded by social_media_api.throttling as
+    ``RateLimit-Limit``, ``RateLimit-Remaining`` and ``RateLimit-Reset``
+    (seconds until the bucket is full again).
+    """
+
+    def process_response(self, request, response):
+        rate_limit = getattr(request, 'rate_limit', None)
+        if rate_limit is not None:
+            capacity, state = rate_limit
+            response.headers['RateLimit-Limit'] = str(capacity)
+            response.headers['RateLimit-Remaining'] = str(state.remaining)
+            response.headers['RateLimit-Reset'] = str(math.ceil(state.reset))
+        return response
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress text-like responses with brotli or gzip as negotiated by
+    ``Accept-Encoding``; see social_media_api.compression. Must sit above
+    any middleware that reads or changes the response body.
+    """
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or response.status_code in (204, 304):
+            return response
+        if not compression.is_compressible(response.get('Content-Type', '')):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = compression.negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            compressor = compression.Compressor(encoding)
+            if response.is_async:
+                response.streaming_content = compressor.compress_async_chunks(response.streaming_content)
+            else:
+                response.streaming_content = compressor.compress_chunks(response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            if len(response.content) < compression.MIN_SIZE:
+                compression.record_skip()
+                return response
+            compressed = compression.Compressor(encoding).compress_all(response.content)
+            if len(compressed) >= len(response.content):
+                compression.record_skip()
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The compressed body is a different byte sequence: strong ETags become weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Record the SQL of each request (social_media_api.instrumentation), report
+    it in ``Server-Timing`` and log requests over their query budget.
+
+    Sync only: under ASGI, Django runs it in the thread that also runs the
+    sync views, so their queries pass through its connection hooks.
+    """
+
+    sync_capable = True
+    async_capable = False
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with instrumentation.record_queries() as recorder:
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        response.query_stats = recorder
+        response.headers['Server-Timing'] = instrumentation.server_timing(recorder, elapsed)
+        instrumentation.check_budget(request, recorder)
+        return response
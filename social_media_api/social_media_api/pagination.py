@@ -0,0 +1,188 @@
+"""
+Keyset (cursor) pagination shared by the list endpoints.
+
+Pages are addressed by an opaque cursor holding the (key..., id) of the last
+row seen, so every page is a ``WHERE (key..., id) < (?..., ?) ... LIMIT n``
+range scan on a composite index and costs the same no matter how deep the
+client has scrolled. There is no ``COUNT(*)`` and no ``OFFSET``.
+
+Key fields must be non-null: a NULL never compares less or greater than the
+cursor, so its rows would be skipped. Keep ``ordering_fields`` of keyset
+paginated views to non-null columns.
+"""
+
+from base64 import b64decode, b64encode
+from collections import namedtuple
+from datetime import datetime
+from urllib import parse
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured, ValidationError
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+Cursor = namedtuple('Cursor', ['values', 'pk', 'reverse'])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on ``(<ordering fields>..., id)``.
+
+    The key is taken from the queryset's ordering (or the model's default
+    ordering), so ``Post`` pages on ``(created_at, id)``, ``Comment`` on
+    ``(created_at, id)``, ``Notification`` on ``(timestamp, id)`` and
+    ``?ordering=read,-timestamp`` on ``(read, timestamp, id)``.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.keys = self.get_keys(queryset)
+
+        cursor = self.decode_cursor(request)
+        self.reverse = bool(cursor and cursor.reverse)
+        # Walking backwards flips the scan direction of every key
+        scan = [(name, descending != self.reverse) for name, descending in self.keys]
+        if cursor is not None:
+            if len(cursor.values) != len(self.keys) - 1:
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                queryset = queryset.filter(self.get_seek_filter(cursor, scan))
+            except (ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        queryset = queryset.order_by(*[
+            ('-' if descending else '') + name for name, descending in scan
+        ])
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = cursor is not None, has_more
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                size = int(request.query_params[self.page_size_query_param])
+                if size > 0:
+                    return min(size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_keys(self, queryset):
+        """
+        Return the ordering as (field, descending) pairs ending with pk.
+
+        The pk tie-breaker follows the direction of the leading field.
+        """
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        keys = []
+        for field in ordering:
+            if not isinstance(field, str) or field == '?':
+                continue
+            name = field.lstrip('-')
+            if name in ('pk', 'id'):
+                if not keys:
+                    return [('pk', field.startswith('-'))]
+                break
+            if name not in (key for key, _ in keys):
+                self.check_key(queryset.model, name)
+                keys.append((name, field.startswith('-')))
+        keys.append(('pk', keys[0][1] if keys else False))
+        return keys
+
+    def check_key(self, model, name):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotations and related lookups are left to the view
+            return
+        if field.null:
+            raise ImproperlyConfigured(
+                f'KeysetPagination cannot order on nullable field {model.__name__}.{name}'
+            )
+
+    def get_seek_filter(self, cursor, scan):
+        """Rows after the cursor in the lexicographic order of ``scan``."""
+        values = list(cursor.values) + [cursor.pk]
+        seek = Q()
+        for index, (name, descending) in enumerate(scan):
+            lookup = 'lt' if descending else 'gt'
+            equal = {key: value for (key, _), value in zip(scan[:index], values)}
+            seek |= Q(**equal, **{f'{name}__{lookup}': values[index]})
+        return seek
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(self.get_positions(self.page[-1]), self.page[-1].pk, False))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(Cursor(self.get_positions(self.page[0]), self.page[0].pk, True))
+
+    def get_positions(self, instance):
+        positions = []
+        for name, _ in self.keys[:-1]:
+            value = getattr(instance, name)
+            positions.append(value.isoformat() if isinstance(value, datetime) else str(value))
+        return positions
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            querystring = b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            return Cursor(
+                values=tokens.get('v', []),
+                pk=int(tokens['i'][0]),
+                reverse=bool(int(tokens.get('r', ['0'])[0])),
+            )
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, cursor):
+        tokens = {'v': cursor.values, 'i': cursor.pk}
+        if cursor.reverse:
+            tokens['r'] = '1'
+        querystring = parse.urlencode(tokens, doseq=True)
+        encoded = b64encode(querystring.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
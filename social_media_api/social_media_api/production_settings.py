@@ -44,6 +44,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Compresses the final response, so it stays above body-changing middleware
+    'social_media_api.middleware.CompressionMiddleware',
+    'social_media_api.middleware.QueryInstrumentationMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -52,6 +55,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'social_media_api.middleware.RateLimitHeadersMiddleware',
 ]
 
 ROOT_URLCONF = 'social_media_api.urls'
@@ -73,6 +77,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'social_media_api.wsgi.application'
+ASGI_APPLICATION = 'social_media_api.asgi.application'
 
 # Database
 DATABASES = {
@@ -82,6 +87,14 @@ DATABASES = {
     )
 }
 
+# Cache (shared by all workers; backs counters such as the unread badge)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://localhost:6379/0'),
+    }
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -122,7 +135,7 @@ AUTH_USER_MODEL = 'accounts.CustomUser'
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -131,8 +144,97 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    # orjson-backed JSON (social_media_api.renderers), stdlib json without it
+    'DEFAULT_RENDERER_CLASSES': [
+        'social_media_api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'social_media_api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Token buckets (social_media_api.throttling); write endpoints set throttle_scope
+    'DEFAULT_THROTTLE_CLASSES': [
+        'social_media_api.throttling.AnonTokenBucketThrottle',
+        'social_media_api.throttling.UserTokenBucketThrottle',
+        'social_media_api.throttling.ScopedTokenBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': '120/min',
+        'user': '600/min',
+        'likes': '60/min',
+        'comments': '20/min',
+        'follows': '60/min',
+    },
 }
 
+# Home timeline (fan-out on write)
+# Authors with at least this many followers are merged into feeds on read
+TIMELINE_FANOUT_THRESHOLD = 5000
+# Recent posts copied into a timeline when following someone or rebuilding
+TIMELINE_BACKFILL_LIMIT = 200
+
+# Token -> user lookups (accounts.authentication): shared cache TTL, and the
+# TTL/size of the per-process LRU in front of it
+AUTH_TOKEN_CACHE_TIMEOUT = 300
+AUTH_TOKEN_LOCAL_TIMEOUT = 30
+AUTH_TOKEN_LOCAL_CACHE_SIZE = 10000
+
+# Throttle buckets are shared by every worker through Redis
+THROTTLE_STORE = 'social_media_api.throttling.RedisBucketStore'
+THROTTLE_REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+
+# Who-to-follow suggestions stored per user by `compute_follow_suggestions`
+FOLLOW_SUGGESTIONS_TOP_N = 20
+
+# Trending posts: engagement window and age decay used by `refresh_trending`
+TRENDING_WINDOW_HOURS = 48
+TRENDING_GRAVITY = 1.8
+
+# Per-request SQL instrumentation (social_media_api.instrumentation): requests
+# running more queries than the budget of their URL name, or spending longer
+# in the database, are logged; QueryBudgetMixin fails tests over budget
+QUERY_BUDGETS = {
+    'feed': 8,
+    'notification_list': 6,
+    'user-followers': 5,
+    'post-list': 5,
+    'post-detail': 5,
+    'post-comments': 4,
+    'profile': 3,
+}
+QUERY_BUDGET_DEFAULT = 20
+QUERY_TIME_BUDGET_MS = 250
+
+# Response compression (social_media_api.compression): smaller bodies are
+# sent uncompressed
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Anonymous post/comment reads are cached until a write bumps their
+# generation (social_media_api.response_cache); this bounds staleness of
+# embedded author data
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Like/comment counters of posts past the threshold are spread over shards,
+# folded back into Post by `compact_counters`
+POST_COUNTER_SHARDS = 16
+POST_COUNTER_SHARD_THRESHOLD = 1000
+POST_COUNTER_CACHE_TIMEOUT = 5
+
+# Queued notifications are delivered by the `process_notifications --loop` worker
+NOTIFICATIONS_DRAIN_ON_COMMIT = False
+
+# Read notifications older than this are moved out by `archive_notifications`
+NOTIFICATIONS_RETENTION_DAYS = 90
+
+# Real-time push: Redis pub/sub so every ASGI worker and the notification
+# worker share one broker
+PUBSUB_BROKER = 'social_media_api.pubsub.RedisBroker'
+PUBSUB_REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+
 # JWT Settings (if using)
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
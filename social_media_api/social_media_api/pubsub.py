@@ -0,0 +1,147 @@
+"""
+Publish/subscribe used to push notifications and feed updates to clients
+connected to the streaming endpoint.
+
+Publishers are ordinary synchronous code (views, signal handlers, the
+notification worker); subscribers are async streaming responses served over
+ASGI. The backend is chosen with the ``PUBSUB_BROKER`` setting:
+
+* ``social_media_api.pubsub.InMemoryBroker`` (default) delivers within the
+  current process. It is the local stand-in for development and tests.
+* ``social_media_api.pubsub.RedisBroker`` goes through Redis pub/sub so that
+  messages published by one worker (or by ``process_notifications``) reach
+  subscribers connected to any other worker.
+"""
+
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def author_channel(author_id):
+    return f'author:{author_id}'
+
+
+class InMemorySubscription:
+    """Messages for one subscriber, buffered on its event loop"""
+
+    def __init__(self, broker, channels, max_pending):
+        self.broker = broker
+        self.channels = list(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_pending)
+
+    def deliver(self, message):
+        # Called from publisher threads
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message):
+        if not self.queue.full():
+            self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        """Return the next message, or None if ``timeout`` seconds pass first."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.broker._unsubscribe(self)
+
+
+class InMemoryBroker:
+    """Process-local broker; subscribers only see messages published in-process"""
+
+    max_pending = 100
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+
+    async def subscribe(self, channels):
+        subscription = InMemorySubscription(self, channels, self.max_pending)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+
+class RedisSubscription:
+    def __init__(self, client, pubsub):
+        self.client = client
+        self.pubsub = pubsub
+
+    async def get(self, timeout=None):
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message is None:
+            return None
+        return json.loads(message['data'])
+
+    async def close(self):
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+
+class RedisBroker:
+    """Broker backed by Redis pub/sub (``PUBSUB_REDIS_URL``, default ``REDIS_URL``)"""
+
+    def __init__(self, url=None):
+        import redis
+
+        self.url = url or getattr(settings, 'PUBSUB_REDIS_URL', None) or getattr(
+            settings, 'REDIS_URL', 'redis://localhost:6379/0'
+        )
+        self.client = redis.Redis.from_url(self.url)
+
+    def publish(self, channel, message):
+        self.client.publish(channel, json.dumps(message))
+
+    async def subscribe(self, channels):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(*channels)
+        return RedisSubscription(client, pubsub)
+
+
+def get_broker():
+    """Return the process-wide broker configured by ``PUBSUB_BROKER``."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, 'PUBSUB_BROKER', 'social_media_api.pubsub.InMemoryBroker')
+                _broker = import_string(path)()
+    return _broker
+
+
+def publish(channel, message):
+    get_broker().publish(channel, message)
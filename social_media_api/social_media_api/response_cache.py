@@ -0,0 +1,95 @@
+"""
+Versioned response cache for anonymous reads.
+
+``cache_anonymous('posts', 'post:{pk}')`` caches the data of an anonymous
+``GET`` under a key made of the URL (scheme, host, path and query string),
+the negotiated format and the current value of each named generation
+(formatted with the view's URL kwargs). Writes never delete cached responses: they ``bump()``
+the generations they affect once their transaction commits, so later reads
+compute new keys and the stale entries simply expire. A traffic spike of
+anonymous readers then costs one cache lookup per request until the next
+write.
+
+Generations used by the posts app (bumped in posts.signals and posts.likes):
+
+* ``posts``: any post, comment or like changed
+* ``comments``: any comment changed
+* ``post:<id>``: that post, its comments or its likes changed
+
+Generations are also the version inputs of conditional GETs
+(social_media_api.conditional), which add:
+
+* ``user:<id>``: the user's profile or follow counters changed
+* ``notifications:<id>``: the user's notifications were delivered, (un)read
+  or archived
+
+Data embedded from other models (author names, avatars) may stay stale for
+up to ``RESPONSE_CACHE_TIMEOUT`` seconds.
+"""
+
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+CACHE_HEADER = 'X-Cache'
+TIMEOUT = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+
+
+def _generation_key(name):
+    return f'generation:{name}'
+
+
+def get_generations(names):
+    """Return the current value of each named generation, starting missing ones."""
+    keys = [_generation_key(name) for name in names]
+    values = cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        # A generation evicted from the cache restarts at a new value, never
+        # at one that old entries were stored under
+        for key in missing:
+            cache.add(key, time.time_ns(), None)
+        values.update(cache.get_many(missing))
+    return [values[key] for key in keys]
+
+
+def bump(*names):
+    """Move the named generations on once the current transaction commits."""
+    def set_generations():
+        now = time.time_ns()
+        cache.set_many({_generation_key(name): now for name in names}, None)
+    transaction.on_commit(set_generations)
+
+
+def _cache_key(request, generations):
+    # Pagination links in the body are absolute, so the origin is part of the key
+    url = f'{request.scheme}://{request.get_host()}{request.get_full_path()}'
+    digest = hashlib.sha256(url.encode()).hexdigest()
+    versions = '.'.join(str(generation) for generation in generations)
+    return f'response:{request.accepted_renderer.format}:{versions}:{digest}'
+
+
+def cache_anonymous(*generations):
+    """Serve anonymous GETs of an APIView handler from the versioned cache."""
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+                return view_method(self, request, *args, **kwargs)
+            names = [name.format(**kwargs) for name in generations]
+            cache_key = _cache_key(request, get_generations(names))
+            data = cache.get(cache_key)
+            if data is not None:
+                return Response(data, headers={CACHE_HEADER: 'hit'})
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(cache_key, response.data, TIMEOUT)
+                response[CACHE_HEADER] = 'miss'
+            return response
+        return wrapper
+    return decorator
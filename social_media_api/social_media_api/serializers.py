@@ -0,0 +1,48 @@
+"""
+Sparse fieldsets shared by the posts, accounts and notifications serializers.
+
+``?fields=id,title`` limits a response to the listed fields and
+``?expand=comments`` opts into heavy fields a serializer leaves out by
+default (``Meta.expandable_fields``). Only the top-level serializer of a
+response is filtered; nested representations are left alone. On writes only
+read-only fields are dropped, so the params never discard submitted data.
+"""
+
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse_field_list(request, param):
+    """Return the comma separated values of ``param`` as a set."""
+    if request is None:
+        return set()
+    value = request.query_params.get(param, '')
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class DynamicFieldsMixin:
+    """Serializer mixin honouring the ``fields`` and ``expand`` query params"""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.root not in (self, self.parent):
+            return fields
+
+        request = self.context.get('request')
+        if request is not None and request.method not in SAFE_METHODS:
+            removable = {name for name, field in fields.items() if field.read_only}
+        else:
+            removable = set(fields)
+
+        expand = parse_field_list(request, EXPAND_PARAM)
+        for name in getattr(self.Meta, 'expandable_fields', ()):
+            if name not in expand and name in removable:
+                fields.pop(name, None)
+
+        requested = parse_field_list(request, FIELDS_PARAM)
+        if requested:
+            for name in (removable & set(fields)) - requested - expand:
+                fields.pop(name)
+        return fields
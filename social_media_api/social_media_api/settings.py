@@ -29,12 +29,16 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Compresses the final response, so it stays above body-changing middleware
+    'social_media_api.middleware.CompressionMiddleware',
+    'social_media_api.middleware.QueryInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'social_media_api.middleware.RateLimitHeadersMiddleware',
 ]
 
 ROOT_URLCONF = 'social_media_api.urls'
@@ -56,6 +60,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'social_media_api.wsgi.application'
+ASGI_APPLICATION = 'social_media_api.asgi.application'
 
 # Database
 DATABASES = {
@@ -101,7 +106,7 @@ AUTH_USER_MODEL = 'accounts.CustomUser'
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -110,4 +115,92 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    # orjson-backed JSON (social_media_api.renderers), stdlib json without it
+    'DEFAULT_RENDERER_CLASSES': [
+        'social_media_api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'social_media_api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Token buckets (social_media_api.throttling); write endpoints set throttle_scope
+    'DEFAULT_THROTTLE_CLASSES': [
+        'social_media_api.throttling.AnonTokenBucketThrottle',
+        'social_media_api.throttling.UserTokenBucketThrottle',
+        'social_media_api.throttling.ScopedTokenBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': '120/min',
+        'user': '600/min',
+        'likes': '60/min',
+        'comments': '20/min',
+        'follows': '60/min',
+    },
 }
+
+# Home timeline (fan-out on write)
+# Authors with at least this many followers are merged into feeds on read
+TIMELINE_FANOUT_THRESHOLD = 5000
+# Recent posts copied into a timeline when following someone or rebuilding
+TIMELINE_BACKFILL_LIMIT = 200
+
+# Token -> user lookups (accounts.authentication): shared cache TTL, and the
+# TTL/size of the per-process LRU in front of it
+AUTH_TOKEN_CACHE_TIMEOUT = 300
+AUTH_TOKEN_LOCAL_TIMEOUT = 30
+AUTH_TOKEN_LOCAL_CACHE_SIZE = 10000
+
+# Throttle buckets live in this process; production shares them through Redis
+THROTTLE_STORE = 'social_media_api.throttling.InMemoryBucketStore'
+
+# Who-to-follow suggestions stored per user by `compute_follow_suggestions`
+FOLLOW_SUGGESTIONS_TOP_N = 20
+
+# Trending posts: engagement window and age decay used by `refresh_trending`
+TRENDING_WINDOW_HOURS = 48
+TRENDING_GRAVITY = 1.8
+
+# Per-request SQL instrumentation (social_media_api.instrumentation): requests
+# running more queries than the budget of their URL name, or spending longer
+# in the database, are logged; QueryBudgetMixin fails tests over budget
+QUERY_BUDGETS = {
+    'feed': 8,
+    'notification_list': 6,
+    'user-followers': 5,
+    'post-list': 5,
+    'post-detail': 5,
+    'post-comments': 4,
+    'profile': 3,
+}
+QUERY_BUDGET_DEFAULT = 20
+QUERY_TIME_BUDGET_MS = 250
+
+# Response compression (social_media_api.compression): smaller bodies are
+# sent uncompressed
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Anonymous post/comment reads are cached until a write bumps their
+# generation (social_media_api.response_cache); this bounds staleness of
+# embedded author data
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Like/comment counters of posts past the threshold are spread over shards,
+# folded back into Post by `compact_counters`
+POST_COUNTER_SHARDS = 16
+POST_COUNTER_SHARD_THRESHOLD = 1000
+POST_COUNTER_CACHE_TIMEOUT = 5
+
+# Deliver queued notifications right after the request commits (development);
+# production runs `manage.py process_notifications --loop` as a worker instead
+NOTIFICATIONS_DRAIN_ON_COMMIT = True
+
+# Read notifications older than this are moved out by `archive_notifications`
+NOTIFICATIONS_RETENTION_DAYS = 90
+
+# Real-time push (/api/notifications/stream/); the in-memory broker only
+# reaches clients connected to the same process
+PUBSUB_BROKER = 'social_media_api.pubsub.InMemoryBroker'
@@ -0,0 +1,45 @@
+"""
+Test helpers shared by the app test suites: a user factory and the query
+budgets of social_media_api.instrumentation.
+"""
+
+from django.contrib.auth import get_user_model
+from django.urls import resolve
+
+from . import instrumentation
+
+
+def make_user(username):
+    return get_user_model().objects.create_user(
+        username=username,
+        email=f'{username}@example.com',
+        password='testpass123'
+    )
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin failing a test when an endpoint exceeds its declared
+    budget (``QUERY_BUDGETS``) or an explicit maximum.
+
+    Responses must come through the test client, so that
+    QueryInstrumentationMiddleware has attached ``response.query_stats``.
+    """
+
+    def assertWithinQueryBudget(self, response, budget=None):
+        stats = getattr(response, 'query_stats', None)
+        if stats is None:
+            self.fail('Response has no query_stats; is QueryInstrumentationMiddleware installed?')
+        if budget is None:
+            url_name = resolve(response.wsgi_request.path_info).url_name
+            budget = instrumentation.get_budget(url_name)
+            if budget is None:
+                self.fail(f'No query budget declared for {url_name!r}')
+        if stats.count > budget:
+            repeated = '\n'.join(f'  {count}x {sql}' for sql, count in stats.duplicates)
+            self.fail(
+                f'{response.wsgi_request.method} {response.wsgi_request.get_full_path()} ran '
+                f'{stats.count} queries, over its budget of {budget}'
+                + (f'; repeated statements:\n{repeated}' if repeated else '')
+            )
+        return stats
@@ -0,0 +1,209 @@
+"""
+Token-bucket throttling.
+
+Each (scope, user) pair owns a bucket holding up to ``capacity`` tokens that
+refills continuously at ``capacity / period`` tokens per second; a request
+spends one token or is rejected with 429 and a ``Retry-After`` header.
+Unlike DRF's SimpleRateThrottle, which stores the timestamp of every request
+in the window, a bucket is two numbers and is updated in O(1).
+
+Rates use DRF's ``DEFAULT_THROTTLE_RATES`` format (``'30/min'``) and are read
+per scope. Buckets live in the store named by ``THROTTLE_STORE``:
+
+* ``social_media_api.throttling.InMemoryBucketStore`` (default) keeps
+  buckets in the current process.
+* ``social_media_api.throttling.RedisBucketStore`` updates buckets with a
+  Lua script, so every worker shares them atomically. If Redis is
+  unreachable it falls back to per-process buckets rather than failing
+  requests.
+
+The outcome of the most restrictive bucket is stashed on the request and
+turned into ``RateLimit-Limit/Remaining/Reset`` response headers by
+``social_media_api.middleware.RateLimitHeadersMiddleware``.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+# Outcome of spending a token: whether it was allowed, whole tokens left,
+# seconds until a token is available and seconds until the bucket is full
+BucketState = namedtuple('BucketState', ['allowed', 'remaining', 'retry_after', 'reset'])
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """Turn ``'30/min'`` into (capacity, tokens refilled per second)."""
+    num, period = rate.split('/')
+    capacity = int(num)
+    seconds = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+    return capacity, capacity / seconds
+
+
+def _state(allowed, tokens, capacity, refill_rate):
+    retry_after = 0 if allowed else (1 - tokens) / refill_rate
+    reset = (capacity - tokens) / refill_rate
+    return BucketState(allowed, int(tokens), retry_after, reset)
+
+
+class InMemoryBucketStore:
+    """Buckets held in this process, least recently used evicted first"""
+
+    max_buckets = 100000
+
+    def __init__(self):
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, refill_rate):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        return _state(allowed, tokens, capacity, refill_rate)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisBucketStore:
+    """Buckets in Redis (``THROTTLE_REDIS_URL``, default ``REDIS_URL``)"""
+
+    # Refill and spend in one atomic step; the server clock is used so
+    # workers with skewed clocks agree
+    script = """
+    local capacity = tonumber(ARGV[1])
+    local refill_rate = tonumber(ARGV[2])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * refill_rate)
+    local allowed = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+    redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / refill_rate * 1000))
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url=None):
+        import redis
+
+        self.errors = (redis.RedisError,)
+        url = url or getattr(settings, 'THROTTLE_REDIS_URL', None) or getattr(
+            settings, 'REDIS_URL', 'redis://localhost:6379/0'
+        )
+        self.client = redis.Redis.from_url(url, socket_timeout=0.25)
+        self.consume_script = self.client.register_script(self.script)
+        self.fallback = InMemoryBucketStore()
+
+    def consume(self, key, capacity, refill_rate):
+        try:
+            allowed, tokens = self.consume_script(keys=[key], args=[capacity, refill_rate])
+        except self.errors:
+            logger.warning('Redis throttle store unavailable, using in-memory buckets', exc_info=True)
+            return self.fallback.consume(key, capacity, refill_rate)
+        return _state(bool(allowed), float(tokens), capacity, refill_rate)
+
+
+def get_store():
+    """Return the process-wide bucket store configured by ``THROTTLE_STORE``."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                path = getattr(settings, 'THROTTLE_STORE', 'social_media_api.throttling.InMemoryBucketStore')
+                _store = import_string(path)()
+    return _store
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Token bucket keyed by user id (or client IP) and ``scope``"""
+
+    scope = None
+
+    def get_scope(self, request, view):
+        return self.scope
+
+    def get_ident_for(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        if scope is None:
+            return True
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        try:
+            rate = rates[scope]
+        except KeyError:
+            raise ImproperlyConfigured(f"No default throttle rate set for '{scope}' scope")
+        if rate is None:
+            return True
+
+        capacity, refill_rate = parse_rate(rate)
+        self.state = get_store().consume(
+            f'throttle:{scope}:{self.get_ident_for(request)}', capacity, refill_rate
+        )
+        self.capacity = capacity
+        self._record(request)
+        return self.state.allowed
+
+    def _record(self, request):
+        # Keep the most restrictive bucket for the RateLimit-* headers
+        http_request = request._request
+        current = getattr(http_request, 'rate_limit', None)
+        if current is None or self.state.remaining < current[1].remaining:
+            http_request.rate_limit = (self.capacity, self.state)
+
+    def wait(self):
+        return math.ceil(self.state.retry_after)
+
+
+class ScopedTokenBucketThrottle(TokenBucketThrottle):
+    """Throttles views that set ``throttle_scope``; others pass through"""
+
+    def get_scope(self, request, view):
+        return getattr(view, 'throttle_scope', None)
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """Overall budget of an authenticated user across every endpoint"""
+
+    scope = 'user'
+
+    def get_scope(self, request, view):
+        return self.scope if request.user and request.user.is_authenticated else None
+
+
+class AnonTokenBucketThrottle(TokenBucketThrottle):
+    """Overall budget of an anonymous client, keyed by IP"""
+
+    scope = 'anon'
+
+    def get_scope(self, request, view):
+        return None if request.user and request.user.is_authenticated else self.scope
@@ -3,11 +3,14 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .views import CompressionStatsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('accounts.urls')),
     path('api/', include('posts.urls')),
     path('api/notifications/', include('notifications.urls')),
+    path('api/metrics/compression/', CompressionStatsView.as_view(), name='compression_stats'),
 ]
 
 if settings.DEBUG:
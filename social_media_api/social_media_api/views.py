@@ -0,0 +1,13 @@
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import compression
+
+
+class CompressionStatsView(APIView):
+    """Compression ratio and time counters of the worker serving the request"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(compression.get_stats())